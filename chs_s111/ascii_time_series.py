@@ -3,24 +3,21 @@
 #******************************************************************************
 from datetime import datetime
 from datetime import timedelta
+import numpy
 import pytz
+from chs_s111 import station_source
+from chs_s111 import s111_writer
 
 #******************************************************************************
-class AsciiTimeSeries:
+class AsciiTimeSeries(station_source.StationSource):
     
 
     #******************************************************************************
     def __init__(self, file_name):
-        self.file_name = file_name
+        super().__init__(file_name)
 
         self.ascii_file = None
-        self.interval = None
-        self.start_time = None
-        self.end_time = None
-        self.number_of_records = 0
         self.current_record = 0
-        self.latitude = 0
-        self.longitude = 0
         
         #Open the file.
         self.ascii_file = open(self.file_name, 'r')
@@ -41,7 +38,10 @@ class AsciiTimeSeries:
 
             #If this is the 1st row, then lets decode the start date and time.
             if rowIndex == 0:
-                
+
+                #01-65 65 : Station number and name
+                self.station_identifier = data[0:65].strip()
+
                 #66-66  1 : Units of depth  [m: metres, f: feet]
                 self.unit = data[65:66]
 
@@ -157,3 +157,23 @@ class AsciiTimeSeries:
 
         #Return a tuple with dateAndTime, direction, and speed
         return (dateAndTime, direction, speed)
+
+
+    #******************************************************************************
+    def read_blocks(self, block_size=station_source.DEFAULT_BLOCK_SIZE):
+
+        while not self.done():
+            numberOfRows = min(block_size, self.number_of_records - self.current_record)
+
+            directions = numpy.empty(numberOfRows, dtype=numpy.float64)
+            speeds = numpy.empty(numberOfRows, dtype=numpy.float64)
+            for row in range(0, numberOfRows):
+                dateAndTime, directions[row], speeds[row] = self.read_next_row()
+
+            #The files may give north as 360 degrees.
+            yield (s111_writer.normalize_directions(directions), speeds)
+
+
+    #******************************************************************************
+    def close(self):
+        self.ascii_file.close()
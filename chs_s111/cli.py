@@ -0,0 +1,552 @@
+#******************************************************************************
+#
+#******************************************************************************
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import shlex
+import socketserver
+import sys
+
+#The modules that implement the commands. They import h5py, numpy, netCDF4, etc.
+#so they are only imported when a command that needs them is run.
+COMMAND_MODULES = ('chs_s111.s111_io_profile', 'chs_s111.s111_create_file', 'chs_s111.s111_add_timeseries', 'chs_s111.s111_transaction',
+                   'chs_s111.s111_add_irregular_grid', 'chs_s111.s111_print_file',
+                   'chs_s111.s111_catalog', 'chs_s111.s111_validator', 'chs_s111.s111_aggregate',
+                   'chs_s111.s111_merge', 'chs_s111.s111_export', 'chs_s111.s111_interpolate',
+                   'chs_s111.s111_tiles', 'chs_s111.s111_archive', 'chs_s111.s111_swmr')
+
+#******************************************************************************
+def add_io_profile_argument(parser):
+    parser.add_argument('--io-profile', help='The HDF5 file options to use. The large profile is tuned for files with thousands of groups, '
+                        'and writes files that need HDF5 1.10 or later to read.', choices=('default', 'large'), default='default')
+
+
+#******************************************************************************
+def apply_io_profile(results):
+    """Use the I/O profile selected on the command line for the files opened by the command."""
+
+    if getattr(results, 'io_profile', None) is None:
+        return
+
+    from chs_s111 import s111_io_profile
+    s111_io_profile.set_io_profile(results.io_profile)
+
+
+#******************************************************************************
+def add_transaction_arguments(parser):
+    parser.add_argument('--transactional', help='Edit a staging copy of the file, and replace the original only once the import succeeds.', action='store_true')
+    parser.add_argument('--no-resume', help='Start over instead of resuming a failed transactional import.', action='store_true')
+
+
+#******************************************************************************
+def add_create_arguments(parser):
+    parser.add_argument('-m', '--metadata-file', help='The text file containing the file metadata.', required=True)
+    parser.add_argument('-b', '--batch', help='Create one file for each row of the metadata file, in the output directory.', action='store_true')
+    parser.add_argument('-p', '--processes', help='The number of worker processes used in batch mode.', type=int, default=1)
+    parser.add_argument("outputFile", nargs=1)
+
+
+#******************************************************************************
+def run_create(results):
+    from chs_s111 import s111_create_file
+
+    if not results.batch:
+        s111_create_file.create_dataset(results.outputFile[0], results.metadata_file)
+        return
+
+    outputFiles = s111_create_file.create_datasets(results.metadata_file, results.outputFile[0], results.processes)
+    print("Created", len(outputFiles), "file(s).")
+
+
+#******************************************************************************
+def add_timeseries_arguments(parser):
+    parser.add_argument('-t', '--time-series-file', help='The file containing the time series: ASCII, NetCDF (.nc), or NumPy (.npy with a .json sidecar). (May be repeated)', action='append', required=True)
+    parser.add_argument('-d', '--on-duplicate', help='What to do if the station already exists.', choices=('fail', 'skip', 'replace', 'add'), default='fail')
+    parser.add_argument('-i', '--match-identifier', help='Also match existing stations by the station number and name in the header.', action='store_true')
+    add_transaction_arguments(parser)
+    parser.add_argument("inOutFile", nargs=1)
+
+
+#******************************************************************************
+def run_add_timeseries(results):
+    from chs_s111 import s111_add_timeseries
+    from chs_s111 import s111_io_profile
+
+    if results.transactional:
+        from chs_s111 import s111_transaction
+
+        operation = s111_transaction.describe_operation('add-timeseries', results.time_series_file)
+        transaction = s111_transaction.Transaction(results.inOutFile[0], operation, not results.no_resume)
+        with transaction as hdf_file:
+            s111_add_timeseries.add_timeseries_files(hdf_file, results.time_series_file, results.on_duplicate,
+                                                     results.match_identifier, transaction)
+        return
+
+    #open the HDF5 file.
+    with s111_io_profile.open_file(results.inOutFile[0], "r+") as hdf_file:
+        s111_add_timeseries.add_timeseries_files(hdf_file, results.time_series_file, results.on_duplicate,
+                                                 results.match_identifier)
+
+
+#******************************************************************************
+def add_grid_arguments(parser):
+    parser.add_argument('-g', '--grid-file', help='The netcdf file containing the irregular grid data.', required=True)
+    add_transaction_arguments(parser)
+    parser.add_argument('--checkpoint-interval', help='The number of groups written between the checkpoints of a transactional import.',
+                        type=int, default=256)
+    parser.add_argument("inOutFile", nargs=1)
+
+
+#******************************************************************************
+def run_add_grid(results):
+    from chs_s111 import s111_add_irregular_grid
+    from chs_s111 import s111_io_profile
+
+    if results.transactional:
+        from chs_s111 import s111_transaction
+
+        operation = s111_transaction.describe_operation('add-grid', [results.grid_file])
+        transaction = s111_transaction.Transaction(results.inOutFile[0], operation, not results.no_resume)
+        with transaction as hdf_file:
+            s111_add_irregular_grid.add_irregular_grid(hdf_file, results.grid_file, transaction, results.checkpoint_interval)
+        return
+
+    #open the HDF5 file.
+    with s111_io_profile.open_file(results.inOutFile[0], "r+") as hdf_file:
+        s111_add_irregular_grid.add_irregular_grid(hdf_file, results.grid_file)
+
+
+#******************************************************************************
+def add_print_arguments(parser):
+    parser.add_argument("inputFile", nargs=1)
+
+
+#******************************************************************************
+def run_print(results):
+    from chs_s111 import s111_print_file
+    s111_print_file.print_file(results.inputFile[0])
+
+
+#******************************************************************************
+def add_catalog_arguments(parser):
+    parser.add_argument('-c', '--catalog-file', help='The SQLite file containing the catalog.', required=True)
+    parser.add_argument('-d', '--directory', help='The directory of S-111 files to add to the catalog.')
+    parser.add_argument('--no-recursive', help='Do not scan sub directories.', action='store_true')
+    parser.add_argument('--bounds', help='The area of interest.', nargs=4, type=float, metavar=('WEST', 'SOUTH', 'EAST', 'NORTH'))
+    parser.add_argument('--start-time', help='The start of the time range of interest. (ISO 8601)')
+    parser.add_argument('--end-time', help='The end of the time range of interest. (ISO 8601)')
+    parser.add_argument('--coding-format', help='Only list files with this data coding format.', type=int)
+
+
+#******************************************************************************
+def run_catalog(results):
+    import iso8601
+    from chs_s111 import s111_catalog
+
+    with s111_catalog.S111Catalog(results.catalog_file) as catalog:
+
+        #Bring the catalog up to date, if we were given a directory.
+        if results.directory:
+            updated, removed = catalog.refresh(results.directory, recursive=not results.no_recursive)
+            print("Catalog updated:", updated, "file(s) added or changed,", removed, "file(s) removed.")
+
+        #Only list the files if we were asked to.
+        if results.bounds is None and results.start_time is None and results.end_time is None and results.coding_format is None:
+            return
+
+        west = south = east = north = None
+        if results.bounds is not None:
+            west, south, east, north = results.bounds
+
+        start_time = iso8601.parse_date(results.start_time) if results.start_time else None
+        end_time = iso8601.parse_date(results.end_time) if results.end_time else None
+
+        for entry in catalog.query(west, south, east, north, start_time, end_time, results.coding_format):
+            print(entry.path)
+
+
+#******************************************************************************
+def add_validate_arguments(parser):
+    parser.add_argument('-c', '--chunk-size', help='The maximum number of values read from a dataset at one time.',
+                        type=int, default=1024 * 1024)
+    parser.add_argument('-p', '--processes', help='The number of worker processes.', type=int, default=1)
+    parser.add_argument("inputFile", nargs=1)
+
+
+#******************************************************************************
+def run_validate(results):
+    from chs_s111 import s111_validator
+
+    errors = s111_validator.validate_file(results.inputFile[0], results.chunk_size, results.processes)
+
+    for error in errors:
+        print("Error:", error)
+
+    if errors:
+        print(len(errors), "error(s) found.")
+        sys.exit(1)
+
+    print("No errors found.")
+
+
+#******************************************************************************
+def add_aggregate_arguments(parser):
+    parser.add_argument('-s', '--statistic', help='The statistic to compute.', choices=('max', 'min', 'mean', 'flood', 'ebb'), required=True)
+    parser.add_argument('-w', '--window', help='The number of records in each window.', type=int, required=True)
+    parser.add_argument('-r', '--rolling', help='Compute a rolling aggregate instead of fixed windows.', action='store_true')
+    parser.add_argument('-f', '--flood-direction', help='The direction (in degrees) of the flood current.', type=float, default=0.0)
+    parser.add_argument("inputFile", nargs=1)
+    parser.add_argument("outputFile", nargs=1)
+
+
+#******************************************************************************
+def run_aggregate(results):
+    from chs_s111 import s111_aggregate
+    s111_aggregate.aggregate_file(results.inputFile[0], results.outputFile[0], results.statistic,
+                                  results.window, results.rolling, results.flood_direction)
+
+
+#******************************************************************************
+def add_merge_arguments(parser):
+    parser.add_argument('-o', '--output-file', help='The S-111 file to create.', required=True)
+    parser.add_argument("inputFiles", nargs='+')
+
+
+#******************************************************************************
+def run_merge(results):
+    from chs_s111 import s111_merge
+    s111_merge.merge_files(results.inputFiles, results.output_file)
+
+
+#******************************************************************************
+def add_export_arguments(parser):
+    parser.add_argument('-f', '--format', help='The output format.', choices=('npy', 'parquet', 'arrow'), default='npy')
+    parser.add_argument('-r', '--rows-per-group', help='The maximum number of rows in each row group.', type=int, default=1024 * 1024)
+    parser.add_argument('--swmr', help='Open the file as a SWMR reader, to export the timesteps published so far.', action='store_true')
+    parser.add_argument("inputFile", nargs=1)
+    parser.add_argument("output", nargs=1, help='The file to create, or the directory of column files for the npy format.')
+
+
+#******************************************************************************
+def run_export(results):
+    from chs_s111 import s111_export
+
+    numberOfRows = s111_export.export_file(results.inputFile[0], results.output[0], results.format, results.rows_per_group, results.swmr)
+    print("Exported", numberOfRows, "rows.")
+
+
+#******************************************************************************
+def add_interpolate_arguments(parser):
+    parser.add_argument('-t', '--time', help='The time to interpolate at. (ISO 8601, UTC if no timezone is given)', required=True)
+    parser.add_argument('-n', '--node', help='The zero based index of a node (or station) to interpolate, all of them if not specified.',
+                        type=int, action='append')
+    parser.add_argument('--swmr', help='Open the file as a SWMR reader, to read the timesteps published so far.', action='store_true')
+    parser.add_argument("inputFile", nargs=1)
+
+
+#******************************************************************************
+def run_interpolate(results):
+    import iso8601
+    from chs_s111 import s111_interpolate
+    from chs_s111 import s111_reader
+
+    date_time = iso8601.parse_date(results.time)
+
+    with s111_reader.S111Reader(results.inputFile[0], swmr=results.swmr) as reader:
+        interpolator = s111_interpolate.S111Interpolator(reader)
+        speeds, directions = interpolator.values_at(date_time, results.node)
+
+        nodes = results.node if results.node is not None else range(0, len(speeds))
+        for node, speed, direction in zip(nodes, speeds, directions):
+            print(node, reader.longitudes[node], reader.latitudes[node], speed, direction)
+
+
+#******************************************************************************
+def add_tiles_arguments(parser):
+    parser.add_argument('-o', '--output-file', help='The tile file to create, the input file name plus .tiles.h5 if not specified.')
+    parser.add_argument('-m', '--method', help='How the nodes in each cell of a tile are reduced.', choices=('average', 'decimate'), default='average')
+    parser.add_argument('-c', '--cells-per-side', help='The number of cells along each side of a tile.', type=int, default=16)
+    parser.add_argument('-z', '--max-zoom', help='The deepest zoom level to build.', type=int, default=18)
+    parser.add_argument("inputFile", nargs=1)
+
+
+#******************************************************************************
+def run_tiles(results):
+    from chs_s111 import s111_tiles
+
+    tileFile = s111_tiles.build_tiles(results.inputFile[0], results.output_file, results.method,
+                                      results.cells_per_side, results.max_zoom)
+    print("Created", tileFile)
+
+
+#******************************************************************************
+def add_archive_arguments(parser):
+    parser.add_argument('-k', '--keyframe-interval', help='The number of timesteps between keyframes.', type=int, default=24)
+    parser.add_argument('-q', '--quantum', help='The quantization step (knots) of the u/v values.', type=float, default=0.001)
+    parser.add_argument("inputFile", nargs=1)
+    parser.add_argument("outputFile", nargs=1)
+
+
+#******************************************************************************
+def run_archive(results):
+    from chs_s111 import s111_archive
+
+    originalSize, archiveSize = s111_archive.archive_file(results.inputFile[0], results.outputFile[0],
+                                                          results.keyframe_interval, results.quantum)
+    print("Values: {} bytes, archived: {} bytes ({:.1f}x)".format(originalSize, archiveSize,
+                                                                   originalSize / archiveSize if archiveSize else 0.0))
+
+
+#******************************************************************************
+def add_restore_arguments(parser):
+    parser.add_argument("inputFile", nargs=1)
+    parser.add_argument("outputFile", nargs=1)
+
+
+#******************************************************************************
+def run_restore(results):
+    from chs_s111 import s111_archive
+
+    s111_archive.restore_file(results.inputFile[0], results.outputFile[0])
+
+
+#******************************************************************************
+def add_publish_arguments(parser):
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('-t', '--time-series-file', help='A file containing a time series station to publish. (May be repeated)', action='append')
+    group.add_argument('-g', '--grid-file', help='The netcdf file containing the irregular grid data to publish.')
+    parser.add_argument('-b', '--block-size', help='The number of time series records published at a time.', type=int, default=24)
+    parser.add_argument("inputFile", nargs=1)
+
+
+#******************************************************************************
+def run_publish(results):
+    from chs_s111 import s111_swmr
+
+    if results.grid_file:
+        s111_swmr.publish_irregular_grid(results.inputFile[0], results.grid_file)
+    else:
+        s111_swmr.publish_timeseries(results.inputFile[0], results.time_series_file, results.block_size)
+
+
+#******************************************************************************
+def add_golden_arguments(parser):
+    parser.add_argument('-c', '--case', help='A case to run, all of them if not specified. (May be repeated)',
+                        choices=('ascii', 'direction-speed', 'series', 'stations'), action='append')
+    parser.add_argument('-s', '--size', help='The number of values to generate for each run. (May be repeated)', type=int, action='append')
+    parser.add_argument('--seed', help='The seed of the random number generators.', type=int, default=0)
+
+
+#******************************************************************************
+def run_golden(results):
+    from chs_s111 import s111_golden
+
+    sizes = results.size if results.size else s111_golden.DEFAULT_SIZES
+    caseResults = s111_golden.run_harness(results.case, sizes, results.seed)
+    s111_golden.print_results(caseResults)
+
+    if not all(result.passed for result in caseResults):
+        sys.exit(1)
+
+
+#******************************************************************************
+def add_benchmark_arguments(parser):
+    parser.add_argument('-t', '--times', help='The number of timesteps of the generated irregular grid.', type=int, default=10000)
+    parser.add_argument('-n', '--nodes', help='The number of nodes of the generated irregular grid.', type=int, default=100)
+    parser.add_argument('-r', '--runs', help='The number of times each profile is measured. (The median is printed)', type=int, default=3)
+    parser.add_argument('-p', '--profile', help='An I/O profile to measure, all of them if not specified. (May be repeated)',
+                        choices=('default', 'large'), action='append')
+
+
+#******************************************************************************
+def run_benchmark(results):
+    from chs_s111 import s111_benchmark
+
+    profileResults = s111_benchmark.run_benchmark(results.profile, results.times, results.nodes, results.runs)
+    s111_benchmark.print_results(profileResults)
+
+
+#******************************************************************************
+def add_serve_arguments(parser):
+    parser.add_argument('-s', '--socket', help='The local (unix domain) socket to accept jobs on. Jobs are read from stdin if not specified.')
+    parser.add_argument('--no-preload', help='Do not import the command modules at startup.', action='store_true')
+
+
+#******************************************************************************
+def run_serve(results):
+    serve(results.socket, not results.no_preload)
+
+
+#The commands: name -> (description, add arguments function, run function)
+COMMANDS = {
+    'create': ('Create S-111 File', add_create_arguments, run_create),
+    'add-timeseries': ('Add S-111 time series dataset', add_timeseries_arguments, run_add_timeseries),
+    'add-grid': ('Add S-111 irregular grid Dataset', add_grid_arguments, run_add_grid),
+    'print': ('Print the contents of an S-111 File.', add_print_arguments, run_print),
+    'catalog': ('Build and query a catalog of S-111 files.', add_catalog_arguments, run_catalog),
+    'validate': ('Validate the contents of an S-111 File.', add_validate_arguments, run_validate),
+    'aggregate': ('Create an S-111 file of aggregated speed and direction values.', add_aggregate_arguments, run_aggregate),
+    'merge': ('Merge several S-111 files into a new S-111 file.', add_merge_arguments, run_merge),
+    'export': ('Export the contents of an S-111 file to a columnar format.', add_export_arguments, run_export),
+    'interpolate': ('Interpolate the speed and direction values of an S-111 file at a time.', add_interpolate_arguments, run_interpolate),
+    'tiles': ('Build a tile pyramid of an irregular grid S-111 file for map rendering.', add_tiles_arguments, run_tiles),
+    'publish': ('Write time series or irregular grid data to a new S-111 file in SWMR mode, so it can be read while it is written.', add_publish_arguments, run_publish),
+    'archive': ('Encode an irregular grid S-111 file as a compact archive of keyframes and deltas.', add_archive_arguments, run_archive),
+    'restore': ('Restore an irregular grid S-111 file from an archive.', add_restore_arguments, run_restore),
+    'golden': ('Compare the current conversions with the scalar reference implementations, and time them.', add_golden_arguments, run_golden),
+    'benchmark': ('Time creating and reading an irregular grid S-111 file with each I/O profile.', add_benchmark_arguments, run_benchmark),
+    'serve': ('Run commands received over stdin or a local socket, so modules are only imported once.', add_serve_arguments, run_serve),
+}
+
+#******************************************************************************
+def create_command_line():
+    """Create and initialize the command line parser.
+
+    :returns: The command line parser.
+    """
+
+    parser = argparse.ArgumentParser(prog='chs_s111', description='CHS S-111 tools')
+    subparsers = parser.add_subparsers(title='commands', metavar='command')
+
+    for name, (description, add_arguments, run) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=description, description=description)
+        add_arguments(subparser)
+        if name != 'serve':
+            add_io_profile_argument(subparser)
+        subparser.set_defaults(run=run)
+
+    return parser
+
+
+#******************************************************************************
+def run_command(name, args=None):
+    """Run a single command with its own command line parser. (Used by the standalone scripts)
+
+    :param name: The name of the command.
+    :param args: The command line arguments, sys.argv is used if not specified.
+    """
+
+    description, add_arguments, run = COMMANDS[name]
+
+    parser = argparse.ArgumentParser(description=description)
+    add_arguments(parser)
+    if name != 'serve':
+        add_io_profile_argument(parser)
+
+    results = parser.parse_args(args)
+    apply_io_profile(results)
+    run(results)
+
+
+#******************************************************************************
+def execute_job(line):
+    """Run a job received by the serve command, capturing its output.
+
+    :param line: The command line of the job, either as a JSON list of arguments or as a shell style string.
+    :returns: A dictionary containing the status, output, and error message of the job.
+    """
+
+    response = {'status': 'ok', 'output': '', 'error': None}
+    output = io.StringIO()
+
+    try:
+        if line.lstrip().startswith('['):
+            args = json.loads(line)
+        else:
+            args = shlex.split(line)
+
+        if args and args[0] == 'serve':
+            raise Exception('The serve command cannot be run as a job.')
+
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            main(args)
+
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            response['status'] = 'error'
+            response['error'] = 'Exited with status ' + str(e.code)
+    except Exception as e:
+        response['status'] = 'error'
+        response['error'] = str(e)
+
+    response['output'] = output.getvalue()
+    return response
+
+
+#******************************************************************************
+class JobHandler(socketserver.StreamRequestHandler):
+    """Runs each line received on a socket connection as a job, and replies with a JSON line."""
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.decode().strip()
+            if not line:
+                continue
+
+            response = execute_job(line)
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+
+
+#******************************************************************************
+def serve(socket_path=None, preload=True):
+    """Run jobs until stdin is closed, or forever when listening on a socket.
+
+    Each job is one command line (i.e. 'print file.h5'), and a JSON line is
+    written back for each job containing its status and output.
+
+    :param socket_path: The local (unix domain) socket to listen on, stdin/stdout are used if not specified.
+    :param preload: True if the command modules should be imported before the first job.
+    """
+
+    if preload:
+        for module in COMMAND_MODULES:
+            importlib.import_module(module)
+
+    if socket_path is None:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+
+            sys.stdout.write(json.dumps(execute_job(line)) + '\n')
+            sys.stdout.flush()
+        return
+
+    #Remove a stale socket left behind by a previous server.
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = socketserver.UnixStreamServer(socket_path, JobHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+#******************************************************************************
+def main(args=None):
+
+    #Create the command line parser.
+    parser = create_command_line()
+
+    #Parse the command line.
+    results = parser.parse_args(args)
+
+    if not hasattr(results, 'run'):
+        parser.print_help()
+        sys.exit(2)
+
+    apply_io_profile(results)
+    results.run(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#******************************************************************************
+#
+#******************************************************************************
+import h5py
+import numpy
+import iso8601
+import pytz
+import netCDF4
+import math
+
+ms2Knots = 1.943844
+
+#The default number of groups written between the checkpoints of a transactional import.
+DEFAULT_CHECKPOINT_INTERVAL = 256
+
+#******************************************************************************        
+def create_xy_group(hdf_file, latc, lonc):
+    """ Create the XY group containing the position information.
+
+    :param hdf_file: The S-111 HDF file.
+    :param latc: A list of latitude values.
+    :param lonc: A list of longitude values.
+    :returns: A tuple containing minimum x, minimum y, maximum x, maximum y values from the given lists.
+    """
+
+    numberOfLat = latc.shape[0]
+    numberOfLon = lonc.shape[0]
+
+    xCoordinates =  numpy.empty((1, numberOfLat), dtype=numpy.float64)
+    yCoordinates = numpy.empty((1, numberOfLon), dtype=numpy.float64)
+    minX = minY = maxX = maxY = None
+
+    for index in range(0, numberOfLat):
+        latitude = latc[index]
+        longitude = lonc[index]
+
+        #Keep track of the data extents so we can update the metadata.
+        if minX == None:
+            minX = maxX = longitude
+            minY = maxY = latitude
+        else:
+            minX = min(minX, longitude)
+            maxX = max(maxX, longitude)
+            minY = min(minY, latitude)
+            maxY = max(maxY, latitude)
+
+        xCoordinates[0][index] = longitude
+        yCoordinates[0][index] = latitude
+
+
+    #Add the 'Group XY' to store the position information.
+    groupName = 'Group XY'
+    print("Creating", groupName, "dataset.")
+    xy_group = hdf_file.create_group(groupName)
+
+    #Add the x and y datasets to the xy group.
+    xy_group.create_dataset('X', (1, numberOfLat), dtype=numpy.float64, data=xCoordinates)
+    xy_group.create_dataset('Y', (1, numberOfLon), dtype=numpy.float64, data=yCoordinates)       
+
+    return (minX, minY, maxX, maxY)
+
+
+#******************************************************************************        
+def compute_direction_speed(ua, va):
+    """ Compute the direction and speed values from the velocity components.
+
+    :param ua: List of velocity values along the x axis in metres per second.
+    :param va: List of velocity values along the y axis in metres per second.
+    :returns: A tuple containing the (1, N) direction and speed arrays, and the minimum and maximum speed values.
+    """
+
+    min_speed = None
+    max_speed = None
+
+    numberOfVaValues = len(va)
+
+    directions = numpy.empty((1, numberOfVaValues), dtype=numpy.float64)
+    speeds = numpy.empty((1, numberOfVaValues), dtype=numpy.float64)
+    for index in range(0, numberOfVaValues):
+
+        v_ms = va[index]
+        u_ms = ua[index]
+
+        #Convert from metres per second to knots
+        v_knot = v_ms * ms2Knots
+        u_knot = u_ms * ms2Knots
+
+        windSpeed = math.sqrt(math.pow(u_knot, 2) + math.pow(v_knot, 2))
+        windDirectionRadians = math.atan2(v_knot, u_knot)
+        windDirectionDegrees = math.degrees(windDirectionRadians)
+        windDirectionNorth = 90.0 - windDirectionDegrees
+
+        #The direction must always be positive.
+        if windDirectionNorth < 0.0:
+            windDirectionNorth += 360.0
+
+        directions[0][index] = windDirectionNorth
+        speeds[0][index] = windSpeed
+
+        if min_speed == None:
+            min_speed = max_speed = windSpeed
+        else:
+            min_speed = min(min_speed, windSpeed)
+            max_speed = max(max_speed, windSpeed)
+
+    return directions, speeds, min_speed, max_speed
+
+
+#******************************************************************************        
+def create_direction_speed(group, ua, va):
+    """ Create the speed and direction datasets.
+
+    :param group: The HDF group to add the speed and direction datasets to.
+    :param ua: List of velocity values along the x axis in metres per second.
+    :param va: List of velocity values along the y axis in metres per second.
+    :returns: A tuple containing the minimum and maximum speed values added.
+    """
+
+    directions, speeds, min_speed, max_speed = compute_direction_speed(ua, va)
+    numberOfVaValues = len(va)
+
+    #Create the datasets.
+    direction_dataset = group.create_dataset('Direction', (1, numberOfVaValues), dtype=numpy.float64, data=directions)
+    speed_dataset = group.create_dataset('Speed', (1, numberOfVaValues), dtype=numpy.float64, data=speeds)
+
+    return min_speed, max_speed
+
+
+#******************************************************************************        
+def create_data_groups(hdf_file, times, ua, va, first_index=0, extents=None, checkpoint=None, checkpoint_interval=1):
+    """Create the data groups in the S-111 file. (One group for each time value)
+
+    :param hdf_file: The S-111 HDF file.
+    :param times: The list of time values from the source data.
+    :param ua: List of velocity values along the x axis in metres per second. (An array of values per time)
+    :param va: List of velocity values along the y axis in metres per second. (An array of values per time)
+    :param first_index: The index of the first time value to create a group for. (Used to resume an import)
+    :param extents: A tuple containing the minimum time, maximum time, minimum speed, and maximum speed of the groups already written.
+    :param checkpoint: Called with the number of groups written, and the extents, after every checkpoint_interval groups and the last group.
+    :param checkpoint_interval: The number of groups created between calls to checkpoint.
+    :returns: A tuple containing the minimum time, maximum time, time interval, minimum speed, and maximum speed of the source data.
+    """
+
+    numberOfTimes = times.shape[0]
+    
+    interval = None
+    minTime = maxTime = None
+    minSpeed = maxSpeed = None
+    if extents != None:
+        minTime, maxTime, minSpeed, maxSpeed = extents
+
+    for index in range(first_index, numberOfTimes):
+
+        newGroupName = 'Group ' + str(index + 1)
+        print("Creating", newGroupName, "dataset.")
+        newGroup = hdf_file.create_group(newGroupName)
+        
+        groupTitle = 'Irregular Grid at DateTime ' + str(index + 1)
+        newGroup.attrs.create('Title', groupTitle.encode())
+
+        #Store the start time.
+        strVal = times[index].tostring().decode()
+        timeVal = iso8601.parse_date(strVal)
+        timeVal = timeVal.astimezone(pytz.utc)
+
+        #Keep track of the min/max time so we can update the metadata
+        if minTime == None:
+            minTime = maxTime = timeVal
+        else:
+            minTime = min(minTime, timeVal)
+            maxTime = max(maxTime, timeVal)
+
+        strVal = timeVal.strftime("%Y%m%dT%H%M%SZ")
+        newGroup.attrs.create('DateTime', strVal.encode())
+
+        groupMinSpeed, groupMaxSpeed = create_direction_speed(newGroup, ua[index], va[index])
+
+        #Keep track of the min/max speed so we can update the metadata
+        if minSpeed == None:
+            minSpeed = groupMinSpeed
+            maxSpeed = groupMaxSpeed
+        else:
+            minSpeed = min(minSpeed, groupMinSpeed)
+            maxSpeed = max(maxSpeed, groupMaxSpeed)
+
+        #Each checkpoint flushes and syncs the file, so only checkpoint every few groups.
+        if checkpoint != None and ((index + 1 - first_index) % checkpoint_interval == 0 or index + 1 == numberOfTimes):
+            checkpoint(index + 1, (minTime, maxTime, minSpeed, maxSpeed))
+
+    #Figure out what the interval is between the times (use only the first)
+    if numberOfTimes > 1:
+
+        strVal = times[0].tostring().decode()
+        firstTimeVal = iso8601.parse_date(strVal)
+        firstTimeVal = firstTimeVal.astimezone(pytz.utc)
+
+        strVal = times[1].tostring().decode()
+        secondTimeVal = iso8601.parse_date(strVal)
+        secondTimeVal = secondTimeVal.astimezone(pytz.utc)
+
+        interval = secondTimeVal - firstTimeVal
+
+    return (minTime, maxTime, interval, minSpeed, maxSpeed)
+
+
+#******************************************************************************        
+def update_metadata(hdf_file, numberOfTimes, numberOfValues, minTime, maxTime, interval, minX, minY, maxX, maxY, minSpeed, maxSpeed):
+    """Update the S-111 file's metadata.
+
+    :param hdf_file: The S-111 HDF file.
+    :param numberOfTimes: The number of times in the source data.
+    :param numberOfValues: The number of values per record in the source data.
+    :param minTime: The minimum temporal extents of the source data.
+    :param maxTime: The maximum temporal extents of the source data.
+    :param interval: The time interval between records of the source data.
+    :param minX: The minimum x coordinate of the source data.
+    :param minY: The minimum y coordinate of the source data.
+    :param maxX: The maximum x coordinate of the source data.
+    :param maxY: The maximum y coordinate of the source data.
+    :param minSpeed: The minimum surface speed of the source data.
+    :param maxSpeed: The maximum surface speed of the source data.
+    """
+
+    #Set the correct coding format.
+    hdf_file.attrs.create('dataCodingFormat', 3, dtype=numpy.int64)
+
+    #Set the number of times.
+    hdf_file.attrs.create('numberOfTimes', numberOfTimes, dtype=numpy.int64)
+
+    #Set the number of nodes.
+    hdf_file.attrs.create('numberOfNodes', numberOfValues, dtype=numpy.int64)
+    
+    #Set the time interval (if we have one)
+    if interval != None:
+        intervalInSeconds = interval.total_seconds()
+        hdf_file.attrs.create('timeRecordInterval', intervalInSeconds, dtype=numpy.int64)
+
+    #Update the temporal extents in the metadata.
+    strVal = minTime.strftime("%Y%m%dT%H%M%SZ")
+    hdf_file.attrs.create('dateTimeOfFirstRecord', strVal.encode())
+    strVal = maxTime.strftime("%Y%m%dT%H%M%SZ")
+    hdf_file.attrs.create('dateTimeOfLastRecord', strVal.encode())
+
+    #Update the geo coverage in the metadata. (These are not set anymore... since 1.09)
+    #hdf_file.attrs.create('westBoundLongitude', minX, dtype=numpy.float64)
+    #hdf_file.attrs.create('eastBoundLongitude', maxX, dtype=numpy.float64)
+    #hdf_file.attrs.create('southBoundLatitude', minY, dtype=numpy.float64)
+    #hdf_file.attrs.create('northBoundLatitude', maxY, dtype=numpy.float64)
+
+    #Update the surface speed values.
+    if 'minSurfCurrentSpeed' in hdf_file.attrs:
+        minSpeed = min(minSpeed, hdf_file.attrs['minSurfCurrentSpeed'])
+
+    if 'maxSurfCurrentSpeed' in hdf_file.attrs:
+        maxSpeed = max(maxSpeed, hdf_file.attrs['maxSurfCurrentSpeed'])
+
+    hdf_file.attrs.create('minSurfCurrentSpeed', minSpeed)
+    hdf_file.attrs.create('maxSurfCurrentSpeed', maxSpeed)
+
+
+#******************************************************************************
+def encode_extents(extents):
+    """Convert the extents returned while creating the data groups to JSON serializable values.
+
+    :param extents: A tuple containing the minimum time, maximum time, minimum speed, and maximum speed.
+    :returns: A list of strings and floats.
+    """
+
+    minTime, maxTime, minSpeed, maxSpeed = extents
+    return [minTime.isoformat(), maxTime.isoformat(), float(minSpeed), float(maxSpeed)]
+
+
+#******************************************************************************
+def decode_extents(values):
+    """Convert the values from encode_extents() back to extents.
+
+    :param values: The list returned by encode_extents(), may be None.
+    :returns: A tuple containing the minimum time, maximum time, minimum speed, and maximum speed, None if no values were given.
+    """
+
+    if values == None:
+        return None
+
+    return (iso8601.parse_date(values[0]), iso8601.parse_date(values[1]), values[2], values[3])
+
+
+#******************************************************************************
+def read_grid_variables(grid_file):
+    """Retrieve and verify the variables of an irregular grid netcdf file.
+
+    :param grid_file: The open netcdf file containing the irregular grid data.
+    :returns: A tuple containing the Times, latc, lonc, ua, and va variables.
+    """
+
+    #Grab the data that we need.
+    times = grid_file.variables['Times']
+    latc = grid_file.variables['latc']
+    lonc = grid_file.variables['lonc']
+    ua = grid_file.variables['ua']
+    va = grid_file.variables['va']
+
+    #Verify that these arrays are the same size.
+    numberOfTimes = times.shape[0]
+    numberOfVaSeries = va.shape[0]
+    numberOfUaSeries = ua.shape[0]
+    if numberOfTimes != numberOfVaSeries or numberOfTimes != numberOfUaSeries:
+        raise Exception('The number of time values does not match the number of speed and distance values.')
+
+    #Verify that these arrays are the same size.
+    numberOfLat = latc.shape[0]
+    numberOfLon = lonc.shape[0]
+    numberOfVaValues = va.shape[1]
+    numberOfUaValues = ua.shape[1]
+    if numberOfLat != numberOfLon:
+        raise Exception('The input latitude and longitude array are different sizes.')
+    elif numberOfLat != numberOfVaValues or numberOfLat != numberOfUaValues:
+        raise Exception('The number of positions does not match the number of speed and distance values.')
+
+    #Verify that the input data is in the correct units.
+    vaUnits = va.getncattr('units')
+    uaUnits = ua.getncattr('units')
+    if vaUnits != uaUnits and vaUnits != 'metres s-1':
+        raise Exception('The input velocity data is stored in an unsupported unit.')
+
+    return (times, latc, lonc, ua, va)
+
+
+#******************************************************************************
+def add_irregular_grid(hdf_file, grid_file_name, transaction=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+    """Add an irregular grid dataset to the given S-111 HDF file.
+
+    :param hdf_file: The S-111 HDF file.
+    :param grid_file_name: The netcdf file containing the irregular grid data.
+    :param transaction: The s111_transaction.Transaction the file is edited in, used to checkpoint and resume the import.
+    :param checkpoint_interval: The number of groups written between the transaction's checkpoints.
+    """
+
+    #Open the grid file.
+    with netCDF4.Dataset(grid_file_name, "r", format="NETCDF4") as grid_file:
+
+        #Grab the data that we need.
+        times, latc, lonc, ua, va = read_grid_variables(grid_file)
+        numberOfTimes = times.shape[0]
+        numberOfLat = latc.shape[0]
+        numberOfVaValues = va.shape[1]
+
+        print("Adding irregular grid dataset")
+        print("Number of timestamps in source file:", numberOfTimes)
+        print("Number of records for each timestamp:", numberOfLat)
+
+        groupsWritten = 0
+        extents = None
+        checkpoint = None
+
+        #If we are resuming a previous import, pick up after the last group that was fully written.
+        if transaction != None and 'groupsWritten' in transaction.state:
+            groupsWritten = transaction.state['groupsWritten']
+            extents = decode_extents(transaction.state['extents'])
+
+            #Remove the groups written after the last checkpoint.
+            partialIndex = groupsWritten + 1
+            while 'Group ' + str(partialIndex) in hdf_file:
+                del hdf_file['Group ' + str(partialIndex)]
+                partialIndex += 1
+
+            print("Resuming import after", groupsWritten, "groups.")
+
+            xCoordinates = hdf_file['Group XY']['X'][0]
+            yCoordinates = hdf_file['Group XY']['Y'][0]
+            minX, minY, maxX, maxY = (xCoordinates.min(), yCoordinates.min(), xCoordinates.max(), yCoordinates.max())
+        else:
+            #Add the 'Group XY' to store the position information.
+            minX, minY, maxX, maxY = create_xy_group(hdf_file, latc, lonc)
+
+            if transaction != None:
+                transaction.checkpoint(groupsWritten=0, extents=None)
+
+        if transaction != None:
+            checkpoint = lambda count, groupExtents: transaction.checkpoint(groupsWritten=count, extents=encode_extents(groupExtents))
+
+        #Add all of the groups
+        minTime, maxTime, interval, minSpeed, maxSpeed = create_data_groups(hdf_file, times, ua, va,
+                                                                            groupsWritten, extents, checkpoint,
+                                                                            max(1, checkpoint_interval))
+
+        #Update the s-111 file's metadata
+        update_metadata(hdf_file, numberOfTimes, numberOfVaValues,
+                        minTime, maxTime, interval, minX, minY, maxX, maxY,
+                        minSpeed, maxSpeed)
+
+        print("Dataset successfully added")
+
+    #Flush any edits out.
+    hdf_file.flush()
+
@@ -0,0 +1,613 @@
+#******************************************************************************
+#
+#******************************************************************************
+import h5py
+import numpy
+import pytz
+from chs_s111 import station_source
+from chs_s111 import s111_reader
+from chs_s111 import s111_writer
+
+ms2Knots = 1.943844
+
+#The number of decimal places (of a degree) compared when looking for duplicate stations.
+POSITION_DECIMALS = 7
+
+#What to do when a station that already exists is added again.
+DUPLICATE_ACTIONS = ('fail', 'skip', 'replace', 'add')
+
+#The root attributes changed by adding a station, restored when a failed import is resumed.
+STATION_ATTRIBUTES = ('numberOfStations', 'numberOfTimes', 'dataCodingFormat', 'timeRecordInterval',
+                      'dateTimeOfFirstRecord', 'dateTimeOfLastRecord', 'minSurfCurrentSpeed', 'maxSurfCurrentSpeed')
+
+#******************************************************************************
+def update_area_coverage(hdf_file, latitude, longitude):
+    """Update the geographic extents of the S-111 file.
+    
+    :param hdf_file: The S-111 HDF file.
+    :param latitude: The new y coordinate.
+    :param longitude: The new x coordinate.
+    """
+
+    if 'westBoundLongitude' in hdf_file.attrs:
+        westBoundLongitude = hdf_file.attrs['westBoundLongitude']
+        westBoundLongitude = min(westBoundLongitude, longitude)
+    else:
+        westBoundLongitude = longitude
+
+    if 'eastBoundLongitude' in hdf_file.attrs:
+        eastBoundLongitude = hdf_file.attrs['eastBoundLongitude']
+        eastBoundLongitude = max(eastBoundLongitude, longitude)
+    else:
+        eastBoundLongitude = longitude
+
+    if 'southBoundLatitude' in hdf_file.attrs:
+        southBoundLatitude = hdf_file.attrs['southBoundLatitude']
+        southBoundLatitude = min(southBoundLatitude, latitude)
+    else:
+        southBoundLatitude = latitude
+
+    if 'northBoundLatitude' in hdf_file.attrs:
+        northBoundLatitude = hdf_file.attrs['northBoundLatitude']
+        northBoundLatitude = max(northBoundLatitude, latitude)
+    else:
+        northBoundLatitude = latitude
+
+    hdf_file.attrs.create('westBoundLongitude', westBoundLongitude, dtype=numpy.float64)
+    hdf_file.attrs.create('eastBoundLongitude', eastBoundLongitude, dtype=numpy.float64)
+    hdf_file.attrs.create('southBoundLatitude', southBoundLatitude, dtype=numpy.float64)
+    hdf_file.attrs.create('northBoundLatitude', northBoundLatitude, dtype=numpy.float64)
+
+
+#******************************************************************************
+def update_temporal_coverage(hdf_file, start_time, end_time):
+    """Update the temporal extents of the S-111 file.
+    
+    :param hdf_file: The S-111 HDF file.
+    :param start_time: The new start time.
+    :param time_file: The new end time.
+    """
+
+    if 'dateTimeOfFirstRecord' in hdf_file.attrs:
+        dateTimeOfFirstRecord = s111_reader.parse_date_time(hdf_file.attrs['dateTimeOfFirstRecord'])
+        dateTimeOfFirstRecord = min(dateTimeOfFirstRecord, start_time)
+    else:
+        dateTimeOfFirstRecord = start_time
+
+    if 'dateTimeOfLastRecord' in hdf_file.attrs:
+        dateTimeOfLastRecord = s111_reader.parse_date_time(hdf_file.attrs['dateTimeOfLastRecord'])
+        dateTimeOfLastRecord = max(dateTimeOfLastRecord, end_time)
+    else:
+        dateTimeOfLastRecord = end_time
+
+    dateTimeOfFirstRecord = dateTimeOfFirstRecord.astimezone(pytz.utc)
+    strVal = dateTimeOfFirstRecord.strftime("%Y%m%dT%H%M%SZ")
+    hdf_file.attrs.create('dateTimeOfFirstRecord', strVal.encode())
+
+    dateTimeOfLastRecord = dateTimeOfLastRecord.astimezone(pytz.utc)
+    strVal = dateTimeOfLastRecord.strftime("%Y%m%dT%H%M%SZ")
+    hdf_file.attrs.create('dateTimeOfLastRecord', strVal.encode())
+
+
+#******************************************************************************
+def update_current_speed(hdf_file, min_speed, max_speed):
+    """Update the min/max current speed values of the S-111 file.
+    
+    :param hdf_file: The S-111 HDF file.
+    :param min_speed: The minimum current speed value added.
+    :param max_speed: The maximum current speed value added.
+    """
+
+    extents = s111_writer.SpeedExtents()
+    extents.update_range(min_speed, max_speed)
+
+    #Ignore the NaN extents written by earlier versions for stations with masked values.
+    if 'minSurfCurrentSpeed' in hdf_file.attrs and 'maxSurfCurrentSpeed' in hdf_file.attrs:
+        extents.update(numpy.array([hdf_file.attrs['minSurfCurrentSpeed'], hdf_file.attrs['maxSurfCurrentSpeed']], dtype=numpy.float64))
+
+    if extents.min_speed == None:
+        return
+
+    hdf_file.attrs.create('minSurfCurrentSpeed', extents.min_speed)
+    hdf_file.attrs.create('maxSurfCurrentSpeed', extents.max_speed)
+
+
+#******************************************************************************
+def verify_series(hdf_file, time_file):
+    """Verify that a time series can be stored in an S-111 file that already contains stations.
+
+    :param hdf_file: The S-111 HDF file.
+    :param time_file: The StationSource containing the timeseries data.
+    """
+
+    #Make sure this file contains the correct number of times.
+    numTimesInFile = hdf_file.attrs['numberOfTimes']
+    if numTimesInFile != time_file.number_of_records:
+        raise Exception('Number of times in file does not match file header.')
+
+    #Make sure the given file contains the correct type of data.
+    dataCodingFormat = hdf_file.attrs['dataCodingFormat']
+    if dataCodingFormat != 1:
+        raise Exception('The specified S-111 file does not contain time series data.')
+
+    #Make sure the given file has the correct record interval.
+    timeRecordInterval = hdf_file.attrs['timeRecordInterval']
+    intervalInSeconds = time_file.interval.total_seconds()
+    if intervalInSeconds != timeRecordInterval:
+        raise Exception('The specified S-111 file does not match the input time interval.')
+
+
+#******************************************************************************
+def add_series_group(hdf_file, time_file):
+    """Add a new timeseries group to the given S-111 HDF file.
+    
+    :param hdf_file: The S-111 HDF file.
+    :param time_file: The StationSource containing the timeseries data.
+    :returns: The newly created group.
+    """
+
+    #Read the file metadata to find out how many time stations we currently have.
+    numCurrentStations = hdf_file.attrs['numberOfStations']
+    
+    #If this is the first station, then we need to initialize a few things.
+    if numCurrentStations == 0:
+
+        #Set the number of times.
+        hdf_file.attrs.create('numberOfTimes', time_file.number_of_records, dtype=numpy.int64)
+
+        #Set the correct coding format.
+        hdf_file.attrs.create('dataCodingFormat', 1, dtype=numpy.int64)
+
+        #Set the correct record interval.
+        intervalInSeconds = time_file.interval.total_seconds()
+        hdf_file.attrs.create('timeRecordInterval', intervalInSeconds, dtype=numpy.int64)
+
+        x_dataset = numpy.empty((1, 1), dtype=numpy.float64)
+        x_dataset[0][0] = time_file.longitude
+
+        y_dataset = numpy.empty((1, 1), dtype=numpy.float64)
+        y_dataset[0][0] = time_file.latitude
+
+        #Add the 'Group XY' to store the position information.
+        xy_group = hdf_file.create_group('Group XY')
+
+        #Add the x and y datasets to the xy group.
+        xy_group.create_dataset('X', (1, 1), maxshape=(1, None), dtype=numpy.float64, data=x_dataset)
+        xy_group.create_dataset('Y', (1, 1), maxshape=(1, None), dtype=numpy.float64, data=y_dataset)       
+        
+
+    #Else this is not a new file, so lets verify a few things.
+    else:
+
+        verify_series(hdf_file, time_file)
+
+        #Update the XY group with the position information of this time series file.
+        xy_group = hdf_file['Group XY']
+
+        x_dataset = xy_group['X']
+        x_dataset.resize((1, numCurrentStations+1))
+        x_dataset[(0, numCurrentStations)] = time_file.longitude
+
+        y_dataset = xy_group['Y']
+        y_dataset.resize((1, numCurrentStations+1))
+        y_dataset[(0, numCurrentStations)] = time_file.latitude
+
+    
+            
+    #Update the area coverage information. (These are not set anymore, since 1.09)
+    #update_area_coverage(hdf_file, time_file.latitude, time_file.longitude)
+
+    #Update the temporal information.
+    update_temporal_coverage(hdf_file, time_file.start_time, time_file.end_time)
+
+    #Increment the number of time stations and store it back in the file.
+    numCurrentStations += 1
+    hdf_file.attrs.create('numberOfStations', numCurrentStations, dtype=numpy.int64)
+        
+    #Create the new group
+    newGroupName = 'Group ' + str(numCurrentStations)
+    newGroup = hdf_file.create_group(newGroupName)
+    
+    #Store the title
+    newGroupTitle = 'Station No. ' + str(numCurrentStations)
+    newGroup.attrs.create('Title', newGroupTitle.encode())
+
+    #Store the start time.
+    strVal = time_file.start_time.strftime("%Y%m%dT%H%M%SZ")
+    newGroup.attrs.create('DateTime', strVal.encode())
+
+    print("Created tide station group #", str(numCurrentStations))
+
+    return newGroup
+
+
+#******************************************************************************    
+def add_series_datasets(group, time_file):
+    """Add the timeseries data to the specified HDF group.
+    
+    :param group: The HDF group to add the speed and direction datasets to.
+    :param time_file: The StationSource containing the timeseries data.
+    :returns: A tuple containing the minimum and maximum speed values added.
+    """
+
+    directions, speeds, min_speed, max_speed = read_series_values(time_file)
+
+    #Create a new dataset.
+    group.create_dataset('Direction', (1, time_file.number_of_records), dtype=numpy.float64, data=directions)
+    group.create_dataset('Speed', (1, time_file.number_of_records), dtype=numpy.float64, data=speeds)
+
+    return (min_speed, max_speed)
+
+
+#******************************************************************************
+def read_series_values(time_file):
+    """Read the direction and speed values of a time series.
+
+    :param time_file: The StationSource containing the timeseries data.
+    :returns: A tuple containing the direction and speed arrays, and the minimum and maximum speed values.
+    """
+
+    min_speed = None
+    max_speed = None
+
+    directions =  numpy.empty((1, time_file.number_of_records), dtype=numpy.float64)
+    speeds = numpy.empty((1, time_file.number_of_records), dtype=numpy.float64)
+
+    print("Adding direction and speed information...")
+
+    #Copy each block of values from the source, converting the speeds to knots.
+    offset = 0
+    for blockDirections, blockSpeeds in time_file.read_blocks():
+        numberOfValues = len(blockSpeeds)
+        if offset + numberOfValues > time_file.number_of_records:
+            raise Exception('The time series contains more records than specified.')
+
+        directions[0, offset:offset + numberOfValues] = blockDirections
+        speeds[0, offset:offset + numberOfValues] = blockSpeeds
+        speeds[0, offset:offset + numberOfValues] *= ms2Knots
+        offset += numberOfValues
+
+    if offset != time_file.number_of_records:
+        raise Exception('The time series contains fewer records than specified.')
+
+    #Find the min/max speed values. (Masked NetCDF values are NaN, and ignored)
+    extents = s111_writer.SpeedExtents()
+    extents.update(speeds)
+    min_speed = extents.min_speed
+    max_speed = extents.max_speed
+
+    return (directions, speeds, min_speed, max_speed)
+
+
+#******************************************************************************
+class StationIndex:
+    """A hash index of the stations in an S-111 time series file.
+
+    Stations are indexed by their quantized position, and optionally by the
+    station identifier from the ASCII header, so a station that has already
+    been added can be found without scanning the whole file.
+    """
+
+    #******************************************************************************
+    def __init__(self, hdf_file, match_identifier=False):
+        """Build the index from the stations currently in the file.
+
+        :param hdf_file: The S-111 HDF file.
+        :param match_identifier: True if stations should also be matched by their identifier.
+        """
+
+        self.match_identifier = match_identifier
+        self.positions = dict()
+        self.identifiers = dict()
+
+        numCurrentStations = int(hdf_file.attrs['numberOfStations'])
+        if numCurrentStations == 0:
+            return
+
+        xy_group = hdf_file['Group XY']
+        longitudes = xy_group['X'][0, :numCurrentStations]
+        latitudes = xy_group['Y'][0, :numCurrentStations]
+        for index in range(0, numCurrentStations):
+            self.positions.setdefault(position_key(longitudes[index], latitudes[index]), index)
+
+        if match_identifier:
+            for index in range(0, numCurrentStations):
+                attributes = hdf_file['Group ' + str(index + 1)].attrs
+                if 'stationIdentifier' in attributes:
+                    identifier = attributes['stationIdentifier']
+                    if isinstance(identifier, bytes):
+                        identifier = identifier.decode()
+                    self.identifiers.setdefault(identifier, index)
+
+
+    #******************************************************************************
+    def find(self, time_file):
+        """Find a station matching the given time series.
+
+        :param time_file: The StationSource containing the timeseries data.
+        :returns: The zero based index of the matching station, None if there isn't one.
+        """
+
+        index = self.positions.get(position_key(time_file.longitude, time_file.latitude))
+        if index is None and self.match_identifier and time_file.station_identifier:
+            index = self.identifiers.get(time_file.station_identifier)
+
+        return index
+
+
+    #******************************************************************************
+    def add(self, index, time_file):
+        """Add a station to the index.
+
+        :param index: The zero based index of the station.
+        :param time_file: The StationSource containing the timeseries data.
+        """
+
+        self.positions.setdefault(position_key(time_file.longitude, time_file.latitude), index)
+        if self.match_identifier and time_file.station_identifier:
+            self.identifiers.setdefault(time_file.station_identifier, index)
+
+
+    #******************************************************************************
+    def move(self, index, longitude, latitude, time_file):
+        """Re-key a station whose position changed when it was replaced.
+
+        :param index: The zero based index of the station.
+        :param longitude: The previous x coordinate of the station.
+        :param latitude: The previous y coordinate of the station.
+        :param time_file: The StationSource containing the new timeseries data.
+        """
+
+        oldKey = position_key(longitude, latitude)
+        if self.positions.get(oldKey) == index:
+            del self.positions[oldKey]
+
+        self.add(index, time_file)
+
+
+#******************************************************************************
+def position_key(longitude, latitude):
+    """Quantize a station position so it can be used as a hash key.
+
+    :param longitude: The x coordinate of the station.
+    :param latitude: The y coordinate of the station.
+    :returns: A tuple of integers, identical for positions within about a centimetre.
+    """
+
+    scale = 10 ** POSITION_DECIMALS
+    return (int(round(float(longitude) * scale)), int(round(float(latitude) * scale)))
+
+
+#******************************************************************************
+def replace_series_datasets(hdf_file, index, time_file):
+    """Replace the timeseries data of an existing station, in place.
+
+    :param hdf_file: The S-111 HDF file.
+    :param index: The zero based index of the station to replace.
+    :param time_file: The StationSource containing the timeseries data.
+    :returns: A tuple containing the minimum and maximum speed values added.
+    """
+
+    verify_series(hdf_file, time_file)
+
+    group = hdf_file['Group ' + str(index + 1)]
+
+    #A station matched by its identifier may have moved.
+    xy_group = hdf_file['Group XY']
+    xy_group['X'][0, index] = time_file.longitude
+    xy_group['Y'][0, index] = time_file.latitude
+
+    directions, speeds, min_speed, max_speed = read_series_values(time_file)
+    old_speeds = group['Speed'][0]
+    group['Direction'][...] = directions
+    group['Speed'][...] = speeds
+
+    #If the old values defined the speed extents of the file, the extents have to be recomputed.
+    old_extents = s111_writer.SpeedExtents()
+    old_extents.update(old_speeds)
+    if old_extents.min_speed != None and 'minSurfCurrentSpeed' in hdf_file.attrs and \
+       (old_extents.min_speed <= hdf_file.attrs['minSurfCurrentSpeed'] or old_extents.max_speed >= hdf_file.attrs['maxSurfCurrentSpeed']):
+        recompute_current_speed(hdf_file)
+
+    #Store the start time.
+    strVal = time_file.start_time.strftime("%Y%m%dT%H%M%SZ")
+    group.attrs.create('DateTime', strVal.encode())
+
+    update_temporal_coverage(hdf_file, time_file.start_time, time_file.end_time)
+
+    print("Replaced tide station group #", str(index + 1))
+
+    return (min_speed, max_speed)
+
+
+#******************************************************************************
+def recompute_current_speed(hdf_file):
+    """Recompute the min/max current speed values of the S-111 file from all of its stations.
+
+    :param hdf_file: The S-111 HDF file.
+    """
+
+    extents = s111_writer.SpeedExtents()
+    for index in range(0, int(hdf_file.attrs['numberOfStations'])):
+        extents.update(hdf_file['Group ' + str(index + 1)]['Speed'][0])
+
+    if extents.min_speed != None:
+        hdf_file.attrs.create('minSurfCurrentSpeed', extents.min_speed)
+        hdf_file.attrs.create('maxSurfCurrentSpeed', extents.max_speed)
+
+
+#******************************************************************************
+def add_timeseries(hdf_file, time_series_file, on_duplicate='fail', station_index=None, match_identifier=False):
+    """Add a time series station to the given S-111 HDF file.
+
+    :param hdf_file: The S-111 HDF file.
+    :param time_series_file: The name of the file containing the time series (see station_source.open_station_source()), or a StationSource.
+    :param on_duplicate: What to do if the station already exists. (One of DUPLICATE_ACTIONS)
+    :param station_index: The StationIndex of the file, built if not specified.
+    :param match_identifier: True if stations should also be matched by their identifier.
+    """
+
+    if on_duplicate not in DUPLICATE_ACTIONS:
+        raise Exception('Unsupported duplicate station action ' + str(on_duplicate) + '.')
+
+    #Sources handed to us are left open for the caller.
+    if isinstance(time_series_file, station_source.StationSource):
+        add_station_source(hdf_file, time_series_file, on_duplicate, station_index, match_identifier)
+        return
+
+    #Open the direction and speed files.
+    time_file = station_source.open_station_source(time_series_file)
+    try:
+        add_station_source(hdf_file, time_file, on_duplicate, station_index, match_identifier)
+    finally:
+        time_file.close()
+
+
+#******************************************************************************
+def add_station_source(hdf_file, time_file, on_duplicate='fail', station_index=None, match_identifier=False):
+    """Add the time series station of a StationSource to the given S-111 HDF file.
+
+    :param hdf_file: The S-111 HDF file.
+    :param time_file: The StationSource containing the timeseries data.
+    :param on_duplicate: What to do if the station already exists. (One of DUPLICATE_ACTIONS)
+    :param station_index: The StationIndex of the file, built if not specified.
+    :param match_identifier: True if stations should also be matched by their identifier.
+    """
+
+    print("Successfully opened time series file containing", str(time_file.number_of_records), "records.")
+
+    if station_index is None:
+        station_index = StationIndex(hdf_file, match_identifier)
+
+    #Check if we already have this station.
+    existing = station_index.find(time_file)
+    if existing is not None and on_duplicate != 'add':
+
+        if on_duplicate == 'fail':
+            raise Exception('The station in ' + str(time_file.file_name) + ' already exists as Group ' + str(existing + 1) + '.')
+
+        if on_duplicate == 'skip':
+            print("Information: The station already exists as Group", str(existing + 1), "and has been skipped.")
+            return
+
+        xy_group = hdf_file['Group XY']
+        oldLongitude = xy_group['X'][0, existing]
+        oldLatitude = xy_group['Y'][0, existing]
+
+        min_speed, max_speed = replace_series_datasets(hdf_file, existing, time_file)
+        station_index.move(existing, oldLongitude, oldLatitude, time_file)
+
+    else:
+        #Add a new group for the series.
+        new_group = add_series_group(hdf_file, time_file)
+        if station_index.match_identifier and time_file.station_identifier:
+            new_group.attrs.create('stationIdentifier', time_file.station_identifier.encode())
+
+        station_index.add(int(hdf_file.attrs['numberOfStations']) - 1, time_file)
+
+        #Add the direction and speed
+        min_speed, max_speed = add_series_datasets(new_group, time_file)
+
+    #Update the min/max speed in the metadata.
+    update_current_speed(hdf_file, min_speed, max_speed)
+
+    #Flush any edits out.
+    hdf_file.flush()
+
+
+#******************************************************************************
+def encode_station_state(hdf_file):
+    """Capture the station count, positions, and root attributes of the file as JSON serializable values.
+
+    :param hdf_file: The S-111 HDF file.
+    :returns: A dictionary with the number of positions in 'Group XY' and the STATION_ATTRIBUTES values.
+    """
+
+    attributes = dict()
+    for name in STATION_ATTRIBUTES:
+        if name in hdf_file.attrs:
+            value = hdf_file.attrs[name]
+            if isinstance(value, bytes):
+                value = value.decode()
+            elif isinstance(value, numpy.integer):
+                value = int(value)
+            elif isinstance(value, numpy.floating):
+                value = float(value)
+            attributes[name] = value
+
+    positions = hdf_file['Group XY']['X'].shape[1] if 'Group XY' in hdf_file else 0
+
+    return {'positions': positions, 'attributes': attributes}
+
+
+#******************************************************************************
+def restore_station_state(hdf_file, state):
+    """Roll back a station that was only partly added, to the state captured by encode_station_state().
+
+    :param hdf_file: The S-111 HDF file.
+    :param state: The values returned by encode_station_state().
+    """
+
+    attributes = state['attributes']
+    numberOfStations = attributes.get('numberOfStations', 0)
+
+    #Remove the groups created after the checkpoint.
+    index = numberOfStations + 1
+    while 'Group ' + str(index) in hdf_file:
+        del hdf_file['Group ' + str(index)]
+        index += 1
+
+    positions = state['positions']
+    if 'Group XY' in hdf_file:
+        if positions == 0:
+            del hdf_file['Group XY']
+        else:
+            hdf_file['Group XY']['X'].resize((1, positions))
+            hdf_file['Group XY']['Y'].resize((1, positions))
+
+    for name in STATION_ATTRIBUTES:
+        if name not in attributes:
+            if name in hdf_file.attrs:
+                del hdf_file.attrs[name]
+            continue
+
+        value = attributes[name]
+        if isinstance(value, str):
+            hdf_file.attrs.create(name, value.encode())
+        elif isinstance(value, int):
+            hdf_file.attrs.create(name, value, dtype=numpy.int64)
+        else:
+            hdf_file.attrs.create(name, value, dtype=numpy.float64)
+
+
+#******************************************************************************
+def add_timeseries_files(hdf_file, time_series_files, on_duplicate='fail', match_identifier=False, transaction=None):
+    """Add several time series stations to the given S-111 HDF file.
+
+    :param hdf_file: The S-111 HDF file.
+    :param time_series_files: The names of the files (or the StationSources) containing the time series.
+    :param on_duplicate: What to do if a station already exists. (One of DUPLICATE_ACTIONS)
+    :param match_identifier: True if stations should also be matched by their identifier.
+    :param transaction: The s111_transaction.Transaction the file is edited in, used to checkpoint and resume the import.
+    """
+
+    #Skip the files that were added by a previous attempt.
+    filesWritten = 0
+    if transaction != None:
+        filesWritten = transaction.state.get('filesWritten', 0)
+
+        #Roll back a station that was only partly added when the previous attempt failed.
+        if 'stations' in transaction.state:
+            restore_station_state(hdf_file, transaction.state['stations'])
+            print("Resuming import after", filesWritten, "time series files.")
+        else:
+            transaction.checkpoint(filesWritten=0, stations=encode_station_state(hdf_file))
+
+    #Build the station index once for all of the time series.
+    station_index = StationIndex(hdf_file, match_identifier)
+
+    for index in range(filesWritten, len(time_series_files)):
+        add_timeseries(hdf_file, time_series_files[index], on_duplicate, station_index)
+
+        if transaction != None:
+            transaction.checkpoint(filesWritten=index + 1, stations=encode_station_state(hdf_file))
@@ -0,0 +1,289 @@
+#******************************************************************************
+#
+#******************************************************************************
+from collections import deque
+from datetime import timedelta
+import numpy
+from chs_s111 import s111_reader
+from chs_s111 import s111_writer
+from chs_s111 import s111_io_profile
+
+#The supported aggregate statistics.
+STATISTICS = ('max', 'min', 'mean', 'flood', 'ebb')
+
+#******************************************************************************
+class Accumulator:
+    """A vectorized accumulator of speed and direction values.
+
+    Each call to add() accumulates one value per element (node, station or
+    window), so the memory used only depends on the number of elements.
+    """
+
+    #******************************************************************************
+    def __init__(self, number_of_values, statistic, flood_direction=0.0):
+        """Create a new accumulator.
+
+        :param number_of_values: The number of elements accumulated in parallel.
+        :param statistic: The statistic to compute. (One of STATISTICS)
+        :param flood_direction: The direction (in degrees) of the flood current, used by the flood and ebb statistics.
+        """
+
+        if statistic not in STATISTICS:
+            raise Exception('Unsupported statistic ' + str(statistic) + '.')
+
+        self.statistic = statistic
+        self.flood_direction = flood_direction
+        self.count = numpy.zeros(number_of_values, dtype=numpy.int64)
+
+        if statistic in ('max', 'min'):
+            self.best_speed = numpy.full(number_of_values, numpy.nan)
+            self.best_direction = numpy.full(number_of_values, numpy.nan)
+        else:
+            self.sum_speed = numpy.zeros(number_of_values)
+            self.sum_u = numpy.zeros(number_of_values)
+            self.sum_v = numpy.zeros(number_of_values)
+
+
+    #******************************************************************************
+    def add(self, speeds, directions):
+        """Accumulate one value per element.
+
+        :param speeds: The speed values.
+        :param directions: The direction values (in degrees).
+        """
+
+        self._accumulate(speeds, directions, 1)
+
+
+    #******************************************************************************
+    def remove(self, speeds, directions):
+        """Remove values previously accumulated with add(). (Not supported by max and min)
+
+        :param speeds: The speed values.
+        :param directions: The direction values (in degrees).
+        """
+
+        if self.statistic in ('max', 'min'):
+            raise Exception('Values cannot be removed from a ' + self.statistic + ' accumulator.')
+
+        self._accumulate(speeds, directions, -1)
+
+
+    #******************************************************************************
+    def result(self):
+        """Compute the aggregate values.
+
+        Elements that did not accumulate any values are set to NaN.
+
+        :returns: A tuple containing the speed and direction arrays.
+        """
+
+        if self.statistic in ('max', 'min'):
+            return (self.best_speed.copy(), self.best_direction.copy())
+
+        valid = self.count > 0
+        speeds = numpy.full(self.count.shape, numpy.nan)
+        speeds[valid] = self.sum_speed[valid] / self.count[valid]
+
+        #The direction is that of the mean velocity vector.
+        directions = numpy.full(self.count.shape, numpy.nan)
+        directions[valid] = s111_writer.vector_directions(self.sum_u[valid], self.sum_v[valid])
+
+        return (speeds, directions)
+
+
+    #******************************************************************************
+    def _accumulate(self, speeds, directions, sign):
+        """Add (sign = 1) or remove (sign = -1) values from the accumulator."""
+
+        valid = ~numpy.isnan(speeds)
+
+        if self.statistic in ('max', 'min'):
+            if self.statistic == 'max':
+                better = valid & ~(speeds <= self.best_speed)
+            else:
+                better = valid & ~(speeds >= self.best_speed)
+            self.best_speed = numpy.where(better, speeds, self.best_speed)
+            self.best_direction = numpy.where(better, directions, self.best_direction)
+            self.count += valid
+            return
+
+        #Flood values are within 90 degrees of the flood direction, everything else is ebb.
+        if self.statistic in ('flood', 'ebb'):
+            difference = numpy.abs(numpy.mod(directions - self.flood_direction + 180.0, 360.0) - 180.0)
+            if self.statistic == 'flood':
+                valid &= difference < 90.0
+            else:
+                valid &= difference >= 90.0
+
+        radians = numpy.radians(directions)
+        speeds = numpy.where(valid, speeds, 0.0)
+
+        self.count += sign * valid
+        self.sum_speed += sign * speeds
+        self.sum_u += sign * numpy.where(valid, speeds * numpy.sin(radians), 0.0)
+        self.sum_v += sign * numpy.where(valid, speeds * numpy.cos(radians), 0.0)
+
+
+#******************************************************************************
+def aggregate_file(input_file, output_file, statistic, window, rolling=False, flood_direction=0.0):
+    """Create a new S-111 file containing aggregates of the input file.
+
+    With window aggregation, each block of 'window' consecutive records is
+    reduced to a single record, stamped with the time of its first record. Any
+    incomplete block at the end is dropped. With rolling aggregation, every
+    record is replaced by the aggregate of the 'window' records ending at it.
+
+    :param input_file: The name of the S-111 file to aggregate.
+    :param output_file: The name of the S-111 file to create.
+    :param statistic: The statistic to compute. (One of STATISTICS)
+    :param window: The number of records in each window.
+    :param rolling: True for a rolling aggregate, False for fixed windows.
+    :param flood_direction: The direction (in degrees) of the flood current, used by the flood and ebb statistics.
+    """
+
+    if window < 1:
+        raise Exception('The window must contain at least one record.')
+
+    with s111_reader.S111Reader(input_file, group_cache_size=4) as reader:
+
+        interval = reader.time_record_interval
+        if interval is None and reader.number_of_times > 1:
+            raise Exception('The specified S-111 file does not have a time record interval.')
+
+        with s111_io_profile.open_file(output_file, 'w') as hdf_file:
+            s111_writer.copy_metadata(reader.hdf_file, hdf_file)
+
+            if reader.data_coding_format == 1:
+                aggregate_stations(reader, hdf_file, statistic, window, rolling, flood_direction)
+            elif reader.data_coding_format == 3:
+                aggregate_timesteps(reader, hdf_file, statistic, window, rolling, flood_direction)
+            else:
+                raise Exception('The specified S-111 file does not contain time series or irregular grid data.')
+
+            #Describe how the product was derived.
+            method = ('Rolling ' if rolling else '') + statistic + ' over ' + str(window) + ' records'
+            hdf_file.attrs.create('methodCurrentsProduct', method.encode())
+
+
+#******************************************************************************
+def aggregate_stations(reader, hdf_file, statistic, window, rolling, flood_direction):
+    """Aggregate each station of a time series file along its time axis.
+
+    :param reader: The S111Reader of the input file.
+    :param hdf_file: The output S-111 HDF file.
+    :param statistic: The statistic to compute.
+    :param window: The number of records in each window.
+    :param rolling: True for a rolling aggregate, False for fixed windows.
+    :param flood_direction: The direction (in degrees) of the flood current.
+    """
+
+    interval = reader.time_record_interval or timedelta(0)
+    numberOfTimes = reader.number_of_times
+
+    if rolling:
+        numberOfOutputTimes = max(0, numberOfTimes - window + 1)
+        outputInterval = interval
+        startOffset = (window - 1) * interval
+    else:
+        numberOfOutputTimes = numberOfTimes // window
+        outputInterval = window * interval
+        startOffset = timedelta(0)
+
+    if numberOfOutputTimes == 0:
+        raise Exception('The window is longer than the time series.')
+
+    firstTime = lastTime = None
+    extents = s111_writer.SpeedExtents()
+    stations = reader.stations
+
+    for station in stations:
+
+        speeds, directions = reader.group_values(station.index)
+        accumulator = Accumulator(numberOfOutputTimes, statistic, flood_direction)
+
+        #Each element of the accumulator is one output record, so add one offset at a time.
+        for offset in range(0, window):
+            if rolling:
+                accumulator.add(speeds[offset:offset + numberOfOutputTimes], directions[offset:offset + numberOfOutputTimes])
+            else:
+                accumulator.add(speeds[offset:numberOfOutputTimes * window:window], directions[offset:numberOfOutputTimes * window:window])
+
+        outputSpeeds, outputDirections = accumulator.result()
+        extents.update(outputSpeeds)
+
+        startTime = station.date_time + startOffset
+        endTime = startTime + (numberOfOutputTimes - 1) * outputInterval
+        firstTime = startTime if firstTime is None else min(firstTime, startTime)
+        lastTime = endTime if lastTime is None else max(lastTime, endTime)
+
+        s111_writer.write_data_group(hdf_file, station.index, station.title, startTime, outputSpeeds, outputDirections)
+
+    s111_writer.update_computed_metadata(hdf_file, 1, len(stations), numberOfOutputTimes, 0,
+                                         outputInterval, firstTime, lastTime, extents)
+
+
+#******************************************************************************
+def aggregate_timesteps(reader, hdf_file, statistic, window, rolling, flood_direction):
+    """Aggregate the timesteps of an irregular grid file, one timestep at a time.
+
+    :param reader: The S111Reader of the input file.
+    :param hdf_file: The output S-111 HDF file.
+    :param statistic: The statistic to compute.
+    :param window: The number of records in each window.
+    :param rolling: True for a rolling aggregate, False for fixed windows.
+    :param flood_direction: The direction (in degrees) of the flood current.
+    """
+
+    numberOfNodes = reader.number_of_nodes
+    timesteps = reader.timesteps
+    interval = reader.time_record_interval
+
+    outputTimes = []
+    extents = s111_writer.SpeedExtents()
+
+    def write_result(date_time, accumulator):
+        speeds, directions = accumulator.result()
+        extents.update(speeds)
+        groupTitle = 'Irregular Grid at DateTime ' + str(len(outputTimes) + 1)
+        s111_writer.write_data_group(hdf_file, len(outputTimes), groupTitle, date_time, speeds, directions)
+        outputTimes.append(date_time)
+
+    if rolling:
+        #Only the records inside the window are kept, so memory is bounded by window x nodes.
+        history = deque()
+        accumulator = Accumulator(numberOfNodes, statistic, flood_direction)
+        for timestep in timesteps:
+            values = reader.group_values(timestep.index)
+            history.append(values)
+
+            if statistic in ('max', 'min'):
+                if len(history) > window:
+                    history.popleft()
+                if len(history) == window:
+                    accumulator = Accumulator(numberOfNodes, statistic, flood_direction)
+                    for speeds, directions in history:
+                        accumulator.add(speeds, directions)
+            else:
+                accumulator.add(*values)
+                if len(history) > window:
+                    accumulator.remove(*history.popleft())
+
+            if len(history) == window:
+                write_result(timestep.date_time, accumulator)
+
+        outputInterval = interval
+    else:
+        for start in range(0, len(timesteps) - window + 1, window):
+            accumulator = Accumulator(numberOfNodes, statistic, flood_direction)
+            for index in range(start, start + window):
+                accumulator.add(*reader.group_values(index))
+            write_result(timesteps[start].date_time, accumulator)
+
+        outputInterval = window * interval if interval is not None else None
+
+    if not outputTimes:
+        raise Exception('The window is longer than the time series.')
+
+    s111_writer.update_computed_metadata(hdf_file, 3, len(outputTimes), len(outputTimes), numberOfNodes,
+                                         outputInterval, outputTimes[0], outputTimes[-1], extents)
@@ -0,0 +1,338 @@
+#******************************************************************************
+#
+#******************************************************************************
+from collections import OrderedDict
+from datetime import timedelta
+import numpy
+from chs_s111 import s111_reader
+from chs_s111 import s111_writer
+from chs_s111 import s111_io_profile
+
+#The value of the archiveFormat attribute of an archive file.
+ARCHIVE_FORMAT = 's111-delta-1'
+
+#The default number of timesteps between keyframes.
+DEFAULT_KEYFRAME_INTERVAL = 24
+
+#The default quantization step (in knots) of the u/v values.
+DEFAULT_QUANTUM = 0.001
+
+#The quantized value stored for nodes without a value.
+MISSING = numpy.iinfo(numpy.int32).min
+
+#The default number of decoded timesteps kept in memory by an archive reader.
+DEFAULT_FRAME_CACHE_SIZE = 4
+
+#******************************************************************************
+def frame_name(index):
+    """Retrieve the name of the frame dataset of a timestep.
+
+    :param index: The zero based index of the timestep.
+    :returns: The name of the dataset.
+    """
+
+    return 'Frames/Frame ' + str(index + 1)
+
+
+#******************************************************************************
+def quantize(speeds, directions, quantum):
+    """Convert speed and direction values to quantized u/v values.
+
+    :param speeds: A 1D array of speed values (knots).
+    :param directions: A 1D array of direction values (degrees).
+    :param quantum: The quantization step (knots).
+    :returns: A (2, N) int64 array of the quantized u and v values, MISSING where there is no value.
+    """
+
+    radians = numpy.radians(directions)
+    vectors = numpy.stack([speeds * numpy.sin(radians), speeds * numpy.cos(radians)])
+
+    missing = numpy.isnan(vectors).any(axis=0)
+    quantized = numpy.rint(numpy.where(missing, 0.0, vectors) / quantum).astype(numpy.int64)
+    quantized[:, missing] = MISSING
+
+    return quantized
+
+
+#******************************************************************************
+def dequantize(quantized, quantum):
+    """Convert quantized u/v values back to speed and direction values.
+
+    :param quantized: A (2, N) array of the quantized u and v values.
+    :param quantum: The quantization step (knots).
+    :returns: A tuple containing the speed (knots) and direction (degrees) values as 1D NumPy arrays.
+    """
+
+    missing = (quantized == MISSING).any(axis=0)
+    u = quantized[0] * quantum
+    v = quantized[1] * quantum
+
+    speeds = numpy.hypot(u, v)
+    directions = s111_writer.vector_directions(u, v)
+    speeds[missing] = numpy.nan
+    directions[missing] = numpy.nan
+
+    return (speeds, directions)
+
+
+#******************************************************************************
+def smallest_integer_type(values):
+    """Find the smallest signed integer type that can hold the given values."""
+
+    if values.size == 0:
+        return numpy.int8
+
+    low = values.min()
+    high = values.max()
+    for dtype in (numpy.int8, numpy.int16, numpy.int32):
+        limits = numpy.iinfo(dtype)
+        if low >= limits.min and high <= limits.max:
+            return dtype
+
+    return numpy.int64
+
+
+#******************************************************************************
+def write_frame(archive_file, index, values, keyframe):
+    """Write the (key or delta) frame of a timestep, compressed.
+
+    :param archive_file: The archive HDF file.
+    :param index: The zero based index of the timestep.
+    :param values: A (2, N) array of quantized u/v values, or of their differences from the previous timestep.
+    :param keyframe: True if the values are a keyframe.
+    """
+
+    numberOfNodes = values.shape[1]
+    chunks = (2, max(1, min(numberOfNodes, 256 * 1024)))
+
+    dataset = archive_file.create_dataset(frame_name(index), data=values.astype(smallest_integer_type(values)),
+                                          chunks=chunks, compression='gzip', compression_opts=6, shuffle=True)
+    dataset.attrs.create('keyframe', 1 if keyframe else 0, dtype=numpy.int8)
+
+
+#******************************************************************************
+def archive_file(input_file, output_file, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, quantum=DEFAULT_QUANTUM):
+    """Encode an irregular grid S-111 file as a compact archive.
+
+    Every keyframe_interval'th timestep is stored as a keyframe of quantized
+    u/v values, and the timesteps in between as the difference of their
+    quantized values from the previous timestep. Consecutive timesteps of a
+    forecast are highly correlated, so the differences are small integers,
+    which are stored in the smallest integer type that holds them and
+    compressed. Because the differences are taken between quantized values the
+    error never accumulates: every timestep is restored to within half a
+    quantum of its u and v values.
+
+    :param input_file: The name of the irregular grid S-111 file.
+    :param output_file: The name of the archive file to create.
+    :param keyframe_interval: The number of timesteps between keyframes, so at most keyframe_interval - 1 deltas are read to restore a timestep.
+    :param quantum: The quantization step (knots) of the u/v values.
+    :returns: A tuple containing the size (in bytes) of the speed and direction values in the input file, and of the frames in the archive.
+    """
+
+    if keyframe_interval < 1:
+        raise Exception('The keyframe interval must be at least 1.')
+
+    if not quantum > 0.0:
+        raise Exception('The quantization step must be greater than 0.')
+
+    originalSize = 0
+    archiveSize = 0
+
+    with s111_reader.S111Reader(input_file, group_cache_size=1, prefetch=0) as reader:
+
+        if reader.data_coding_format != 3:
+            raise Exception('The specified S-111 file does not contain irregular grid data.')
+
+        with s111_io_profile.open_file(output_file, 'w') as archive:
+
+            #Keep all of the metadata, so the S-111 file can be restored.
+            for name, value in reader.hdf_file.attrs.items():
+                archive.attrs[name] = value
+            if 'Group XY' in reader.hdf_file:
+                reader.hdf_file.copy('Group XY', archive)
+
+            archive.attrs.create('archiveFormat', ARCHIVE_FORMAT.encode())
+            archive.attrs.create('keyframeInterval', keyframe_interval, dtype=numpy.int64)
+            archive.attrs.create('quantum', quantum, dtype=numpy.float64)
+
+            numberOfTimes = reader.number_of_times
+            dateTimes = [s111_reader.format_date_time(reader.group_date_time(index)) for index in range(0, numberOfTimes)]
+            titles = [reader.group_attribute(index, 'Title', '').encode() for index in range(0, numberOfTimes)]
+            archive.create_dataset('DateTime', data=numpy.array(dateTimes, dtype='S16'))
+            archive.create_dataset('Title', data=numpy.array(titles, dtype=bytes))
+
+            archive.create_group('Frames')
+
+            previous = None
+            for index in range(0, numberOfTimes):
+                group = reader.hdf_file[s111_reader.group_name(index)]
+                speeds = group['Speed'][0]
+                directions = group['Direction'][0]
+                originalSize += group['Speed'].id.get_storage_size() + group['Direction'].id.get_storage_size()
+
+                quantized = quantize(speeds, directions, quantum)
+
+                if index % keyframe_interval == 0:
+                    write_frame(archive, index, quantized, True)
+                else:
+                    write_frame(archive, index, quantized - previous, False)
+
+                archiveSize += archive[frame_name(index)].id.get_storage_size()
+                previous = quantized
+
+    return (originalSize, archiveSize)
+
+
+#******************************************************************************
+class S111Archive:
+    """Random access to the timesteps of an archive created by archive_file().
+
+    A timestep is restored from its keyframe and the deltas after it. The most
+    recently restored timesteps are cached, so reading the timesteps in order
+    only reads one delta per timestep.
+    """
+
+    #******************************************************************************
+    def __init__(self, file_name, frame_cache_size=DEFAULT_FRAME_CACHE_SIZE):
+        """Open an archive.
+
+        :param file_name: The name of the archive file.
+        :param frame_cache_size: The number of restored timesteps to keep in memory.
+        """
+
+        self.file_name = file_name
+        self.archive_file = s111_io_profile.open_file(file_name, 'r')
+
+        if s111_reader.decode_attribute(self.archive_file.attrs.get('archiveFormat')) != ARCHIVE_FORMAT:
+            self.archive_file.close()
+            raise Exception(file_name + ' is not an S-111 archive.')
+
+        self.keyframe_interval = int(self.archive_file.attrs['keyframeInterval'])
+        self.quantum = float(self.archive_file.attrs['quantum'])
+        self.number_of_times = int(self.archive_file.attrs['numberOfTimes'])
+        self.frame_cache_size = max(1, frame_cache_size)
+        self._frames = OrderedDict()
+
+
+    #******************************************************************************
+    def __enter__(self):
+        return self
+
+
+    #******************************************************************************
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    #******************************************************************************
+    def close(self):
+        """Close the archive file."""
+
+        self.archive_file.close()
+        self._frames.clear()
+
+
+    #******************************************************************************
+    def date_time(self, index):
+        """Retrieve the DateTime of a timestep.
+
+        :param index: The zero based index of the timestep.
+        :returns: The DateTime in UTC.
+        """
+
+        return s111_reader.parse_date_time(self.archive_file['DateTime'][index])
+
+
+    #******************************************************************************
+    def title(self, index):
+        """Retrieve the Title of a timestep.
+
+        :param index: The zero based index of the timestep.
+        :returns: The title of the timestep's data group.
+        """
+
+        return s111_reader.decode_attribute(self.archive_file['Title'][index])
+
+
+    #******************************************************************************
+    def quantized_values(self, index):
+        """Restore the quantized u/v values of a timestep.
+
+        :param index: The zero based index of the timestep.
+        :returns: A read only (2, N) int64 array of the quantized u and v values.
+        """
+
+        if index < 0 or index >= self.number_of_times:
+            raise IndexError('Timestep index out of range.')
+
+        if index in self._frames:
+            self._frames.move_to_end(index)
+            return self._frames[index]
+
+        #Start from the closest timestep we already have, or the keyframe.
+        keyframe = index - index % self.keyframe_interval
+        start = keyframe
+        for cached in self._frames:
+            if keyframe < cached < index and cached > start:
+                start = cached
+
+        if start in self._frames:
+            values = self._frames[start].copy()
+        else:
+            values = self.archive_file[frame_name(start)][()].astype(numpy.int64)
+
+        for step in range(start + 1, index + 1):
+            values += self.archive_file[frame_name(step)][()]
+
+        values.flags.writeable = False
+        self._frames[index] = values
+        while len(self._frames) > self.frame_cache_size:
+            self._frames.popitem(last=False)
+
+        return values
+
+
+    #******************************************************************************
+    def values(self, index):
+        """Restore the speed and direction values of a timestep.
+
+        :param index: The zero based index of the timestep.
+        :returns: A tuple containing the speed (knots) and direction (degrees) values as 1D NumPy arrays.
+        """
+
+        return dequantize(self.quantized_values(index), self.quantum)
+
+
+#******************************************************************************
+def restore_file(input_file, output_file):
+    """Restore an irregular grid S-111 file from an archive.
+
+    :param input_file: The name of the archive file.
+    :param output_file: The name of the S-111 file to create.
+    """
+
+    with S111Archive(input_file) as archive:
+        with s111_io_profile.open_file(output_file, 'w') as hdf_file:
+            source = archive.archive_file
+
+            s111_writer.copy_metadata(source, hdf_file)
+            for name in ('archiveFormat', 'keyframeInterval', 'quantum'):
+                if name in hdf_file.attrs:
+                    del hdf_file.attrs[name]
+
+            extents = s111_writer.SpeedExtents()
+            for index in range(0, archive.number_of_times):
+                speeds, directions = archive.values(index)
+                s111_writer.write_data_group(hdf_file, index, archive.title(index), archive.date_time(index), speeds, directions)
+                extents.update(speeds)
+
+            interval = source.attrs.get('timeRecordInterval')
+            firstTime = archive.date_time(0) if archive.number_of_times > 0 else None
+            lastTime = archive.date_time(archive.number_of_times - 1) if archive.number_of_times > 0 else None
+            numberOfNodes = int(source.attrs.get('numberOfNodes', 0))
+
+            s111_writer.update_computed_metadata(hdf_file, 3, archive.number_of_times, archive.number_of_times, numberOfNodes,
+                                                 None if interval is None else timedelta(seconds=int(interval)),
+                                                 firstTime, lastTime, extents)
+
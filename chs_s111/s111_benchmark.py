@@ -0,0 +1,184 @@
+#******************************************************************************
+#
+#******************************************************************************
+import contextlib
+from datetime import datetime, timedelta
+import io
+import os
+import statistics
+import tempfile
+import time
+import numpy
+import netCDF4
+from chs_s111 import s111_reader
+from chs_s111 import s111_io_profile
+from chs_s111 import s111_create_file
+from chs_s111 import s111_add_irregular_grid
+
+#The default number of timesteps and nodes of the generated irregular grid.
+DEFAULT_TIMES = 10000
+DEFAULT_NODES = 100
+
+#The default number of times each profile is measured. (The median is reported)
+DEFAULT_RUNS = 3
+
+#The metadata of the generated S-111 files.
+METADATA_HEADER = ['productSpecification', 'nameRegion', 'horizDatumValue', 'surfaceCurrentDepth']
+METADATA_VALUES = ['S-111', 'Benchmark', '4326', '0.5']
+
+#******************************************************************************
+class ProfileResult:
+    """The median timings and file size measured for an I/O profile."""
+
+    #******************************************************************************
+    def __init__(self, profile, create_time, open_time, scan_time, file_size):
+        self.profile = profile
+        self.create_time = create_time
+        self.open_time = open_time
+        self.scan_time = scan_time
+        self.file_size = file_size
+
+
+#******************************************************************************
+def generate_grid_file(file_name, number_of_times, number_of_nodes, seed=0):
+    """Generate an hourly irregular grid netcdf file with random velocities.
+
+    :param file_name: The name of the netcdf file to create.
+    :param number_of_times: The number of timesteps.
+    :param number_of_nodes: The number of nodes.
+    :param seed: The seed of the random number generator.
+    """
+
+    rng = numpy.random.RandomState(seed)
+    start = datetime(2017, 1, 1)
+
+    with netCDF4.Dataset(file_name, 'w', format='NETCDF4') as grid_file:
+        grid_file.createDimension('time', number_of_times)
+        grid_file.createDimension('node', number_of_nodes)
+        grid_file.createDimension('DateStrLen', 19)
+
+        times = [(start + timedelta(hours=index)).strftime('%Y-%m-%dT%H:%M:%S') for index in range(0, number_of_times)]
+        grid_file.createVariable('Times', 'S1', ('time', 'DateStrLen'))[:] = netCDF4.stringtochar(numpy.array(times, dtype='S19'))
+        grid_file.createVariable('latc', 'f4', ('node',))[:] = rng.uniform(44.0, 46.0, number_of_nodes)
+        grid_file.createVariable('lonc', 'f4', ('node',))[:] = rng.uniform(-66.0, -64.0, number_of_nodes)
+
+        for name in ('ua', 'va'):
+            variable = grid_file.createVariable(name, 'f4', ('time', 'node'))
+            variable.units = 'metres s-1'
+            variable[:] = rng.uniform(-1.0, 1.0, (number_of_times, number_of_nodes))
+
+
+#******************************************************************************
+def create_file(directory, grid_file_name, profile):
+    """Create an S-111 file and import the irregular grid into it (create, then add-grid).
+
+    :param directory: The directory to create the file in.
+    :param grid_file_name: The name of the netcdf grid file.
+    :param profile: The name of the I/O profile.
+    :returns: A tuple containing the name of the S-111 file and the time taken (seconds).
+    """
+
+    previous = s111_io_profile.get_io_profile()
+    s111_io_profile.set_io_profile(profile)
+    try:
+        start = time.perf_counter()
+
+        file_name = s111_create_file.create_dataset_from_row(os.path.join(directory, profile), METADATA_HEADER, METADATA_VALUES)
+
+        #The import prints a line for each group, which would be timed too.
+        with contextlib.redirect_stdout(io.StringIO()):
+            with s111_io_profile.open_file(file_name, 'r+') as hdf_file:
+                s111_add_irregular_grid.add_irregular_grid(hdf_file, grid_file_name)
+
+        return (file_name, time.perf_counter() - start)
+
+    finally:
+        s111_io_profile.set_io_profile(previous)
+
+
+#******************************************************************************
+def read_file(file_name, profile):
+    """Time opening an S-111 file, and opening it and reading the DateTime of every group.
+
+    :param file_name: The name of the S-111 file.
+    :param profile: The name of the I/O profile.
+    :returns: A tuple containing the open time and the scan time (seconds).
+    """
+
+    previous = s111_io_profile.get_io_profile()
+    s111_io_profile.set_io_profile(profile)
+    try:
+        start = time.perf_counter()
+        with s111_reader.S111Reader(file_name):
+            pass
+        openTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with s111_reader.S111Reader(file_name) as reader:
+            for index in range(0, reader.number_of_groups):
+                reader.group_date_time(index)
+        scanTime = time.perf_counter() - start
+
+        return (openTime, scanTime)
+
+    finally:
+        s111_io_profile.set_io_profile(previous)
+
+
+#******************************************************************************
+def run_benchmark(profiles=None, number_of_times=DEFAULT_TIMES, number_of_nodes=DEFAULT_NODES, runs=DEFAULT_RUNS):
+    """Measure each I/O profile on the same generated irregular grid.
+
+    :param profiles: The names of the profiles to measure, all of them if not specified.
+    :param number_of_times: The number of timesteps of the grid.
+    :param number_of_nodes: The number of nodes of the grid.
+    :param runs: The number of times each profile is measured.
+    :returns: A list of ProfileResult, one per profile.
+    """
+
+    if not profiles:
+        profiles = sorted(s111_io_profile.IO_PROFILES)
+
+    for profile in profiles:
+        if profile not in s111_io_profile.IO_PROFILES:
+            raise Exception('Unsupported I/O profile ' + str(profile) + '.')
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        gridFileName = os.path.join(directory, 'grid.nc')
+        generate_grid_file(gridFileName, number_of_times, number_of_nodes)
+
+        for profile in profiles:
+            createTimes = []
+            openTimes = []
+            scanTimes = []
+            fileSize = 0
+
+            for run in range(0, max(1, runs)):
+                fileName, createTime = create_file(directory, gridFileName, profile)
+                openTime, scanTime = read_file(fileName, profile)
+
+                createTimes.append(createTime)
+                openTimes.append(openTime)
+                scanTimes.append(scanTime)
+                fileSize = os.path.getsize(fileName)
+                os.remove(fileName)
+
+            results.append(ProfileResult(profile, statistics.median(createTimes), statistics.median(openTimes),
+                                         statistics.median(scanTimes), fileSize))
+
+    return results
+
+
+#******************************************************************************
+def print_results(results):
+    """Print a table of benchmark results.
+
+    :param results: A list of ProfileResult.
+    """
+
+    print('{:<10} {:>10} {:>10} {:>12} {:>12}'.format('Profile', 'Create s', 'Open ms', 'Scan s', 'Size MB'))
+
+    for result in results:
+        print('{:<10} {:>10.1f} {:>10.1f} {:>12.2f} {:>12.1f}'.format(
+            result.profile, result.create_time, result.open_time * 1000.0, result.scan_time, result.file_size / 1e6))
@@ -0,0 +1,337 @@
+#******************************************************************************
+#
+#******************************************************************************
+from datetime import datetime
+import os
+import sqlite3
+import iso8601
+import pytz
+from chs_s111 import s111_reader
+
+#The version of the catalog schema, stored in the database's user_version.
+SCHEMA_VERSION = 1
+
+#The suffixes of the HDF5 files written next to S-111 files that are not products. (Tile files from s111_tiles)
+SIDECAR_SUFFIXES = ('.tiles.h5',)
+
+#******************************************************************************
+class S111CatalogEntry:
+    """The summary information stored in the catalog for a single S-111 file."""
+
+    #******************************************************************************
+    def __init__(self, row):
+        self.path = row['path']
+        self.first_record_time = from_timestamp(row['first_time'])
+        self.last_record_time = from_timestamp(row['last_time'])
+        self.west = row['west']
+        self.south = row['south']
+        self.east = row['east']
+        self.north = row['north']
+        self.data_coding_format = row['coding_format']
+        self.number_of_stations = row['number_of_stations']
+        self.number_of_nodes = row['number_of_nodes']
+        self.number_of_times = row['number_of_times']
+        self.min_speed = row['min_speed']
+        self.max_speed = row['max_speed']
+
+
+#******************************************************************************
+class S111Catalog:
+    """An SQLite index of the temporal and spatial extents of many S-111 files.
+
+    The catalog is built by scanning a directory once. Subsequent refreshes only
+    re-read the files whose modification time or size has changed, and queries
+    are answered from the index without opening any of the HDF5 files.
+    """
+
+    #******************************************************************************
+    def __init__(self, catalog_file):
+        """Open (or create) the catalog.
+
+        :param catalog_file: The name of the SQLite catalog file.
+        """
+
+        self.catalog_file = catalog_file
+        self.connection = sqlite3.connect(catalog_file)
+        self.connection.row_factory = sqlite3.Row
+
+        self.create_schema()
+
+
+    #******************************************************************************
+    def __enter__(self):
+        return self
+
+
+    #******************************************************************************
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    #******************************************************************************
+    def close(self):
+        """Close the catalog."""
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+    #******************************************************************************
+    def create_schema(self):
+        """Create the catalog tables, if they do not already exist."""
+
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+
+        with self.connection:
+            self.connection.execute('DROP TABLE IF EXISTS products')
+            self.connection.execute(
+                """CREATE TABLE products (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    first_time REAL,
+                    last_time REAL,
+                    west REAL,
+                    south REAL,
+                    east REAL,
+                    north REAL,
+                    coding_format INTEGER,
+                    number_of_stations INTEGER,
+                    number_of_nodes INTEGER,
+                    number_of_times INTEGER,
+                    min_speed REAL,
+                    max_speed REAL)""")
+            self.connection.execute('CREATE INDEX products_time ON products (first_time, last_time)')
+            self.connection.execute('CREATE INDEX products_bounds ON products (west, east, south, north)')
+            self.connection.execute('PRAGMA user_version = ' + str(SCHEMA_VERSION))
+
+
+    #******************************************************************************
+    def refresh(self, directory, recursive=True, extension='.h5'):
+        """Bring the catalog up to date with the S-111 files in a directory.
+
+        Only new files, and files whose modification time or size has changed,
+        are opened. Catalog entries for files that no longer exist are removed.
+
+        :param directory: The directory containing the S-111 files.
+        :param recursive: True if sub directories should also be scanned.
+        :param extension: The extension of the S-111 files.
+        :returns: A tuple containing the number of files added or updated, and the number removed.
+        """
+
+        directory = os.path.abspath(directory)
+
+        #Grab what we currently know about the files in this directory.
+        known = dict()
+        prefix = os.path.join(directory, '')
+        cursor = self.connection.execute('SELECT path, mtime, size FROM products WHERE substr(path, 1, ?) = ?',
+                                         (len(prefix), prefix))
+        for row in cursor:
+            if recursive or os.path.dirname(row['path']) == directory:
+                known[row['path']] = (row['mtime'], row['size'])
+
+        updated = 0
+        found = set()
+        with self.connection:
+            for path in find_files(directory, recursive, extension):
+                found.add(path)
+
+                status = os.stat(path)
+                if known.get(path) == (status.st_mtime, status.st_size):
+                    continue
+
+                try:
+                    values = read_summary(path)
+                except (OSError, KeyError, ValueError, iso8601.ParseError) as e:
+                    print("Warning: Unable to catalog", path, "-", e)
+                    continue
+
+                #Archives and tile files are HDF5 files too, but are not products.
+                if values is None:
+                    found.discard(path)
+                    continue
+
+                values['path'] = path
+                values['mtime'] = status.st_mtime
+                values['size'] = status.st_size
+                self.connection.execute(
+                    """INSERT OR REPLACE INTO products VALUES (
+                        :path, :mtime, :size, :first_time, :last_time, :west, :south, :east, :north,
+                        :coding_format, :number_of_stations, :number_of_nodes, :number_of_times,
+                        :min_speed, :max_speed)""", values)
+                updated += 1
+
+            removed = [(path,) for path in known if path not in found]
+            self.connection.executemany('DELETE FROM products WHERE path = ?', removed)
+
+        return (updated, len(removed))
+
+
+    #******************************************************************************
+    def query(self, west=None, south=None, east=None, north=None, start_time=None, end_time=None, data_coding_format=None):
+        """Find the S-111 files that overlap the given area and time range.
+
+        Any criteria that are not specified are ignored.
+
+        :param west: The minimum x coordinate of the area of interest.
+        :param south: The minimum y coordinate of the area of interest.
+        :param east: The maximum x coordinate of the area of interest.
+        :param north: The maximum y coordinate of the area of interest.
+        :param start_time: The start of the time range of interest. (timezone aware datetime)
+        :param end_time: The end of the time range of interest. (timezone aware datetime)
+        :param data_coding_format: Only return files with this coding format.
+        :returns: A list of matching catalog entries, ordered by the time of their first record.
+        """
+
+        clauses = []
+        parameters = []
+
+        if west is not None:
+            clauses.append('east >= ?')
+            parameters.append(west)
+        if east is not None:
+            clauses.append('west <= ?')
+            parameters.append(east)
+        if south is not None:
+            clauses.append('north >= ?')
+            parameters.append(south)
+        if north is not None:
+            clauses.append('south <= ?')
+            parameters.append(north)
+        if start_time is not None:
+            clauses.append('last_time >= ?')
+            parameters.append(to_timestamp(start_time))
+        if end_time is not None:
+            clauses.append('first_time <= ?')
+            parameters.append(to_timestamp(end_time))
+        if data_coding_format is not None:
+            clauses.append('coding_format = ?')
+            parameters.append(data_coding_format)
+
+        sql = 'SELECT * FROM products'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY first_time, path'
+
+        return [S111CatalogEntry(row) for row in self.connection.execute(sql, parameters)]
+
+
+#******************************************************************************
+def find_files(directory, recursive, extension):
+    """Find the S-111 files in a directory.
+
+    :param directory: The directory to search.
+    :param recursive: True if sub directories should also be searched.
+    :param extension: The extension of the S-111 files.
+    :returns: A generator of absolute file names.
+    """
+
+    for root, directories, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(extension) and not name.lower().endswith(SIDECAR_SUFFIXES):
+                yield os.path.join(root, name)
+
+        if not recursive:
+            break
+
+
+#******************************************************************************
+def read_summary(path):
+    """Read the summary information of an S-111 file.
+
+    :param path: The name of the S-111 file.
+    :returns: A dictionary of the catalog column values, None if the file is not an S-111 product.
+    """
+
+    with s111_reader.S111Reader(path) as reader:
+
+        if not is_s111_product(reader.hdf_file):
+            return None
+
+        values = dict()
+        values['first_time'] = to_timestamp(reader.first_record_time)
+        values['last_time'] = to_timestamp(reader.last_record_time)
+        values['coding_format'] = optional_int(reader.data_coding_format)
+        values['number_of_stations'] = reader.number_of_stations
+        values['number_of_nodes'] = reader.number_of_nodes
+        values['number_of_times'] = reader.number_of_times
+        values['min_speed'] = optional_float(reader.attribute('minSurfCurrentSpeed'))
+        values['max_speed'] = optional_float(reader.attribute('maxSurfCurrentSpeed'))
+
+        values['west'] = values['south'] = values['east'] = values['north'] = None
+        if 'Group XY' in reader.hdf_file and reader.longitudes.size > 0:
+            values['west'] = float(reader.longitudes.min())
+            values['east'] = float(reader.longitudes.max())
+            values['south'] = float(reader.latitudes.min())
+            values['north'] = float(reader.latitudes.max())
+
+    return values
+
+
+#******************************************************************************
+def is_s111_product(hdf_file):
+    """Check if an HDF5 file is an S-111 product.
+
+    Archives (see s111_archive) keep the metadata of the file they were made
+    from, and tile files (see s111_tiles) are written next to it, so neither is
+    recognized by its extension alone.
+
+    :param hdf_file: The HDF file.
+    :returns: True if the file is an S-111 product.
+    """
+
+    return 'archiveFormat' not in hdf_file.attrs and 'cellsPerSide' not in hdf_file.attrs
+
+
+#******************************************************************************
+def to_timestamp(value):
+    """Convert a datetime to a POSIX timestamp.
+
+    :param value: The datetime, may be None. (Naive values are assumed to be UTC)
+    :returns: The number of seconds since the epoch, None if no value was given.
+    """
+
+    if value is None:
+        return None
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=pytz.utc)
+
+    return value.timestamp()
+
+
+#******************************************************************************
+def from_timestamp(value):
+    """Convert a POSIX timestamp to a UTC datetime.
+
+    :param value: The number of seconds since the epoch, may be None.
+    :returns: The datetime in UTC, None if no value was given.
+    """
+
+    if value is None:
+        return None
+
+    return datetime.fromtimestamp(value, pytz.utc)
+
+
+#******************************************************************************
+def optional_int(value):
+    """Convert a (possibly missing) attribute value to an int."""
+
+    if value is None:
+        return None
+
+    return int(value)
+
+
+#******************************************************************************
+def optional_float(value):
+    """Convert a (possibly missing) attribute value to a float."""
+
+    if value is None:
+        return None
+
+    return float(value)
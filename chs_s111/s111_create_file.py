@@ -0,0 +1,286 @@
+#******************************************************************************
+#
+#******************************************************************************
+import numpy
+import csv
+import multiprocessing
+import os
+from chs_s111 import s111_io_profile
+
+def clear_metadata_value(attributes, attribute_name):
+    """ Clear the specified attribute value.
+
+    :param attributes: The list of attributes containing the value to be cleared.
+    :param attribute_name: The name of the attribute to be cleared.
+    """
+
+    if attribute_name in attributes:
+        print("Information: The value for", attribute_name, "has been ignored.")
+        del attributes[attribute_name]
+
+#******************************************************************************
+def create_metadata_type_map():
+    """ Create the map of attribute names to attribute types.
+
+    :returns: A dictionary containing the type of each known attribute.
+    """
+
+    typeMap = dict()
+        
+    """
+         Carrier Metadata
+    """
+    #Integer types
+    typeMap['horizDatumValue'] = numpy.int64
+    typeMap['timeRecordInterval'] = numpy.int64
+    typeMap['numberOfTimes'] = numpy.int64
+    typeMap['numberOfStations'] = numpy.int64
+    typeMap['verticalDatum'] = numpy.int64
+    typeMap['numPointsLongitudinal'] = numpy.int64
+    typeMap['numPointsLatitudinal'] = numpy.int64
+    typeMap['minGridPointLongitudinal'] = numpy.int64
+    typeMap['minGridPointLatitudinal'] = numpy.int64
+
+    #Real types
+    typeMap['surfaceCurrentDepth'] = numpy.float64
+    typeMap['gridOriginLongitude'] = numpy.float64
+    typeMap['gridOriginLatitude'] = numpy.float64
+    typeMap['gridSpacingLongitudinal'] = numpy.float64
+    typeMap['gridSpacingLatitudinal'] = numpy.float64
+    typeMap['gridLandMaskValue'] = numpy.float64
+    typeMap['uncertaintyOfSpeed'] = numpy.float64
+    typeMap['uncertaintyOfDirection'] = numpy.float64
+    typeMap['uncertaintyOfHorzPosition'] = numpy.float64
+    typeMap['uncertaintyOfVertPosition'] = numpy.float64
+    typeMap['uncertaintyOfTime'] = numpy.float64
+    typeMap['minSurfCurrentSpeed'] = numpy.float64
+    typeMap['maxSurfCurrentSpeed'] = numpy.float64
+
+    #String types
+    typeMap['productSpecification'] = numpy.bytes_
+    typeMap['dateTimeOfIssue'] = numpy.bytes_
+    typeMap['nameRegion'] = numpy.bytes_
+    typeMap['nameSubregion'] = numpy.bytes_
+    typeMap['horizDatumReference'] = numpy.bytes_
+    typeMap['protectionScheme'] = numpy.bytes_
+    typeMap['dateTimeOfFirstRecord'] = numpy.bytes_
+    typeMap['dateTimeOfLastRecord'] = numpy.bytes_ 
+    typeMap['methodCurrentsProduct'] = numpy.bytes_
+
+    #Enumeration types
+    typeMap['dataProtection'] = numpy.int64
+    typeMap['typeOfCurrentData'] = numpy.int64
+    typeMap['dataCodingFormat'] = numpy.int64
+    typeMap['depthTypeIndex'] = numpy.int64
+
+    #Removed?
+    typeMap['nationalOriginator'] = numpy.bytes_
+    typeMap['producingAgency'] = numpy.bytes_    
+    typeMap['updateApplicationDate'] = numpy.bytes_
+    typeMap['fileName'] = numpy.bytes_
+    typeMap['dataType'] = numpy.bytes_
+    typeMap['methodOrSource'] = numpy.bytes_
+    typeMap['editionNumber'] = numpy.int64
+    typeMap['updateNumber'] = numpy.int64 
+    typeMap['numberOfNodes'] = numpy.int64
+    
+    #Removed in 1.09
+    #typeMap['westBoundLongitude'] = numpy.float64
+    #typeMap['eastBoundLongitude'] = numpy.float64
+    #typeMap['southBoundLatitude'] = numpy.float64
+    #typeMap['northBoundLatitude'] = numpy.float64
+
+    return typeMap
+
+
+#The attribute types, built once when the module is loaded.
+METADATA_TYPES = create_metadata_type_map()
+
+#******************************************************************************
+def get_metadata_type(attribute_name):
+    """ Retrieve the specified attribute's type.
+
+    :param attribute_name: The name of the attribute to retrive the type for.
+    :returns: The attribute's type, None if not found.
+    """
+
+    return METADATA_TYPES.get(attribute_name)
+    
+#******************************************************************************
+def add_metadata(attributes, metadata_file):
+    """ Add metadata values to the S-111 attributes.
+
+    :param attributes: The S-111 attributes to be populated.
+    :param metadata_file: The ASCII CSV file to retrieve the metadata values from.
+    """
+
+    #Grab the header and (first) data row.
+    header, rows = read_metadata_rows(metadata_file)
+    if not rows:
+        raise Exception('The metadata file does not contain any data rows.')
+
+    add_metadata_values(attributes, header, rows[0])
+
+
+#******************************************************************************
+def read_metadata_rows(metadata_file):
+    """ Read the header and all data rows of a metadata file.
+
+    :param metadata_file: The ASCII CSV file to retrieve the metadata values from.
+    :returns: A tuple containing the list of attribute names, and a list of data rows.
+    """
+
+    with open(metadata_file) as csvfile:
+        reader = csv.reader(csvfile)
+
+        header = [name.strip() for name in next(reader)]
+
+        #Skip any blank lines.
+        rows = [row for row in reader if any(col.strip() for col in row)]
+
+    return (header, rows)
+
+
+#******************************************************************************
+def add_metadata_values(attributes, header, data):
+    """ Add the metadata values of a single data row to the S-111 attributes.
+
+    :param attributes: The S-111 attributes to be populated.
+    :param header: The list of attribute names.
+    :param data: The list of attribute values.
+    """
+
+    colnum = 0
+
+    #For each column in the data row...
+    for col in data:
+        attribute_name = header[colnum]
+        attribute_value = col.strip().encode()
+        attribute_type = get_metadata_type(attribute_name)
+
+        #If we don't know what this attribute is, just report it to the user.
+        if attribute_type == None:
+            print("Warning: Unknown metadata value", attribute_name)
+        #Else if this is a string type...
+        elif attribute_type == numpy.bytes_:
+            attributes.create(attribute_name, attribute_value)
+        #Else use the type returned.
+        else:
+            attributes.create(attribute_name, attribute_value, dtype=attribute_type)
+
+        colnum += 1
+
+
+    #We have a few pieces of metadata that may have been specified... but we want to ignore
+    #They are computed attributes.
+    clear_metadata_value(attributes, 'dateTimeOfFirstRecord')
+    clear_metadata_value(attributes, 'dateTimeOfLastRecord')
+    clear_metadata_value(attributes, 'numberOfStations')
+    clear_metadata_value(attributes, 'numberOfTimes')
+    clear_metadata_value(attributes, 'dataCodingFormat')
+    clear_metadata_value(attributes, 'timeRecordInterval')
+    clear_metadata_value(attributes, 'minSurfCurrentSpeed')
+    clear_metadata_value(attributes, 'maxSurfCurrentSpeed')
+
+    #Removed in 1.09
+    #clear_metadata_value(attributes, 'westBoundLongitude')
+    #clear_metadata_value(attributes, 'eastBoundLongitude')
+    #clear_metadata_value(attributes, 'southBoundLatitude')
+    #clear_metadata_value(attributes, 'northBoundLatitude')
+    
+    #Since this is a new file, we don't have any stations yet.
+    attributes.create('numberOfStations', 0, dtype=numpy.int64)
+    attributes.create('numberOfTimes', 0, dtype=numpy.int64)
+
+#******************************************************************************    
+def create_dataset(output_file, metadata_file):
+    """ Create a new S-111 dataset.
+
+    :param output_file: The name of the file to be created.
+    :param metadata_file: The ASCII CSV file to retrieve the metadata values from.
+    """
+
+    #Make sure the output file has the correct extension.
+    filename, file_extension = os.path.splitext(output_file)
+    output_file_with_extension = filename + ".h5"
+
+    #Create the new HDF5 file.
+    with s111_io_profile.open_file(output_file_with_extension, "w") as hdf_file:
+    
+        #Add the metadata to the file.
+        add_metadata(hdf_file.attrs, metadata_file)
+
+
+#******************************************************************************
+def create_dataset_from_row(output_file, header, data, profile=None):
+    """ Create a new S-111 dataset from a single row of metadata values.
+
+    :param output_file: The name of the file to be created.
+    :param header: The list of attribute names.
+    :param data: The list of attribute values.
+    :param profile: The name of the I/O profile to create the file with, the current profile if not specified.
+    :returns: The name of the file created.
+    """
+
+    #Make sure the output file has the correct extension.
+    filename, file_extension = os.path.splitext(output_file)
+    output_file_with_extension = filename + ".h5"
+
+    #Create the new HDF5 file.
+    with s111_io_profile.open_file(output_file_with_extension, "w", profile) as hdf_file:
+
+        #Add the metadata to the file.
+        add_metadata_values(hdf_file.attrs, header, data)
+
+    return output_file_with_extension
+
+
+#******************************************************************************
+def create_datasets(metadata_file, output_directory, processes=1):
+    """ Create a new S-111 dataset for each data row of the metadata file.
+
+    The metadata file is only parsed once. Each file is named using the row's
+    fileName value if there is one, otherwise the name of the metadata file
+    followed by the row number is used.
+
+    :param metadata_file: The ASCII CSV file to retrieve the metadata values from.
+    :param output_directory: The directory the files are created in.
+    :param processes: The number of worker processes used to create the files.
+    :returns: The list of files created.
+    """
+
+    header, rows = read_metadata_rows(metadata_file)
+    baseName = os.path.splitext(os.path.basename(metadata_file))[0]
+
+    fileNameColumn = header.index('fileName') if 'fileName' in header else None
+
+    jobs = []
+    outputFiles = set()
+    for rowIndex, data in enumerate(rows):
+
+        name = None
+        if fileNameColumn is not None and fileNameColumn < len(data):
+            name = data[fileNameColumn].strip()
+        if not name:
+            name = baseName + '_' + str(rowIndex + 1)
+
+        #The files must be created in the output directory.
+        separators = [separator for separator in ('/', '\\', os.sep, os.altsep) if separator]
+        if any(separator in name for separator in separators) or '..' in name:
+            raise Exception('The fileName ' + name + ' in row ' + str(rowIndex + 1) + ' of the metadata file must not contain a path.')
+
+        output_file = os.path.join(output_directory, os.path.splitext(name)[0] + ".h5")
+        if output_file in outputFiles:
+            raise Exception('The metadata file contains more than one row for ' + output_file + '.')
+
+        #Worker processes that are spawned rather than forked don't inherit the current I/O profile.
+        outputFiles.add(output_file)
+        jobs.append((output_file, header, data, s111_io_profile.get_io_profile()))
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    if processes > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(processes) as pool:
+            return pool.starmap(create_dataset_from_row, jobs)
+
+    return [create_dataset_from_row(*job) for job in jobs]
@@ -0,0 +1,232 @@
+#******************************************************************************
+#
+#******************************************************************************
+import os
+import numpy
+from chs_s111 import s111_reader
+
+#The supported export formats.
+FORMATS = ('npy', 'parquet', 'arrow')
+
+#The default maximum number of rows in each row group.
+DEFAULT_ROWS_PER_GROUP = 1024 * 1024
+
+#The exported columns and their types.
+COLUMNS = (('time', 'datetime64[s]'), ('node', numpy.int64), ('longitude', numpy.float64),
+           ('latitude', numpy.float64), ('speed', numpy.float64), ('direction', numpy.float64))
+
+#******************************************************************************
+def export_file(input_file, output, output_format='npy', rows_per_group=DEFAULT_ROWS_PER_GROUP, swmr=False):
+    """Export the speed and direction values of an S-111 file to a columnar format.
+
+    One row is written for each value, with the columns time, node (the station
+    or node index), longitude, latitude, speed and direction. The groups are
+    streamed in blocks of at most rows_per_group rows, so the memory used does
+    not depend on the size of the file.
+
+    :param input_file: The name of the S-111 file to export.
+    :param output: The file to create (parquet, arrow), or the directory to create the column files in (npy).
+    :param output_format: The output format. (One of FORMATS)
+    :param rows_per_group: The maximum number of rows in each row group.
+    :param swmr: True to open the file as a SWMR reader, to export the timesteps published so far.
+    :returns: The number of rows exported.
+    """
+
+    if output_format not in FORMATS:
+        raise Exception('Unsupported export format ' + str(output_format) + '.')
+
+    if rows_per_group < 1:
+        raise Exception('Each row group must contain at least one row.')
+
+    with s111_reader.S111Reader(input_file, group_cache_size=1, prefetch=0, swmr=swmr) as reader:
+
+        if reader.data_coding_format not in (1, 3):
+            raise Exception('The specified S-111 file does not contain time series or irregular grid data.')
+
+        rowGroups = iterate_row_groups(reader, rows_per_group)
+
+        if output_format == 'npy':
+            numberOfRows = sum(group_value_count(reader, index) for index in range(0, reader.number_of_groups))
+            return write_npy(rowGroups, output, numberOfRows)
+
+        return write_arrow(rowGroups, output, output_format)
+
+
+#******************************************************************************
+def group_value_count(reader, index):
+    """Find the number of values of a group that are exported.
+
+    The datasets of a file that is being published (see s111_swmr) can hold
+    more values than the timesteps published so far, so only the values
+    covered by numberOfTimes (stations) or numberOfNodes (grids) are exported.
+
+    :param reader: The S111Reader of the file.
+    :param index: The zero based index of the group.
+    :returns: The number of values.
+    """
+
+    numberOfValues = reader.group_dataset(index, 'Speed').shape[1]
+    if reader.data_coding_format == 1:
+        return min(numberOfValues, reader.number_of_times)
+
+    return min(numberOfValues, reader.number_of_nodes)
+
+
+#******************************************************************************
+def iterate_blocks(reader, rows_per_block):
+    """Read the values of an S-111 file in blocks of columns.
+
+    :param reader: The S111Reader of the file.
+    :param rows_per_block: The maximum number of rows in each block.
+    :returns: A generator of dictionaries, mapping column names to arrays.
+    """
+
+    timeSeries = reader.data_coding_format == 1
+    interval = reader.time_record_interval
+
+    for index in range(0, reader.number_of_groups):
+        speedDataset = reader.group_dataset(index, 'Speed')
+        directionDataset = reader.group_dataset(index, 'Direction')
+        numberOfValues = group_value_count(reader, index)
+        startTime = numpy.datetime64(reader.group_date_time(index).replace(tzinfo=None), 's')
+
+        for start in range(0, numberOfValues, rows_per_block):
+            stop = min(start + rows_per_block, numberOfValues)
+            numberOfRows = stop - start
+
+            block = dict()
+            block['speed'] = speedDataset[0, start:stop]
+            block['direction'] = directionDataset[0, start:stop]
+
+            #Time series groups are one station over time, irregular grid groups are all nodes at one time.
+            if timeSeries:
+                seconds = int(interval.total_seconds()) if interval is not None else 0
+                block['time'] = startTime + numpy.arange(start, stop, dtype=numpy.int64) * numpy.timedelta64(seconds, 's')
+                block['node'] = numpy.full(numberOfRows, index, dtype=numpy.int64)
+                block['longitude'] = numpy.full(numberOfRows, reader.longitudes[index])
+                block['latitude'] = numpy.full(numberOfRows, reader.latitudes[index])
+            else:
+                block['time'] = numpy.full(numberOfRows, startTime)
+                block['node'] = numpy.arange(start, stop, dtype=numpy.int64)
+                block['longitude'] = reader.longitudes[start:stop]
+                block['latitude'] = reader.latitudes[start:stop]
+
+            yield block
+
+
+#******************************************************************************
+def iterate_row_groups(reader, rows_per_group):
+    """Combine the blocks of an S-111 file into row groups.
+
+    :param reader: The S111Reader of the file.
+    :param rows_per_group: The maximum number of rows in each row group.
+    :returns: A generator of dictionaries, mapping column names to arrays.
+    """
+
+    pending = []
+    pendingRows = 0
+
+    for block in iterate_blocks(reader, rows_per_group):
+        numberOfRows = len(block['speed'])
+
+        if pending and pendingRows + numberOfRows > rows_per_group:
+            yield concatenate_blocks(pending)
+            pending = []
+            pendingRows = 0
+
+        pending.append(block)
+        pendingRows += numberOfRows
+
+    if pending:
+        yield concatenate_blocks(pending)
+
+
+#******************************************************************************
+def concatenate_blocks(blocks):
+    """Concatenate several blocks of columns into one.
+
+    :param blocks: A list of dictionaries, mapping column names to arrays.
+    :returns: A dictionary mapping column names to arrays.
+    """
+
+    if len(blocks) == 1:
+        return blocks[0]
+
+    return dict((name, numpy.concatenate([block[name] for block in blocks])) for name, dtype in COLUMNS)
+
+
+#******************************************************************************
+def write_npy(row_groups, output_directory, number_of_rows):
+    """Write the row groups as one NumPy (.npy) file per column.
+
+    The files can be opened with numpy.load(..., mmap_mode='r').
+
+    :param row_groups: A generator of row groups.
+    :param output_directory: The directory to create the column files in.
+    :param number_of_rows: The total number of rows.
+    :returns: The number of rows written.
+    """
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    columns = dict()
+    for name, dtype in COLUMNS:
+        columns[name] = numpy.lib.format.open_memmap(os.path.join(output_directory, name + '.npy'), mode='w+',
+                                                     dtype=dtype, shape=(number_of_rows,))
+
+    offset = 0
+    for rowGroup in row_groups:
+        numberOfRows = len(rowGroup['speed'])
+        for name, dtype in COLUMNS:
+            columns[name][offset:offset + numberOfRows] = rowGroup[name]
+        offset += numberOfRows
+
+    for name, dtype in COLUMNS:
+        columns[name].flush()
+
+    if offset != number_of_rows:
+        raise Exception('Expected ' + str(number_of_rows) + ' rows, but ' + str(offset) + ' were exported.')
+
+    return offset
+
+
+#******************************************************************************
+def write_arrow(row_groups, output_file, output_format):
+    """Write the row groups to a Parquet or Arrow IPC file. (Requires pyarrow)
+
+    :param row_groups: A generator of row groups.
+    :param output_file: The file to create.
+    :param output_format: Either 'parquet' or 'arrow'.
+    :returns: The number of rows written.
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception('The ' + output_format + ' format requires pyarrow. Use the npy format instead.')
+
+    schema = pyarrow.schema([('time', pyarrow.timestamp('s', tz='UTC')), ('node', pyarrow.int64()),
+                             ('longitude', pyarrow.float64()), ('latitude', pyarrow.float64()),
+                             ('speed', pyarrow.float64()), ('direction', pyarrow.float64())])
+
+    if output_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(output_file, schema, compression='zstd')
+    else:
+        writer = pyarrow.ipc.new_file(output_file, schema, options=pyarrow.ipc.IpcWriteOptions(compression='zstd'))
+
+    numberOfRows = 0
+    try:
+        for rowGroup in row_groups:
+            arrays = [pyarrow.array(rowGroup[name], type=schema.field(name).type) for name, dtype in COLUMNS]
+            batch = pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+            if output_format == 'parquet':
+                writer.write_table(pyarrow.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            numberOfRows += batch.num_rows
+    finally:
+        writer.close()
+
+    return numberOfRows
@@ -0,0 +1,608 @@
+#******************************************************************************
+#
+#******************************************************************************
+import contextlib
+from datetime import datetime
+from datetime import timedelta
+import io
+import itertools
+import math
+import os
+import shutil
+import tempfile
+import time
+import h5py
+import numpy
+import pytz
+from chs_s111 import ascii_time_series
+from chs_s111 import s111_add_irregular_grid
+from chs_s111 import s111_add_timeseries
+from chs_s111 import s111_reader
+
+#The conversion from metres per second to knots used by the reference implementations.
+REFERENCE_MS_TO_KNOTS = 1.943844
+
+#The default number of values generated for each case.
+DEFAULT_SIZES = (1000, 100000)
+
+#The tolerances used to compare the results. (Absolute, in degrees or knots)
+DIRECTION_TOLERANCE = 1e-9
+SPEED_TOLERANCE = 1e-9
+
+#Used to give each in memory HDF5 file a unique name.
+_file_counter = itertools.count()
+
+#The UTC offsets (in hours) cycled through by the generated ASCII files, including half hour time zones.
+UTC_OFFSETS = (0.0, 3.5, -2.5, 4.0)
+
+#The position of the generated ASCII stations.
+STATION_LATITUDE = -(44.0 + 37.1234 / 60.0)
+STATION_LONGITUDE = -(65.0 + 12.5 / 60.0)
+
+#The number of stations added by the multi-station case. (Each one is a minute further north)
+NUMBER_OF_STATIONS = 3
+
+#******************************************************************************
+class CaseResult:
+    """The result of running a reference and a candidate implementation on the same input."""
+
+    #******************************************************************************
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.errors = []
+        self.max_direction_error = 0.0
+        self.max_speed_error = 0.0
+        self.reference_time = None
+        self.candidate_time = None
+
+
+    #******************************************************************************
+    @property
+    def passed(self):
+        """True if the candidate matched the reference."""
+        return not self.errors
+
+
+    #******************************************************************************
+    @property
+    def speedup(self):
+        """How many times faster the candidate was than the reference."""
+
+        if not self.candidate_time:
+            return None
+
+        return self.reference_time / self.candidate_time
+
+
+    #******************************************************************************
+    def compare_directions(self, label, expected, actual):
+        """Compare direction values, allowing for the wrap around at 360 degrees.
+
+        :param label: The name of the values in error messages.
+        :param expected: The reference directions.
+        :param actual: The candidate directions.
+        """
+
+        if not self.compare_shapes(label, expected, actual):
+            return
+
+        difference = numpy.abs(numpy.asarray(expected, dtype=numpy.float64) - numpy.asarray(actual, dtype=numpy.float64))
+        difference = numpy.minimum(difference, 360.0 - difference)
+
+        self.max_direction_error = max(self.max_direction_error, float(difference.max(initial=0.0)))
+        self.check_tolerance(label, difference, DIRECTION_TOLERANCE)
+
+
+    #******************************************************************************
+    def compare_speeds(self, label, expected, actual):
+        """Compare speed values.
+
+        :param label: The name of the values in error messages.
+        :param expected: The reference speeds.
+        :param actual: The candidate speeds.
+        """
+
+        if not self.compare_shapes(label, expected, actual):
+            return
+
+        difference = numpy.abs(numpy.asarray(expected, dtype=numpy.float64) - numpy.asarray(actual, dtype=numpy.float64))
+
+        self.max_speed_error = max(self.max_speed_error, float(difference.max(initial=0.0)))
+        self.check_tolerance(label, difference, SPEED_TOLERANCE)
+
+
+    #******************************************************************************
+    def compare_values(self, label, expected, actual):
+        """Compare two values that must be identical.
+
+        :param label: The name of the value in error messages.
+        :param expected: The reference value.
+        :param actual: The candidate value.
+        """
+
+        if expected != actual:
+            self.errors.append(label + ' is ' + str(actual) + ', expected ' + str(expected) + '.')
+
+
+    #******************************************************************************
+    def compare_shapes(self, label, expected, actual):
+        """Make sure two arrays have the same number of values.
+
+        :returns: True if the shapes match.
+        """
+
+        if numpy.shape(expected) != numpy.shape(actual):
+            self.errors.append(label + ' has shape ' + str(numpy.shape(actual)) + ', expected ' + str(numpy.shape(expected)) + '.')
+            return False
+
+        return True
+
+
+    #******************************************************************************
+    def check_tolerance(self, label, difference, tolerance):
+        """Record an error for each group of values outside of the tolerance."""
+
+        outside = numpy.flatnonzero(~(difference <= tolerance))
+        if outside.size > 0:
+            self.errors.append(label + ' differs at ' + str(outside.size) + ' value(s), first at index ' +
+                               str(outside[0]) + ' by ' + str(difference.flat[outside[0]]) + '.')
+
+
+#******************************************************************************
+def generate_velocities(size, seed=0):
+    """Generate u/v velocities, including the values where the direction conventions are easy to get wrong.
+
+    :param size: The number of values to generate.
+    :param seed: The seed of the random number generator.
+    :returns: A tuple containing the u and v values (metres per second) as float32 arrays, like the grid files.
+    """
+
+    random = numpy.random.RandomState(seed)
+    ua = random.uniform(-3.0, 3.0, size)
+    va = random.uniform(-3.0, 3.0, size)
+
+    #Still water, the four axes (including the 0/360 degree wrap), and tiny values.
+    special = [(0.0, 0.0), (0.0, 1.0), (1.0, 0.0), (0.0, -1.0), (-1.0, 0.0),
+               (-1e-7, 1.0), (1e-7, 1.0), (1e-30, -1e-30), (-2.5, 2.5)]
+    for index, (u, v) in enumerate(special[:size]):
+        ua[index] = u
+        va[index] = v
+
+    return ua.astype(numpy.float32), va.astype(numpy.float32)
+
+
+#******************************************************************************
+def generate_ascii_file(file_name, size, utc_offset=0.0, seed=0, latitude=STATION_LATITUDE, longitude=STATION_LONGITUDE):
+    """Generate a CHS ASCII time series file.
+
+    :param file_name: The name of the file to create.
+    :param size: The number of records.
+    :param utc_offset: The number of hours to add to the local times to get UTC.
+    :param seed: The seed of the random number generator.
+    :param latitude: The y coordinate of the station.
+    :param longitude: The x coordinate of the station.
+    :returns: A dictionary of the values written to the header, with the start time in UTC.
+    """
+
+    random = numpy.random.RandomState(seed)
+    directions = random.uniform(0.0, 360.0, size)
+    speeds = random.uniform(0.0, 3.0, size)
+
+    #Include the directions at the wrap around, and still water.
+    for index, direction in enumerate([0.0, 359.99, 360.0][:size]):
+        directions[index] = direction
+    if size > 3:
+        speeds[3] = 0.0
+
+    interval = timedelta(minutes=30)
+    localStart = datetime(2017, 12, 31, 22, 30)
+
+    header = [list(' ' * 80) for row in range(0, 3)]
+
+    def put(row, column, text):
+        header[row][column:column + len(text)] = list(text)
+
+    put(0, 0, 'Golden Station {}'.format(seed))
+    put(0, 65, 'm')
+    put(0, 67, localStart.strftime('%Y/%m/%d'))
+
+    put(1, 13, '{:02d}'.format(int(abs(latitude))))
+    put(1, 16, '{:07.4f}'.format((abs(latitude) - int(abs(latitude))) * 60.0))
+    put(1, 23, 'S' if latitude < 0 else 'N')
+    put(1, 25, '{:03d}'.format(int(abs(longitude))))
+    put(1, 29, '{:07.4f}'.format((abs(longitude) - int(abs(longitude))) * 60.0))
+    put(1, 36, 'W' if longitude < 0 else 'E')
+    put(1, 61, '{:+05.1f}'.format(utc_offset))
+    put(1, 67, localStart.strftime('%H%M'))
+    put(1, 72, localStart.strftime('%S'))
+
+    put(2, 0, '{:10d}'.format(size))
+    put(2, 67, '0030')
+    put(2, 72, '00')
+
+    with open(file_name, 'w') as f:
+        for row in header:
+            f.write(''.join(row) + '\n')
+        for row in range(3, 24):
+            f.write('Header row {}\n'.format(row + 1))
+
+        localTime = localStart
+        for index in range(0, size):
+            f.write('{} {:7.2f} {:6.3f}\n'.format(localTime.strftime('%Y/%m/%d %H:%M'), directions[index], speeds[index]))
+            localTime += interval
+
+    startTime = pytz.utc.localize(localStart) + timedelta(hours=utc_offset)
+    return {'start_time': startTime, 'end_time': startTime + (size - 1) * interval, 'interval': interval,
+            'number_of_records': size, 'latitude': latitude, 'longitude': longitude}
+
+
+#******************************************************************************
+def reference_read_ascii(file_name):
+    """The scalar reference for reading the records of a CHS ASCII time series file.
+
+    :param file_name: The name of the ASCII file.
+    :returns: A tuple containing the record times (UTC, naive), directions, and speeds (m/s).
+    """
+
+    times = []
+    directions = []
+    speeds = []
+
+    with open(file_name, 'r') as f:
+        for rowIndex in range(0, 24):
+            data = f.readline()
+            if rowIndex == 1:
+                deltaToUTC = timedelta(hours=float(data[61:66]))
+            elif rowIndex == 2:
+                numberOfRecords = int(data[0:10])
+
+        for record in range(0, numberOfRecords):
+            components = f.readline().split()
+            times.append(datetime.strptime(components[0] + components[1], '%Y/%m/%d%H:%M') + deltaToUTC)
+            directions.append(float(components[2]))
+            speeds.append(float(components[3]))
+
+    return (times, directions, speeds)
+
+
+#******************************************************************************
+def reference_direction_speed(ua, va):
+    """The scalar reference for converting velocities to directions and speeds.
+
+    :param ua: The velocities along the x axis in metres per second.
+    :param va: The velocities along the y axis in metres per second.
+    :returns: A tuple containing the directions (degrees), speeds (knots), and the minimum and maximum speed.
+    """
+
+    directions = []
+    speeds = []
+    for u_ms, v_ms in zip(ua, va):
+        v_knot = v_ms * REFERENCE_MS_TO_KNOTS
+        u_knot = u_ms * REFERENCE_MS_TO_KNOTS
+
+        speed = math.sqrt(math.pow(u_knot, 2) + math.pow(v_knot, 2))
+        direction = 90.0 - math.degrees(math.atan2(v_knot, u_knot))
+        if direction < 0.0:
+            direction += 360.0
+
+        directions.append(direction)
+        speeds.append(speed)
+
+    return (directions, speeds, min(speeds) if speeds else None, max(speeds) if speeds else None)
+
+
+#******************************************************************************
+def reference_series_values(file_name):
+    """The scalar reference for the direction and speed values stored for a time series.
+
+    :param file_name: The name of the ASCII file.
+    :returns: A tuple containing the directions (degrees), speeds (knots), and the minimum and maximum speed.
+    """
+
+    times, directions, speeds = reference_read_ascii(file_name)
+    speeds = [speed * REFERENCE_MS_TO_KNOTS for speed in speeds]
+
+    return (directions, speeds, min(speeds) if speeds else None, max(speeds) if speeds else None)
+
+
+#******************************************************************************
+def in_memory_group():
+    """Create a group in an in memory HDF5 file, for the implementations that write datasets.
+
+    :returns: A tuple containing the file and the group.
+    """
+
+    fileName = 's111_golden_{}_{}.h5'.format(os.getpid(), next(_file_counter))
+    hdf_file = h5py.File(fileName, 'w', driver='core', backing_store=False)
+    return hdf_file, hdf_file.create_group('Group 1')
+
+
+#******************************************************************************
+def candidate_read_ascii(file_name):
+    """Read a CHS ASCII time series file with AsciiTimeSeries.
+
+    :param file_name: The name of the ASCII file.
+    :returns: A tuple containing the AsciiTimeSeries, directions, and speeds (m/s).
+    """
+
+    time_file = ascii_time_series.AsciiTimeSeries(file_name)
+    try:
+        blocks = list(time_file.read_blocks())
+    finally:
+        time_file.close()
+
+    directions = numpy.concatenate([block[0] for block in blocks]) if blocks else numpy.empty(0)
+    speeds = numpy.concatenate([block[1] for block in blocks]) if blocks else numpy.empty(0)
+
+    return (time_file, directions, speeds)
+
+
+#******************************************************************************
+def candidate_direction_speed(ua, va):
+    """Convert velocities with s111_add_irregular_grid.create_direction_speed().
+
+    :returns: A tuple containing the directions (degrees), speeds (knots), and the minimum and maximum speed.
+    """
+
+    hdf_file, group = in_memory_group()
+    with hdf_file:
+        min_speed, max_speed = s111_add_irregular_grid.create_direction_speed(group, ua, va)
+        return (group['Direction'][0], group['Speed'][0], min_speed, max_speed)
+
+
+#******************************************************************************
+def candidate_series_values(file_name):
+    """Store a time series with s111_add_timeseries.add_series_datasets().
+
+    :returns: A tuple containing the directions (degrees), speeds (knots), and the minimum and maximum speed.
+    """
+
+    time_file = ascii_time_series.AsciiTimeSeries(file_name)
+    hdf_file, group = in_memory_group()
+    with hdf_file:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                min_speed, max_speed = s111_add_timeseries.add_series_datasets(group, time_file)
+        finally:
+            time_file.close()
+
+        return (group['Direction'][0], group['Speed'][0], min_speed, max_speed)
+
+
+#******************************************************************************
+def timed(function, *args):
+    """Run a function, timing it.
+
+    :returns: A tuple containing the function's result and the elapsed time in seconds.
+    """
+
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+#******************************************************************************
+def run_ascii_case(directory, size, seed):
+    """Compare AsciiTimeSeries with the scalar reference, and with the values written to the file."""
+
+    result = CaseResult('AsciiTimeSeries', size)
+
+    utcOffset = UTC_OFFSETS[seed % len(UTC_OFFSETS)]
+    fileName = os.path.join(directory, 'ascii_{}_{}.txt'.format(size, seed))
+    header = generate_ascii_file(fileName, size, utcOffset, seed)
+
+    (times, directions, speeds), result.reference_time = timed(reference_read_ascii, fileName)
+    (time_file, candidateDirections, candidateSpeeds), result.candidate_time = timed(candidate_read_ascii, fileName)
+
+    #The header must match what was written, including the conversion to UTC.
+    for name in ('start_time', 'end_time', 'interval', 'number_of_records'):
+        result.compare_values(name, header[name], getattr(time_file, name))
+    result.compare_speeds('latitude', header['latitude'], time_file.latitude)
+    result.compare_speeds('longitude', header['longitude'], time_file.longitude)
+
+    #The records must be at the times given by the header.
+    if times:
+        result.compare_values('first record time', header['start_time'].replace(tzinfo=None), times[0])
+        result.compare_values('last record time', header['end_time'].replace(tzinfo=None), times[-1])
+
+    #Check the conversion to UTC for each of the time zones, with a few records.
+    for utcOffset in UTC_OFFSETS:
+        offsetFileName = os.path.join(directory, 'offset_{}_{}.txt'.format(utcOffset, seed))
+        offsetHeader = generate_ascii_file(offsetFileName, 3, utcOffset, seed)
+
+        offsetFile = ascii_time_series.AsciiTimeSeries(offsetFileName)
+        try:
+            label = ' (UTC offset ' + str(utcOffset) + ')'
+            result.compare_values('start_time' + label, offsetHeader['start_time'], offsetFile.start_time)
+            result.compare_values('end_time' + label, offsetHeader['end_time'], offsetFile.end_time)
+            result.compare_values('first record time' + label, offsetHeader['start_time'].replace(tzinfo=None),
+                                  offsetFile.read_next_row()[0])
+        finally:
+            offsetFile.close()
+
+    result.compare_directions('direction', directions, candidateDirections)
+    result.compare_speeds('speed', speeds, candidateSpeeds)
+
+    return result
+
+
+#******************************************************************************
+def run_direction_speed_case(directory, size, seed):
+    """Compare create_direction_speed() with the scalar reference."""
+
+    result = CaseResult('create_direction_speed', size)
+
+    ua, va = generate_velocities(size, seed)
+
+    expected, result.reference_time = timed(reference_direction_speed, ua, va)
+    actual, result.candidate_time = timed(candidate_direction_speed, ua, va)
+
+    compare_converted_values(result, expected, actual)
+    return result
+
+
+#******************************************************************************
+def run_series_values_case(directory, size, seed):
+    """Compare add_series_datasets() with the scalar reference."""
+
+    result = CaseResult('add_series_datasets', size)
+
+    utcOffset = UTC_OFFSETS[seed % len(UTC_OFFSETS)]
+    fileName = os.path.join(directory, 'series_{}_{}.txt'.format(size, seed))
+    generate_ascii_file(fileName, size, utcOffset, seed)
+
+    expected, result.reference_time = timed(reference_series_values, fileName)
+    actual, result.candidate_time = timed(candidate_series_values, fileName)
+
+    compare_converted_values(result, expected, actual)
+    return result
+
+
+#******************************************************************************
+def candidate_add_stations(file_names, replacement_file_name):
+    """Add several stations to an S-111 file with s111_add_timeseries.add_timeseries(), then replace one of them.
+
+    :param file_names: The names of the ASCII files of the stations.
+    :param replacement_file_name: The name of the ASCII file replacing a station (at the same position).
+    :returns: The in memory S-111 HDF file, for the caller to check and close.
+    """
+
+    fileName = 's111_golden_{}_{}.h5'.format(os.getpid(), next(_file_counter))
+    hdf_file = h5py.File(fileName, 'w', driver='core', backing_store=False)
+    hdf_file.attrs.create('numberOfStations', 0, dtype=numpy.int64)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for file_name in file_names:
+            s111_add_timeseries.add_timeseries(hdf_file, file_name)
+        s111_add_timeseries.add_timeseries(hdf_file, replacement_file_name, on_duplicate='replace')
+
+    return hdf_file
+
+
+#******************************************************************************
+def run_stations_case(directory, size, seed):
+    """Add several stations to one S-111 file and replace one, comparing each station with the scalar reference."""
+
+    result = CaseResult('add_timeseries stations', size)
+
+    fileNames = []
+    headers = []
+    for station in range(0, NUMBER_OF_STATIONS):
+        fileNames.append(os.path.join(directory, 'station_{}_{}_{}.txt'.format(size, seed, station)))
+        headers.append(generate_ascii_file(fileNames[-1], size, UTC_OFFSETS[(seed + station) % len(UTC_OFFSETS)], seed + station,
+                                           latitude=STATION_LATITUDE + station / 60.0))
+
+    #Replace the second station with new values.
+    replaced = 1
+    replacementFileName = os.path.join(directory, 'replacement_{}_{}.txt'.format(size, seed))
+    headers.append(generate_ascii_file(replacementFileName, size, UTC_OFFSETS[(seed + NUMBER_OF_STATIONS) % len(UTC_OFFSETS)],
+                                       seed + NUMBER_OF_STATIONS, latitude=STATION_LATITUDE + replaced / 60.0))
+
+    expectedFiles = list(fileNames)
+    expectedFiles[replaced] = replacementFileName
+
+    def reference_stations():
+        return [reference_series_values(fileName) for fileName in expectedFiles]
+
+    expected, result.reference_time = timed(reference_stations)
+    hdf_file, result.candidate_time = timed(candidate_add_stations, fileNames, replacementFileName)
+
+    with hdf_file:
+        result.compare_values('numberOfStations', NUMBER_OF_STATIONS, int(hdf_file.attrs['numberOfStations']))
+
+        #The temporal extents are only ever extended, so they include the replaced station.
+        result.compare_values('dateTimeOfFirstRecord', min(header['start_time'] for header in headers),
+                              s111_reader.parse_date_time(hdf_file.attrs['dateTimeOfFirstRecord']))
+        result.compare_values('dateTimeOfLastRecord', max(header['end_time'] for header in headers),
+                              s111_reader.parse_date_time(hdf_file.attrs['dateTimeOfLastRecord']))
+
+        for station in range(0, min(NUMBER_OF_STATIONS, int(hdf_file.attrs['numberOfStations']))):
+            label = 'station ' + str(station + 1) + ' '
+            group = hdf_file['Group ' + str(station + 1)]
+            directions, speeds, min_speed, max_speed = expected[station]
+
+            result.compare_directions(label + 'direction', directions, group['Direction'][0])
+            result.compare_speeds(label + 'speed', speeds, group['Speed'][0])
+            result.compare_values(label + 'DateTime', headers[-1 if station == replaced else station]['start_time'],
+                                  s111_reader.parse_date_time(group.attrs['DateTime']))
+
+        speeds = [speed for values in expected for speed in values[1]]
+        if speeds:
+            result.compare_speeds('minSurfCurrentSpeed', min(speeds), hdf_file.attrs['minSurfCurrentSpeed'])
+            result.compare_speeds('maxSurfCurrentSpeed', max(speeds), hdf_file.attrs['maxSurfCurrentSpeed'])
+
+    return result
+
+
+#******************************************************************************
+def compare_converted_values(result, expected, actual):
+    """Compare the directions, speeds, and speed extents returned by a reference and a candidate."""
+
+    directions, speeds, min_speed, max_speed = expected
+    candidateDirections, candidateSpeeds, candidateMin, candidateMax = actual
+
+    result.compare_directions('direction', directions, candidateDirections)
+    result.compare_speeds('speed', speeds, candidateSpeeds)
+
+    if min_speed is None or candidateMin is None:
+        result.compare_values('speed extents', (min_speed, max_speed), (candidateMin, candidateMax))
+    else:
+        result.compare_speeds('minimum speed', min_speed, candidateMin)
+        result.compare_speeds('maximum speed', max_speed, candidateMax)
+
+
+#The cases run by the harness: name -> function(directory, size, seed)
+CASES = {
+    'ascii': run_ascii_case,
+    'direction-speed': run_direction_speed_case,
+    'series': run_series_values_case,
+    'stations': run_stations_case,
+}
+
+#******************************************************************************
+def run_harness(case_names=None, sizes=DEFAULT_SIZES, seed=0):
+    """Run the reference and current implementations on generated inputs, comparing and timing them.
+
+    :param case_names: The names of the cases to run (see CASES), all of them if not specified.
+    :param sizes: The number of values to generate for each run.
+    :param seed: The seed of the random number generators.
+    :returns: A list of CaseResult.
+    """
+
+    if case_names is None:
+        case_names = list(CASES.keys())
+
+    for name in case_names:
+        if name not in CASES:
+            raise Exception('Unknown case ' + str(name) + '.')
+
+    results = []
+    directory = tempfile.mkdtemp(prefix='s111_golden_')
+    try:
+        for name in case_names:
+            for size in sizes:
+                results.append(CASES[name](directory, size, seed))
+    finally:
+        shutil.rmtree(directory)
+
+    return results
+
+
+#******************************************************************************
+def print_results(results):
+    """Print a table of harness results.
+
+    :param results: A list of CaseResult.
+    """
+
+    print('{:<24} {:>8} {:>6} {:>12} {:>12} {:>12} {:>12} {:>8}'.format(
+        'Case', 'Size', 'Passed', 'Dir error', 'Speed error', 'Reference s', 'Current s', 'Speedup'))
+
+    for result in results:
+        print('{:<24} {:>8} {:>6} {:>12.3g} {:>12.3g} {:>12.4f} {:>12.4f} {:>7.2f}x'.format(
+            result.name, result.size, 'yes' if result.passed else 'NO', result.max_direction_error,
+            result.max_speed_error, result.reference_time, result.candidate_time, result.speedup or 0.0))
+
+        for error in result.errors:
+            print('    Error:', error)
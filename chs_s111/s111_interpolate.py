@@ -0,0 +1,270 @@
+#******************************************************************************
+#
+#******************************************************************************
+from collections import OrderedDict
+import numpy
+import pytz
+from chs_s111 import s111_writer
+
+#The default number of decoded (u/v) slices kept in memory by the interpolator.
+DEFAULT_SLICE_CACHE_SIZE = 64
+
+#******************************************************************************
+class S111Interpolator:
+    """Interpolates the speed and direction values of an S-111 file at arbitrary times.
+
+    The values at the records on either side of the requested time are converted
+    to u/v vectors and interpolated linearly, so directions wrap correctly
+    (i.e. halfway between 350 and 10 degrees is 0 degrees, not 180 degrees).
+
+    For irregular grid files the bracketing timesteps are found with a binary
+    search over the (cached) group times. For time series files the records of
+    each station are evenly spaced, so the bracketing records are computed
+    directly from the station's start time and the time record interval.
+
+    Only the slices needed for the requested nodes (or stations) are read, and
+    the decoded slices are kept in a least recently used cache so repeated
+    queries for the same time don't read from the file again.
+    """
+
+    #******************************************************************************
+    def __init__(self, reader, slice_cache_size=DEFAULT_SLICE_CACHE_SIZE):
+        """Create a new interpolator.
+
+        :param reader: The S111Reader of the file.
+        :param slice_cache_size: The maximum number of decoded slices to keep in memory.
+        """
+
+        if reader.data_coding_format not in (1, 3):
+            raise Exception('The specified S-111 file does not contain time series or irregular grid data.')
+
+        self.reader = reader
+        self.slice_cache_size = max(2, slice_cache_size)
+
+        self._group_times = None
+        self._group_times_count = None
+        self._slices = OrderedDict()
+
+
+    #******************************************************************************
+    @property
+    def group_times(self):
+        """The DateTime of each group as a 1D NumPy array of seconds since the epoch.
+
+        For time series files this is the start time of each station. The times
+        are read again when a refreshed SWMR reader has more timesteps.
+        """
+
+        if self._group_times is None or self._group_times_count != self.reader.number_of_times:
+            self._group_times_count = self.reader.number_of_times
+            times = [self.reader.group_date_time(index).timestamp() for index in range(0, self.reader.number_of_groups)]
+            self._group_times = numpy.array(times, dtype=numpy.float64)
+            self._group_times.flags.writeable = False
+
+        return self._group_times
+
+
+    #******************************************************************************
+    def values_at(self, date_time, nodes=None):
+        """Interpolate the speed and direction values at the specified time.
+
+        :param date_time: The time to interpolate at. (Naive values are assumed to be UTC)
+        :param nodes: The zero based indices of the nodes (or stations) to interpolate, None for all of them.
+        :returns: A tuple containing the speed and direction values as 1D NumPy arrays, in the order of the given nodes.
+        """
+
+        if date_time.tzinfo is None:
+            date_time = pytz.utc.localize(date_time)
+
+        time = date_time.timestamp()
+
+        if self.reader.data_coding_format == 1:
+            numberOfNodes = self.reader.number_of_stations
+        else:
+            numberOfNodes = self.reader.number_of_nodes
+
+        if nodes is None:
+            nodes = numpy.arange(0, numberOfNodes, dtype=numpy.int64)
+        else:
+            nodes = numpy.asarray(nodes, dtype=numpy.int64).reshape(-1)
+            if nodes.size > 0 and (nodes.min() < 0 or nodes.max() >= numberOfNodes):
+                raise IndexError('Node index out of range.')
+
+        if self.reader.data_coding_format == 1:
+            u, v = self._interpolate_stations(time, nodes)
+        else:
+            u, v = self._interpolate_grid(time, nodes)
+
+        return to_speed_direction(u, v)
+
+
+    #******************************************************************************
+    def _interpolate_grid(self, time, nodes):
+        """Interpolate the u/v values of the irregular grid nodes at the specified time.
+
+        :param time: The time to interpolate at, in seconds since the epoch.
+        :param nodes: The zero based indices of the nodes.
+        :returns: A tuple containing the u and v values as 1D NumPy arrays.
+        """
+
+        times = self.group_times
+        if len(times) == 0 or time < times[0] or time > times[-1]:
+            raise Exception('The requested time is outside of the times in ' + self.reader.file_name + '.')
+
+        #Find the last group at or before the requested time.
+        before = int(numpy.searchsorted(times, time, side='right')) - 1
+
+        #Read only the range of nodes that was asked for.
+        first = int(nodes.min()) if nodes.size > 0 else 0
+        last = int(nodes.max()) + 1 if nodes.size > 0 else 0
+        offsets = nodes - first
+
+        u0, v0 = self._grid_slice(before, first, last)
+        if times[before] == time:
+            return u0[offsets], v0[offsets]
+
+        after = before + 1
+        u1, v1 = self._grid_slice(after, first, last)
+        weight = (time - times[before]) / (times[after] - times[before])
+
+        return interpolate(u0[offsets], u1[offsets], weight), interpolate(v0[offsets], v1[offsets], weight)
+
+
+    #******************************************************************************
+    def _interpolate_stations(self, time, stations):
+        """Interpolate the u/v values of the time series stations at the specified time.
+
+        Stations that don't have a record on either side of the requested time are NaN.
+
+        :param time: The time to interpolate at, in seconds since the epoch.
+        :param stations: The zero based indices of the stations.
+        :returns: A tuple containing the u and v values as 1D NumPy arrays.
+        """
+
+        u = numpy.full(stations.size, numpy.nan)
+        v = numpy.full(stations.size, numpy.nan)
+
+        numberOfRecords = self.reader.number_of_times
+        interval = self.reader.time_record_interval
+        seconds = interval.total_seconds() if interval is not None else 0.0
+
+        startTimes = self.group_times
+        for position, station in enumerate(stations):
+            elapsed = time - startTimes[station]
+
+            #Without an interval, only the first record has a known time.
+            if seconds > 0.0:
+                recordPosition = elapsed / seconds
+            else:
+                recordPosition = 0.0 if elapsed == 0.0 else numpy.nan
+
+            if not (0.0 <= recordPosition <= numberOfRecords - 1):
+                continue
+
+            record = min(int(numpy.floor(recordPosition)), numberOfRecords - 1)
+            weight = recordPosition - record
+
+            recordU, recordV = self._station_slice(int(station), record, numberOfRecords)
+            if weight == 0.0:
+                u[position], v[position] = recordU[0], recordV[0]
+            else:
+                u[position] = interpolate(recordU[0], recordU[1], weight)
+                v[position] = interpolate(recordV[0], recordV[1], weight)
+
+        return u, v
+
+
+    #******************************************************************************
+    def _grid_slice(self, index, first, last):
+        """Retrieve the (cached) u/v values of a range of nodes in a timestep.
+
+        :param index: The zero based index of the group.
+        :param first: The index of the first node.
+        :param last: The index after the last node.
+        :returns: A tuple containing the u and v values as 1D NumPy arrays.
+        """
+
+        key = (index, first, last)
+        if key not in self._slices:
+            speeds = self.reader.group_dataset(index, 'Speed')[0, first:last]
+            directions = self.reader.group_dataset(index, 'Direction')[0, first:last]
+            self._cache_slice(key, to_vectors(speeds, directions))
+
+        self._slices.move_to_end(key)
+        return self._slices[key]
+
+
+    #******************************************************************************
+    def _station_slice(self, index, record, number_of_records):
+        """Retrieve the (cached) u/v values of a record and the one after it in a station.
+
+        :param index: The zero based index of the station.
+        :param record: The index of the first record.
+        :param number_of_records: The number of records in the station.
+        :returns: A tuple containing the u and v values as 1D NumPy arrays.
+        """
+
+        #The slice at the last record grows once more records are published, so its length is part of the key.
+        last = min(record + 2, number_of_records)
+        key = (index, record, last)
+        if key not in self._slices:
+            speeds = self.reader.group_dataset(index, 'Speed')[0, record:last]
+            directions = self.reader.group_dataset(index, 'Direction')[0, record:last]
+            self._cache_slice(key, to_vectors(speeds, directions))
+
+        self._slices.move_to_end(key)
+        return self._slices[key]
+
+
+    #******************************************************************************
+    def _cache_slice(self, key, values):
+        """Store a decoded slice in the cache, discarding the least recently used entries.
+
+        :param key: The key of the slice.
+        :param values: The tuple of u and v values.
+        """
+
+        for array in values:
+            array.flags.writeable = False
+
+        self._slices[key] = values
+        while len(self._slices) > self.slice_cache_size:
+            self._slices.popitem(last=False)
+
+
+#******************************************************************************
+def interpolate(first, second, weight):
+    """Interpolate linearly between two values.
+
+    :param first: The value at weight 0.
+    :param second: The value at weight 1.
+    :param weight: The position between the two values.
+    :returns: The interpolated value.
+    """
+
+    return first + (second - first) * weight
+
+
+#******************************************************************************
+def to_vectors(speeds, directions):
+    """Convert speed and direction values to u/v vectors.
+
+    :param speeds: A NumPy array of speed values.
+    :param directions: A NumPy array of direction values (in degrees clockwise from north).
+    :returns: A tuple containing the u (east) and v (north) values.
+    """
+
+    radians = numpy.radians(directions)
+    return speeds * numpy.sin(radians), speeds * numpy.cos(radians)
+
+
+#******************************************************************************
+def to_speed_direction(u, v):
+    """Convert u/v vectors to speed and direction values.
+
+    :param u: A NumPy array of u (east) values.
+    :param v: A NumPy array of v (north) values.
+    :returns: A tuple containing the speed values, and the direction values (in degrees clockwise from north).
+    """
+
+    return numpy.hypot(u, v), s111_writer.vector_directions(u, v)
@@ -0,0 +1,90 @@
+#******************************************************************************
+#
+#******************************************************************************
+import h5py
+
+#The HDF5 file options of each I/O profile, as h5py.File keyword arguments.
+#
+#The 'large' profile is meant for files with thousands of groups:
+# - The 1.10 file format stores the links of large groups in a fractal heap and
+#   v2 B-tree rather than a v1 B-tree and symbol table, which makes the files
+#   smaller and the group lookups cheaper. (Files need HDF5 1.10 or later to read)
+# - Metadata is allocated in 1 MiB blocks, so the object headers of the groups
+#   created one after the other are kept together in the file.
+# - A larger raw data chunk cache is used for the chunked datasets.
+#The paged file space strategy and page buffer were also measured, but made
+#creating and reading a file with 10000 groups slower, so they aren't used.
+IO_PROFILES = {
+    'default': {},
+    'large': {
+        'libver': ('v110', 'v110'),
+        'meta_block_size': 1024 * 1024,
+        'rdcc_nbytes': 64 * 1024 * 1024,
+        'rdcc_nslots': 100003,
+    },
+}
+
+#The file options that only apply when a file is written.
+WRITE_OPTIONS = ('libver', 'meta_block_size')
+
+#The I/O profile used when a profile is not specified.
+_current_profile = 'default'
+
+#******************************************************************************
+def set_io_profile(name):
+    """Set the I/O profile used to open S-111 files.
+
+    :param name: The name of the profile. (One of IO_PROFILES)
+    """
+
+    global _current_profile
+
+    if name not in IO_PROFILES:
+        raise Exception('Unsupported I/O profile ' + str(name) + '.')
+
+    _current_profile = name
+
+
+#******************************************************************************
+def get_io_profile():
+    """Retrieve the name of the I/O profile used to open S-111 files."""
+    return _current_profile
+
+
+#******************************************************************************
+def file_options(mode, profile=None):
+    """Retrieve the h5py.File options of an I/O profile.
+
+    :param mode: The mode the file is opened with.
+    :param profile: The name of the profile, the current profile if not specified.
+    :returns: A dictionary of h5py.File keyword arguments.
+    """
+
+    if profile is None:
+        profile = _current_profile
+
+    options = dict(IO_PROFILES[profile])
+
+    #Files opened read only are never written, so leave their format alone.
+    if mode == 'r':
+        for name in WRITE_OPTIONS:
+            options.pop(name, None)
+
+    return options
+
+
+#******************************************************************************
+def open_file(file_name, mode='r', profile=None, **options):
+    """Open an HDF5 file with the options of an I/O profile.
+
+    :param file_name: The name of the file.
+    :param mode: The mode to open the file with. ('r', 'r+', 'w', ...)
+    :param profile: The name of the profile, the current profile if not specified.
+    :param options: Additional h5py.File keyword arguments, these take precedence over the profile.
+    :returns: The open h5py.File.
+    """
+
+    fileOptions = file_options(mode, profile)
+    fileOptions.update(options)
+
+    return h5py.File(file_name, mode, **fileOptions)
@@ -0,0 +1,257 @@
+#******************************************************************************
+#
+#******************************************************************************
+import h5py
+import numpy
+from chs_s111 import s111_reader
+from chs_s111 import s111_writer
+from chs_s111 import s111_io_profile
+
+#******************************************************************************
+def merge_files(input_files, output_file):
+    """Merge several S-111 files into a new S-111 file.
+
+    Time series files are merged by combining their stations. Irregular grid
+    files are merged by concatenating their timesteps, which must follow on
+    from each other. The data groups are copied with the HDF5 object copy, so
+    the speed and direction values are never read into memory.
+
+    :param input_files: The names of the S-111 files to merge.
+    :param output_file: The name of the S-111 file to create.
+    """
+
+    if not input_files:
+        raise Exception('No input files were specified.')
+
+    readers = []
+    try:
+        for input_file in input_files:
+            readers.append(s111_reader.S111Reader(input_file))
+
+        dataCodingFormat = check_compatibility(readers)
+        if dataCodingFormat == 3:
+            readers, interval = order_timesteps(readers)
+
+        with s111_io_profile.open_file(output_file, 'w') as hdf_file:
+            if dataCodingFormat == 1:
+                merge_stations(readers, hdf_file)
+            else:
+                merge_timesteps(readers, hdf_file, interval)
+
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+#******************************************************************************
+def check_compatibility(readers):
+    """Make sure the given S-111 files can be merged.
+
+    :param readers: The S111Reader of each input file.
+    :returns: The data coding format shared by the files.
+    """
+
+    first = readers[0]
+    dataCodingFormat = first.data_coding_format
+    if dataCodingFormat not in (1, 3):
+        raise Exception(first.file_name + ' does not contain time series or irregular grid data.')
+
+    for reader in readers[1:]:
+        if reader.data_coding_format != dataCodingFormat:
+            raise Exception(reader.file_name + ' has a different data coding format than ' + first.file_name + '.')
+
+        #A grid file with a single timestep has no interval, it is checked when the timesteps are ordered.
+        if dataCodingFormat == 1 and reader.time_record_interval != first.time_record_interval:
+            raise Exception(reader.file_name + ' has a different time record interval than ' + first.file_name + '.')
+
+        #Time series stations must all have the same number of records.
+        if dataCodingFormat == 1 and reader.number_of_times != first.number_of_times:
+            raise Exception(reader.file_name + ' has a different number of times than ' + first.file_name + '.')
+
+        #Irregular grid timesteps must all use the same nodes.
+        if dataCodingFormat == 3:
+            if reader.number_of_nodes != first.number_of_nodes or \
+               not numpy.array_equal(reader.longitudes, first.longitudes) or \
+               not numpy.array_equal(reader.latitudes, first.latitudes):
+                raise Exception(reader.file_name + ' does not have the same nodes as ' + first.file_name + '.')
+
+    return dataCodingFormat
+
+
+#******************************************************************************
+def order_timesteps(readers):
+    """Order irregular grid files by time, making sure each one follows on from the previous one.
+
+    Files with a single timestep have no timeRecordInterval, so when none of the
+    files specify one it is worked out from the DateTimes of neighbouring files.
+
+    :param readers: The S111Reader of each input file.
+    :returns: A tuple containing the list of readers, ordered by the time of their first timestep, and the time interval.
+    """
+
+    readers = sorted(readers, key=lambda reader: first_timestep_time(reader))
+
+    intervals = [file_interval(reader) for reader in readers]
+    intervals = [interval for interval in intervals if interval is not None]
+    for interval in intervals[1:]:
+        if interval != intervals[0]:
+            raise Exception('The files have different time record intervals.')
+
+    interval = intervals[0] if intervals else None
+    if interval is None and len(readers) > 1:
+        interval = first_timestep_time(readers[1]) - last_timestep_time(readers[0])
+
+    for previous, reader in zip(readers[:-1], readers[1:]):
+        if interval is None or interval.total_seconds() <= 0 or \
+           last_timestep_time(previous) + interval != first_timestep_time(reader):
+            raise Exception(reader.file_name + ' does not start one time record interval after ' + previous.file_name + ' ends.')
+
+    return (readers, interval)
+
+
+#******************************************************************************
+def first_timestep_time(reader):
+    """Retrieve the DateTime of the first timestep of an irregular grid file."""
+
+    if reader.number_of_times == 0:
+        raise Exception(reader.file_name + ' does not contain any timesteps.')
+
+    return reader.group_date_time(0)
+
+
+#******************************************************************************
+def last_timestep_time(reader):
+    """Retrieve the DateTime of the last timestep of an irregular grid file."""
+
+    return reader.group_date_time(reader.number_of_times - 1)
+
+
+#******************************************************************************
+def file_interval(reader):
+    """Retrieve the time interval of an irregular grid file.
+
+    :param reader: The S111Reader of the file.
+    :returns: The timeRecordInterval, or the time between the first two timesteps if it isn't specified, None for a single timestep.
+    """
+
+    if reader.time_record_interval is not None:
+        return reader.time_record_interval
+
+    if reader.number_of_times > 1:
+        return reader.group_date_time(1) - reader.group_date_time(0)
+
+    return None
+
+
+#******************************************************************************
+def copy_group(reader, index, hdf_file, new_index):
+    """Copy a data group from an input file into the output file.
+
+    :param reader: The S111Reader of the input file.
+    :param index: The zero based index of the group in the input file.
+    :param hdf_file: The output S-111 HDF file.
+    :param new_index: The zero based index of the group in the output file.
+    :returns: The copied group.
+    """
+
+    sourceName = s111_reader.group_name(index).encode()
+    targetName = s111_reader.group_name(new_index).encode()
+    h5py.h5o.copy(reader.hdf_file.id, sourceName, hdf_file.id, targetName)
+
+    return hdf_file[targetName.decode()]
+
+
+#******************************************************************************
+def merge_stations(readers, hdf_file):
+    """Merge the stations of several time series files.
+
+    :param readers: The S111Reader of each input file.
+    :param hdf_file: The output S-111 HDF file.
+    """
+
+    s111_writer.copy_metadata(readers[0].hdf_file, hdf_file, copy_positions=False)
+
+    firstTime = lastTime = None
+    extents = s111_writer.SpeedExtents()
+    longitudes = []
+    latitudes = []
+    numberOfStations = 0
+
+    for reader in readers:
+        for index in range(0, reader.number_of_stations):
+            newGroup = copy_group(reader, index, hdf_file, numberOfStations)
+            numberOfStations += 1
+
+            newGroupTitle = 'Station No. ' + str(numberOfStations)
+            newGroup.attrs.create('Title', newGroupTitle.encode())
+
+        if reader.number_of_stations > 0:
+            longitudes.append(reader.longitudes)
+            latitudes.append(reader.latitudes)
+
+        firstTime = min_time(firstTime, reader.first_record_time)
+        lastTime = max_time(lastTime, reader.last_record_time)
+        extents.update_range(reader.attribute('minSurfCurrentSpeed'), reader.attribute('maxSurfCurrentSpeed'))
+
+    #Rebuild the XY group, keeping it resizable so more stations can be added later.
+    if numberOfStations > 0:
+        xy_group = hdf_file.create_group('Group XY')
+        x_dataset = numpy.concatenate(longitudes).reshape((1, numberOfStations))
+        y_dataset = numpy.concatenate(latitudes).reshape((1, numberOfStations))
+        xy_group.create_dataset('X', (1, numberOfStations), maxshape=(1, None), dtype=numpy.float64, data=x_dataset)
+        xy_group.create_dataset('Y', (1, numberOfStations), maxshape=(1, None), dtype=numpy.float64, data=y_dataset)
+
+    s111_writer.update_computed_metadata(hdf_file, 1, numberOfStations, readers[0].number_of_times, 0,
+                                         readers[0].time_record_interval, firstTime, lastTime, extents)
+
+
+#******************************************************************************
+def merge_timesteps(readers, hdf_file, interval):
+    """Concatenate the timesteps of several irregular grid files.
+
+    :param readers: The S111Reader of each input file, ordered by time.
+    :param hdf_file: The output S-111 HDF file.
+    :param interval: The time interval between the timesteps, may be None.
+    """
+
+    s111_writer.copy_metadata(readers[0].hdf_file, hdf_file)
+
+    extents = s111_writer.SpeedExtents()
+    numberOfTimes = 0
+
+    for reader in readers:
+        for index in range(0, reader.number_of_times):
+            newGroup = copy_group(reader, index, hdf_file, numberOfTimes)
+            numberOfTimes += 1
+
+            groupTitle = 'Irregular Grid at DateTime ' + str(numberOfTimes)
+            newGroup.attrs.create('Title', groupTitle.encode())
+
+        extents.update_range(reader.attribute('minSurfCurrentSpeed'), reader.attribute('maxSurfCurrentSpeed'))
+
+    s111_writer.update_computed_metadata(hdf_file, 3, numberOfTimes, numberOfTimes, readers[0].number_of_nodes,
+                                         interval, first_timestep_time(readers[0]), last_timestep_time(readers[-1]), extents)
+
+
+#******************************************************************************
+def min_time(current, value):
+    """Retrieve the earliest of two (possibly missing) times."""
+
+    if current is None:
+        return value
+    if value is None:
+        return current
+
+    return min(current, value)
+
+
+#******************************************************************************
+def max_time(current, value):
+    """Retrieve the latest of two (possibly missing) times."""
+
+    if current is None:
+        return value
+    if value is None:
+        return current
+
+    return max(current, value)
@@ -0,0 +1,50 @@
+#******************************************************************************
+#
+#******************************************************************************
+import h5py
+from chs_s111 import s111_reader
+from chs_s111 import s111_io_profile
+
+
+#******************************************************************************
+def print_file(file_name):
+    """Print the contents of an S-111 file.
+
+    :param file_name: The name of the S-111 file.
+    """
+
+    with s111_io_profile.open_file(file_name, 'r') as f:
+
+        print("Product Metadata")
+        for name, value in f.attrs.items():
+            print(name, value, type(value))
+
+        #Files written by the publish command list the timesteps published.
+        if s111_reader.PUBLISHED_TIMES in f:
+            published = f[s111_reader.PUBLISHED_TIMES]
+            print("\n\nPublished timesteps", published.shape[0])
+            if published.shape[0] > 0:
+                print("    First", s111_reader.decode_attribute(published[0]))
+                print("    Last", s111_reader.decode_attribute(published[-1]))
+
+        print("\n\nGroups")
+        for key in f:
+            if not isinstance(f[key], h5py.Group):
+                continue
+
+            print("\nGroup", key)
+            dset = f[key]
+
+            print("    Metadata")
+            for name, value in dset.attrs.items():
+                print("    ", name, value)
+
+            print("    Datasets")
+            for datasetName in dset.keys():
+                print("    ", datasetName)
+
+                dataset = dset[datasetName]
+
+                print("        Type", dataset.dtype)
+                print("        Shape", dataset.shape)
+                print("        Size", dataset.size)
@@ -0,0 +1,541 @@
+#******************************************************************************
+#
+#******************************************************************************
+from collections import OrderedDict
+from datetime import timedelta
+import h5py
+import iso8601
+import pytz
+from chs_s111 import s111_io_profile
+
+#The default size (in bytes) of the HDF5 raw data chunk cache used when opening a file.
+DEFAULT_CHUNK_CACHE_SIZE = 16 * 1024 * 1024
+
+#The default number of decoded groups kept in memory by the reader.
+DEFAULT_GROUP_CACHE_SIZE = 32
+
+#The format of the date time values stored in S-111 files.
+DATE_TIME_FORMAT = "%Y%m%dT%H%M%SZ"
+
+#The dataset listing the DateTime of each timestep published by a SWMR writer. (See s111_swmr)
+PUBLISHED_TIMES = 'Published DateTime'
+
+#******************************************************************************
+class S111GroupView:
+    """A lazy view of a single 'Group N' in an S-111 file.
+
+    For time series files (dataCodingFormat 1) each group is a station, for
+    irregular grid files (dataCodingFormat 3) each group is a timestep. The
+    speed and direction values are only read from the file when first accessed.
+    """
+
+    #******************************************************************************
+    def __init__(self, reader, index):
+        self.reader = reader
+        self.index = index
+        self.name = group_name(index)
+
+
+    #******************************************************************************
+    @property
+    def title(self):
+        """The title of the group."""
+        return self.reader.group_attribute(self.index, 'Title')
+
+
+    #******************************************************************************
+    @property
+    def date_time(self):
+        """The (UTC) DateTime of the group."""
+        return self.reader.group_date_time(self.index)
+
+
+    #******************************************************************************
+    @property
+    def speed(self):
+        """The speed values (in knots) of the group as a 1D NumPy array."""
+        return self.reader.group_values(self.index)[0]
+
+
+    #******************************************************************************
+    @property
+    def direction(self):
+        """The direction values (in degrees) of the group as a 1D NumPy array."""
+        return self.reader.group_values(self.index)[1]
+
+
+    #******************************************************************************
+    @property
+    def longitude(self):
+        """The longitude of the station. (Time series files only)"""
+        return self.reader.longitudes[self.index]
+
+
+    #******************************************************************************
+    @property
+    def latitude(self):
+        """The latitude of the station. (Time series files only)"""
+        return self.reader.latitudes[self.index]
+
+
+    #******************************************************************************
+    @property
+    def times(self):
+        """The time of each record in the station. (Time series files only)"""
+        return self.reader.station_times(self.index)
+
+
+#******************************************************************************
+class S111GroupSequence:
+    """A read only sequence of lazy group views."""
+
+    #******************************************************************************
+    def __init__(self, reader, number_of_groups):
+        self.reader = reader
+        self.number_of_groups = number_of_groups
+
+
+    #******************************************************************************
+    def __len__(self):
+        return self.number_of_groups
+
+
+    #******************************************************************************
+    def __getitem__(self, index):
+
+        if index < 0:
+            index += self.number_of_groups
+
+        if index < 0 or index >= self.number_of_groups:
+            raise IndexError('Group index out of range.')
+
+        return S111GroupView(self.reader, index)
+
+
+#******************************************************************************
+class S111Reader:
+    """Read only access to an S-111 file.
+
+    Attribute values, group DateTime values, and the position information are
+    cached the first time they are requested. The speed and direction values of
+    each group are decoded on demand, and the adjacent groups are prefetched
+    into the least recently used group cache, so sequential traversal finds the
+    next group already decoded. (Each group is still read on its own, since the
+    groups are separate datasets in the file)
+    """
+
+    #******************************************************************************
+    def __init__(self, file_name, chunk_cache_size=None,
+                 group_cache_size=DEFAULT_GROUP_CACHE_SIZE, prefetch=1, swmr=False):
+        """Open the S-111 file.
+
+        :param file_name: The name of the S-111 file to open.
+        :param chunk_cache_size: The size (in bytes) of the HDF5 raw data chunk cache (rdcc_nbytes), taken from the I/O profile if not specified.
+        :param group_cache_size: The maximum number of decoded groups to keep in memory.
+        :param prefetch: The number of groups on either side of a requested group to read into the group cache with it.
+        :param swmr: True to open the file as a SWMR reader, so it can be read while it is being published.
+        """
+
+        self.file_name = file_name
+        self.swmr = swmr
+        self.group_cache_size = max(1, group_cache_size)
+        self.prefetch = max(0, prefetch)
+
+        options = s111_io_profile.file_options('r')
+        options.setdefault('rdcc_nbytes', DEFAULT_CHUNK_CACHE_SIZE)
+        if chunk_cache_size is not None:
+            options['rdcc_nbytes'] = chunk_cache_size
+
+        self.hdf_file = h5py.File(file_name, 'r', swmr=swmr, **options)
+
+        self._attributes = dict()
+        self._group_attributes = dict()
+        self._date_times = dict()
+        self._group_values = OrderedDict()
+        self._longitudes = None
+        self._latitudes = None
+
+        self._load_published_times()
+
+
+    #******************************************************************************
+    def __enter__(self):
+        return self
+
+
+    #******************************************************************************
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    #******************************************************************************
+    def close(self):
+        """Close the S-111 file and release any cached data."""
+
+        if self.hdf_file is not None:
+            self.hdf_file.close()
+            self.hdf_file = None
+
+        self._group_values.clear()
+
+
+    #******************************************************************************
+    def refresh(self):
+        """Pick up the timesteps published since the file was opened (or last refreshed).
+
+        Only the published timesteps are visible, so the values read are always
+        a consistent prefix of the data being written.
+        """
+
+        self._load_published_times()
+
+        #The station values grow with each timestep, so they have to be read again.
+        if self.data_coding_format == 1:
+            self._group_values.clear()
+
+
+    #******************************************************************************
+    def group_dataset(self, index, dataset_name):
+        """Retrieve a dataset of the specified group, refreshed if the file is being published.
+
+        :param index: The zero based index of the group.
+        :param dataset_name: The name of the dataset. ('Speed' or 'Direction')
+        :returns: The h5py dataset.
+        """
+
+        dataset = self.hdf_file[group_name(index)][dataset_name]
+        if self.swmr:
+            dataset.refresh()
+
+        return dataset
+
+
+    #******************************************************************************
+    def attribute(self, attribute_name, default=None):
+        """Retrieve a (cached) attribute value from the root of the S-111 file.
+
+        :param attribute_name: The name of the attribute to retrieve.
+        :param default: The value returned if the attribute does not exist.
+        :returns: The attribute value, with strings decoded.
+        """
+
+        if attribute_name not in self._attributes:
+            if attribute_name in self.hdf_file.attrs:
+                self._attributes[attribute_name] = decode_attribute(self.hdf_file.attrs[attribute_name])
+            else:
+                self._attributes[attribute_name] = None
+
+        value = self._attributes[attribute_name]
+        if value is None:
+            return default
+
+        return value
+
+
+    #******************************************************************************
+    def group_attribute(self, index, attribute_name, default=None):
+        """Retrieve a (cached) attribute value from the specified group.
+
+        :param index: The zero based index of the group.
+        :param attribute_name: The name of the attribute to retrieve.
+        :param default: The value returned if the attribute does not exist.
+        :returns: The attribute value, with strings decoded.
+        """
+
+        key = (index, attribute_name)
+        if key not in self._group_attributes:
+            attributes = self.hdf_file[group_name(index)].attrs
+            if attribute_name in attributes:
+                self._group_attributes[key] = decode_attribute(attributes[attribute_name])
+            else:
+                self._group_attributes[key] = None
+
+        value = self._group_attributes[key]
+        if value is None:
+            return default
+
+        return value
+
+
+    #******************************************************************************
+    @property
+    def data_coding_format(self):
+        """The data coding format. (1 = time series, 3 = irregular grid)"""
+        return self.attribute('dataCodingFormat')
+
+
+    #******************************************************************************
+    @property
+    def number_of_stations(self):
+        """The number of stations in a time series file."""
+        return int(self.attribute('numberOfStations', 0))
+
+
+    #******************************************************************************
+    @property
+    def number_of_times(self):
+        """The number of times stored in the file."""
+        return int(self.attribute('numberOfTimes', 0))
+
+
+    #******************************************************************************
+    @property
+    def number_of_nodes(self):
+        """The number of nodes in an irregular grid file."""
+        return int(self.attribute('numberOfNodes', 0))
+
+
+    #******************************************************************************
+    @property
+    def time_record_interval(self):
+        """The interval between records, None if not specified."""
+
+        interval = self.attribute('timeRecordInterval')
+        if interval is None:
+            return None
+
+        return timedelta(seconds=int(interval))
+
+
+    #******************************************************************************
+    @property
+    def first_record_time(self):
+        """The (UTC) time of the first record, None if not specified."""
+        return parse_date_time(self.attribute('dateTimeOfFirstRecord'))
+
+
+    #******************************************************************************
+    @property
+    def last_record_time(self):
+        """The (UTC) time of the last record, None if not specified."""
+        return parse_date_time(self.attribute('dateTimeOfLastRecord'))
+
+
+    #******************************************************************************
+    @property
+    def number_of_groups(self):
+        """The number of data groups ('Group 1' ... 'Group N') in the file."""
+
+        if self.data_coding_format == 1:
+            return self.number_of_stations
+
+        return self.number_of_times
+
+
+    #******************************************************************************
+    @property
+    def longitudes(self):
+        """The x coordinates from 'Group XY' as a 1D NumPy array."""
+
+        if self._longitudes is None:
+            self._load_positions()
+
+        return self._longitudes
+
+
+    #******************************************************************************
+    @property
+    def latitudes(self):
+        """The y coordinates from 'Group XY' as a 1D NumPy array."""
+
+        if self._latitudes is None:
+            self._load_positions()
+
+        return self._latitudes
+
+
+    #******************************************************************************
+    @property
+    def stations(self):
+        """The stations of a time series file as a sequence of lazy views."""
+
+        if self.data_coding_format != 1:
+            raise Exception('The specified S-111 file does not contain time series data.')
+
+        return S111GroupSequence(self, self.number_of_stations)
+
+
+    #******************************************************************************
+    @property
+    def timesteps(self):
+        """The timesteps of an irregular grid file as a sequence of lazy views."""
+
+        if self.data_coding_format != 3:
+            raise Exception('The specified S-111 file does not contain irregular grid data.')
+
+        return S111GroupSequence(self, self.number_of_times)
+
+
+    #******************************************************************************
+    def group_date_time(self, index):
+        """Retrieve the (cached) parsed DateTime of the specified group.
+
+        :param index: The zero based index of the group.
+        :returns: The group's DateTime in UTC.
+        """
+
+        if index not in self._date_times:
+            self._date_times[index] = parse_date_time(self.group_attribute(index, 'DateTime'))
+
+        return self._date_times[index]
+
+
+    #******************************************************************************
+    def station_times(self, index):
+        """Compute the time of each record in the specified station.
+
+        :param index: The zero based index of the station.
+        :returns: A list of (UTC) datetime values.
+        """
+
+        start_time = self.group_date_time(index)
+        interval = self.time_record_interval
+        return [start_time + record * interval for record in range(0, self.number_of_times)]
+
+
+    #******************************************************************************
+    def group_values(self, index):
+        """Retrieve the speed and direction values of the specified group.
+
+        The values are cached, and the adjacent groups are read into the cache with them.
+
+        :param index: The zero based index of the group.
+        :returns: A tuple containing the speed and direction values as 1D NumPy arrays.
+        """
+
+        if index in self._group_values:
+            self._group_values.move_to_end(index)
+            return self._group_values[index]
+
+        number_of_groups = self.number_of_groups
+        if index < 0 or index >= number_of_groups:
+            raise IndexError('Group index out of range.')
+
+        #Read the requested group last, so it is the most recently used entry in the cache.
+        first = max(0, index - self.prefetch)
+        last = min(number_of_groups - 1, index + self.prefetch)
+        for adjacent in range(first, last + 1):
+            if adjacent != index and adjacent not in self._group_values:
+                self._cache_group_values(adjacent, self._read_group_values(adjacent))
+
+        values = self._read_group_values(index)
+        self._cache_group_values(index, values)
+
+        return values
+
+
+    #******************************************************************************
+    def _read_group_values(self, index):
+        """Read the speed and direction values of the specified group from the file.
+
+        :param index: The zero based index of the group.
+        :returns: A tuple containing the speed and direction values as 1D NumPy arrays.
+        """
+
+        #Only read the published records of a station.
+        count = self.number_of_times if self.data_coding_format == 1 else None
+        speeds = self.group_dataset(index, 'Speed')[0, :count]
+        directions = self.group_dataset(index, 'Direction')[0, :count]
+
+        #The cached values are shared, so don't let anyone modify them.
+        speeds.flags.writeable = False
+        directions.flags.writeable = False
+
+        return (speeds, directions)
+
+
+    #******************************************************************************
+    def _cache_group_values(self, index, values):
+        """Store the group values in the cache, discarding the least recently used entries.
+
+        :param index: The zero based index of the group.
+        :param values: The tuple of speed and direction values.
+        """
+
+        self._group_values[index] = values
+        self._group_values.move_to_end(index)
+
+        while len(self._group_values) > self.group_cache_size:
+            self._group_values.popitem(last=False)
+
+
+    #******************************************************************************
+    def _load_published_times(self):
+        """Take the number of times and the last record time from the published timesteps, if any."""
+
+        if PUBLISHED_TIMES not in self.hdf_file:
+            return
+
+        published = self.hdf_file[PUBLISHED_TIMES]
+        if self.swmr:
+            published.refresh()
+
+        numberOfTimes = published.shape[0]
+        self._attributes['numberOfTimes'] = numberOfTimes
+        if numberOfTimes > 0:
+            self._attributes['dateTimeOfLastRecord'] = decode_attribute(published[numberOfTimes - 1])
+
+
+    #******************************************************************************
+    def _load_positions(self):
+        """Read the position information from 'Group XY'."""
+
+        xy_group = self.hdf_file['Group XY']
+
+        self._longitudes = xy_group['X'][0]
+        self._latitudes = xy_group['Y'][0]
+        self._longitudes.flags.writeable = False
+        self._latitudes.flags.writeable = False
+
+
+#******************************************************************************
+def group_name(index):
+    """Retrieve the name of the data group at the specified index.
+
+    :param index: The zero based index of the group.
+    :returns: The name of the group. ('Group 1' for index 0)
+    """
+
+    return 'Group ' + str(index + 1)
+
+
+#******************************************************************************
+def decode_attribute(value):
+    """Decode an HDF5 attribute value.
+
+    Older versions of h5py return string attributes as bytes, newer ones as str.
+
+    :param value: The raw attribute value.
+    :returns: The attribute value, with byte strings decoded.
+    """
+
+    if isinstance(value, bytes):
+        return value.decode()
+
+    return value
+
+
+#******************************************************************************
+def parse_date_time(value):
+    """Parse an S-111 date time string. (i.e. 20170101T000000Z)
+
+    :param value: The date time string (str or bytes), may be None.
+    :returns: The date time in UTC, None if no value was given.
+    """
+
+    if value is None:
+        return None
+
+    dateTime = iso8601.parse_date(decode_attribute(value))
+    return dateTime.astimezone(pytz.utc)
+
+
+#******************************************************************************
+def format_date_time(value):
+    """Format a date time value for storage in an S-111 file.
+
+    :param value: The (timezone aware) date time.
+    :returns: The date time string in UTC, encoded as bytes.
+    """
+
+    return value.astimezone(pytz.utc).strftime(DATE_TIME_FORMAT).encode()
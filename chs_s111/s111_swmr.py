@@ -0,0 +1,316 @@
+#******************************************************************************
+#
+#******************************************************************************
+import os
+import numpy
+import iso8601
+import pytz
+import netCDF4
+from chs_s111 import s111_reader
+from chs_s111 import s111_writer
+from chs_s111 import s111_io_profile
+from chs_s111 import s111_add_timeseries
+from chs_s111 import s111_add_irregular_grid
+from chs_s111 import station_source
+
+#The default number of records of each station published at a time.
+DEFAULT_BLOCK_SIZE = 24
+
+#SWMR needs the HDF5 1.10 file format. (The files need HDF5 1.10 or later to read)
+SWMR_LIBVER = ('v110', 'latest')
+
+#The suffix of the temporary file the layout of a published file is created in.
+LAYOUT_SUFFIX = '.layout'
+
+#The size of the chunks (in values) of the datasets that grow while publishing.
+CHUNK_SIZE = 64 * 1024
+
+#******************************************************************************
+def prepare_file(file_name, create_layout):
+    """Recreate a new S-111 file in a format that can be written in SWMR mode.
+
+    A SWMR writer can't create objects, so the file must not have any data yet.
+    Its metadata (from the create command) is kept. The groups and datasets are
+    created by create_layout in a temporary file, which only replaces the
+    original once all of them exist, so a failure leaves the original untouched.
+
+    :param file_name: The name of the S-111 file.
+    :param create_layout: A function called with the new HDF file to create its groups and datasets.
+    :returns: The S-111 HDF file, open for writing.
+    """
+
+    with s111_io_profile.open_file(file_name, 'r') as hdf_file:
+        if hdf_file.attrs.get('numberOfStations', 0) != 0 or hdf_file.attrs.get('numberOfTimes', 0) != 0 or len(hdf_file) != 0:
+            raise Exception('Only new S-111 files (from the create command) can be published.')
+
+        attributes = dict(hdf_file.attrs.items())
+
+    layoutFileName = file_name + LAYOUT_SUFFIX
+    try:
+        with s111_io_profile.open_file(layoutFileName, 'w', libver=SWMR_LIBVER) as hdf_file:
+            for name, value in attributes.items():
+                hdf_file.attrs[name] = value
+
+            create_layout(hdf_file)
+
+        os.replace(layoutFileName, file_name)
+
+    finally:
+        if os.path.exists(layoutFileName):
+            os.remove(layoutFileName)
+
+    return s111_io_profile.open_file(file_name, 'r+', libver=SWMR_LIBVER)
+
+
+#******************************************************************************
+def create_published_times(hdf_file, first_time):
+    """Create the dataset the published timesteps are listed in, and the metadata updated when publishing finishes.
+
+    Until then, numberOfTimes is 0 and dateTimeOfLastRecord is the first record time.
+
+    :param hdf_file: The S-111 HDF file.
+    :param first_time: The time of the first record.
+    """
+
+    hdf_file.create_dataset(s111_reader.PUBLISHED_TIMES, (0,), maxshape=(None,), chunks=(1024,), dtype='S16')
+
+    hdf_file.attrs.create('numberOfTimes', 0, dtype=numpy.int64)
+    hdf_file.attrs.create('dateTimeOfLastRecord', s111_reader.format_date_time(first_time))
+    hdf_file.attrs.create('minSurfCurrentSpeed', 0.0, dtype=numpy.float64)
+    hdf_file.attrs.create('maxSurfCurrentSpeed', 0.0, dtype=numpy.float64)
+
+
+#******************************************************************************
+def create_growing_datasets(group, number_of_values=None):
+    """Create empty Direction and Speed datasets that grow as values are published.
+
+    :param group: The HDF group to add the datasets to.
+    :param number_of_values: The number of values of a timestep, None for datasets that grow along the time axis.
+    :returns: A tuple containing the direction and speed datasets.
+    """
+
+    chunkSize = CHUNK_SIZE if number_of_values is None else max(1, min(number_of_values, CHUNK_SIZE))
+
+    direction_dataset = group.create_dataset('Direction', (1, 0), maxshape=(1, number_of_values), chunks=(1, chunkSize), dtype=numpy.float64)
+    speed_dataset = group.create_dataset('Speed', (1, 0), maxshape=(1, number_of_values), chunks=(1, chunkSize), dtype=numpy.float64)
+
+    return (direction_dataset, speed_dataset)
+
+
+#******************************************************************************
+def growing_datasets(group):
+    """Retrieve the Direction and Speed datasets created by create_growing_datasets().
+
+    :param group: The HDF group containing the datasets.
+    :returns: A tuple containing the direction and speed datasets.
+    """
+
+    return (group['Direction'], group['Speed'])
+
+
+#******************************************************************************
+def append_values(dataset, values):
+    """Append values to the end of a (1, N) dataset."""
+
+    offset = dataset.shape[1]
+    dataset.resize((1, offset + len(values)))
+    dataset[0, offset:offset + len(values)] = values
+
+
+#******************************************************************************
+def publish_times(hdf_file, date_times):
+    """Publish timesteps whose values have been written.
+
+    The values are flushed first, so a reader that sees a timestep in the
+    published list also sees its values.
+
+    :param hdf_file: The S-111 HDF file, in SWMR mode.
+    :param date_times: The (UTC) DateTime of each timestep to publish.
+    """
+
+    hdf_file.flush()
+
+    published = hdf_file[s111_reader.PUBLISHED_TIMES]
+    offset = published.shape[0]
+    published.resize((offset + len(date_times),))
+    published[offset:] = [s111_reader.format_date_time(dateTime) for dateTime in date_times]
+    published.flush()
+
+
+#******************************************************************************
+def finish_publishing(hdf_file, number_of_times, last_time, speed_extents):
+    """Store the final metadata of a published file.
+
+    Attribute changes made in SWMR mode only reach the file when it is closed,
+    which is why readers use the published list while the file is being written.
+    Objects can't be deleted in SWMR mode (and readers may still be using it),
+    so the published list stays in the finished file, where it matches
+    numberOfTimes and dateTimeOfLastRecord. (See s111_validator.check_published_times)
+
+    :param hdf_file: The S-111 HDF file, in SWMR mode.
+    :param number_of_times: The number of times published.
+    :param last_time: The time of the last record published.
+    :param speed_extents: The SpeedExtents of the values published.
+    """
+
+    hdf_file.attrs.modify('numberOfTimes', numpy.int64(number_of_times))
+    if last_time is not None:
+        hdf_file.attrs.modify('dateTimeOfLastRecord', s111_reader.format_date_time(last_time))
+
+    if speed_extents.min_speed is not None:
+        hdf_file.attrs.modify('minSurfCurrentSpeed', numpy.float64(speed_extents.min_speed))
+        hdf_file.attrs.modify('maxSurfCurrentSpeed', numpy.float64(speed_extents.max_speed))
+
+
+#******************************************************************************
+def publish_timeseries(file_name, time_series_files, block_size=DEFAULT_BLOCK_SIZE):
+    """Publish time series stations in SWMR mode, block_size records at a time.
+
+    All of the station groups are created up front, then their datasets grow
+    along the time axis. Readers opening the file with
+    s111_reader.S111Reader(file_name, swmr=True) can serve the records
+    published so far while the rest are written.
+
+    :param file_name: The name of a new S-111 file. (From the create command)
+    :param time_series_files: The names of the files (or the StationSources) containing the time series.
+    :param block_size: The number of records of each station published at a time.
+    """
+
+    if block_size < 1:
+        raise Exception('The block size must be at least 1.')
+
+    #Sources handed to us are left open for the caller.
+    sources = []
+    opened = []
+    try:
+        for time_series_file in time_series_files:
+            if isinstance(time_series_file, station_source.StationSource):
+                sources.append(time_series_file)
+            else:
+                opened.append(station_source.open_station_source(time_series_file))
+                sources.append(opened[-1])
+
+        if len(sources) == 0:
+            raise Exception('No time series to publish.')
+
+        numberOfRecords = sources[0].number_of_records
+        interval = sources[0].interval
+        for source in sources[1:]:
+            if source.number_of_records != numberOfRecords:
+                raise Exception('Number of times in ' + str(source.file_name) + ' does not match the other stations.')
+            if source.interval != interval:
+                raise Exception('The time interval of ' + str(source.file_name) + ' does not match the other stations.')
+
+        #Each timestep is the same record of every station, so use the latest start time.
+        lastStartTime = max(source.start_time for source in sources)
+
+        def create_layout(hdf_file):
+            for source in sources:
+                group = s111_add_timeseries.add_series_group(hdf_file, source)
+                if source.station_identifier:
+                    group.attrs.create('stationIdentifier', source.station_identifier.encode())
+                create_growing_datasets(group)
+
+            create_published_times(hdf_file, min(source.start_time for source in sources))
+
+        hdf_file = prepare_file(file_name, create_layout)
+        try:
+            datasets = [growing_datasets(hdf_file[s111_reader.group_name(index)]) for index in range(0, len(sources))]
+
+            hdf_file.swmr_mode = True
+            print("Publishing", numberOfRecords, "records of", len(sources), "stations.")
+
+            extents = s111_writer.SpeedExtents()
+            numberOfTimes = 0
+            for blocks in zip(*[source.read_blocks(block_size) for source in sources]):
+                numberOfValues = len(blocks[0][1])
+                for (directions, speeds), (direction_dataset, speed_dataset) in zip(blocks, datasets):
+                    if len(speeds) != numberOfValues:
+                        raise Exception('The stations returned blocks of different sizes.')
+
+                    speeds = numpy.asarray(speeds, dtype=numpy.float64) * s111_add_timeseries.ms2Knots
+                    append_values(direction_dataset, directions)
+                    append_values(speed_dataset, speeds)
+                    extents.update(speeds)
+
+                publish_times(hdf_file, [lastStartTime + (numberOfTimes + record) * interval for record in range(0, numberOfValues)])
+                numberOfTimes += numberOfValues
+
+            if numberOfTimes != numberOfRecords:
+                raise Exception('The time series contain ' + str(numberOfTimes) + ' records, ' + str(numberOfRecords) + ' were expected.')
+
+            lastTime = lastStartTime + (numberOfTimes - 1) * interval if numberOfTimes > 0 else None
+            finish_publishing(hdf_file, numberOfTimes, lastTime, extents)
+
+        finally:
+            hdf_file.close()
+
+    finally:
+        for source in opened:
+            source.close()
+
+    print("Published", numberOfTimes, "records.")
+
+
+#******************************************************************************
+def publish_irregular_grid(file_name, grid_file_name):
+    """Publish an irregular grid dataset in SWMR mode, one timestep at a time.
+
+    All of the data groups are created up front with empty datasets, which
+    are filled as each timestep is converted. Readers opening the file with
+    s111_reader.S111Reader(file_name, swmr=True) can serve the timesteps
+    published so far while the rest are written.
+
+    :param file_name: The name of a new S-111 file. (From the create command)
+    :param grid_file_name: The netcdf file containing the irregular grid data.
+    """
+
+    with netCDF4.Dataset(grid_file_name, "r", format="NETCDF4") as grid_file:
+
+        times, latc, lonc, ua, va = s111_add_irregular_grid.read_grid_variables(grid_file)
+        numberOfTimes = times.shape[0]
+        numberOfValues = va.shape[1]
+        if numberOfTimes == 0:
+            raise Exception('The grid file does not contain any times.')
+
+        dateTimes = [iso8601.parse_date(times[index].tobytes().decode()).astimezone(pytz.utc) for index in range(0, numberOfTimes)]
+        interval = dateTimes[1] - dateTimes[0] if numberOfTimes > 1 else None
+
+        def create_layout(hdf_file):
+            minX, minY, maxX, maxY = s111_add_irregular_grid.create_xy_group(hdf_file, latc, lonc)
+
+            for index in range(0, numberOfTimes):
+                group = hdf_file.create_group(s111_reader.group_name(index))
+                group.attrs.create('Title', ('Irregular Grid at DateTime ' + str(index + 1)).encode())
+                group.attrs.create('DateTime', s111_reader.format_date_time(dateTimes[index]))
+                create_growing_datasets(group, numberOfValues)
+
+            s111_add_irregular_grid.update_metadata(hdf_file, 0, numberOfValues, dateTimes[0], dateTimes[0], interval,
+                                                    minX, minY, maxX, maxY, 0.0, 0.0)
+            create_published_times(hdf_file, dateTimes[0])
+
+        hdf_file = prepare_file(file_name, create_layout)
+        try:
+            datasets = [growing_datasets(hdf_file[s111_reader.group_name(index)]) for index in range(0, numberOfTimes)]
+
+            hdf_file.swmr_mode = True
+            print("Publishing", numberOfTimes, "timesteps of", numberOfValues, "nodes.")
+
+            extents = s111_writer.SpeedExtents()
+            for index in range(0, numberOfTimes):
+                directions, speeds, minSpeed, maxSpeed = s111_add_irregular_grid.compute_direction_speed(ua[index], va[index])
+
+                direction_dataset, speed_dataset = datasets[index]
+                append_values(direction_dataset, directions[0])
+                append_values(speed_dataset, speeds[0])
+                if minSpeed is not None:
+                    extents.update_range(minSpeed, maxSpeed)
+
+                publish_times(hdf_file, [dateTimes[index]])
+
+            finish_publishing(hdf_file, numberOfTimes, dateTimes[-1], extents)
+
+        finally:
+            hdf_file.close()
+
+    print("Published", numberOfTimes, "timesteps.")
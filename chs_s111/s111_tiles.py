@@ -0,0 +1,405 @@
+#******************************************************************************
+#
+#******************************************************************************
+import math
+import os
+import numpy
+from chs_s111 import s111_reader
+from chs_s111 import s111_writer
+from chs_s111 import s111_io_profile
+
+#The ways of reducing the nodes in each cell of a tile.
+METHODS = ('average', 'decimate')
+
+#The default number of cells along each side of a tile, so a tile holds at most 16 x 16 nodes.
+DEFAULT_CELLS_PER_SIDE = 16
+
+#The default deepest zoom level built.
+DEFAULT_MAX_ZOOM = 18
+
+#The suffix of the tile file created next to an S-111 file.
+TILE_FILE_SUFFIX = '.tiles.h5'
+
+#The latitude limit of the web mercator projection.
+MAX_LATITUDE = 85.0511287798
+
+#******************************************************************************
+def build_tiles(input_file, output_file=None, method='average', cells_per_side=DEFAULT_CELLS_PER_SIDE,
+                max_zoom=DEFAULT_MAX_ZOOM):
+    """Build a tile pyramid of the nodes of an irregular grid S-111 file.
+
+    The nodes are assigned to the standard web mercator (z/x/y) tiles at each
+    zoom level, and each tile is divided into cells_per_side x cells_per_side
+    cells. The nodes in each cell are reduced to a single point, so a tile never
+    holds more than cells_per_side squared points, whatever the size of the mesh.
+    Levels are built until every node has a cell of its own, or max_zoom.
+
+    With the 'average' method each point is the mean position of the nodes in
+    the cell, and the speed and direction of each timestep are the average of
+    the nodes' u/v vectors, stored in the tile file. With the 'decimate' method
+    each point is the node closest to the centroid (mean position) of the nodes
+    in the cell, and the values are read from the S-111 file itself (see
+    S111Tiles.tile_values).
+
+    The tiles are written to a separate (sidecar) HDF5 file, so the S-111 file
+    itself is unchanged:
+        /Level z/tileIndex    (tiles, 4) x, y, first point, number of points; ordered by x then y
+        /Level z/node         (points,) the node index of each point (nearest node for 'average')
+        /Level z/longitude    (points,)
+        /Level z/latitude     (points,)
+        /Level z/speed        (times, points) 'average' only
+        /Level z/direction    (times, points) 'average' only
+
+    :param input_file: The name of the irregular grid S-111 file.
+    :param output_file: The name of the tile file to create, the input file name plus TILE_FILE_SUFFIX if not specified.
+    :param method: How the nodes in each cell are reduced. (One of METHODS)
+    :param cells_per_side: The number of cells along each side of a tile.
+    :param max_zoom: The deepest zoom level to build.
+    :returns: The name of the tile file created.
+    """
+
+    if method not in METHODS:
+        raise Exception('Unsupported tile method ' + str(method) + '.')
+
+    if cells_per_side < 1:
+        raise Exception('Each tile must have at least one cell.')
+
+    if output_file is None:
+        output_file = tile_file_name(input_file)
+
+    with s111_reader.S111Reader(input_file, group_cache_size=1, prefetch=0) as reader:
+
+        if reader.data_coding_format != 3:
+            raise Exception('The specified S-111 file does not contain irregular grid data.')
+
+        longitudes = numpy.asarray(reader.longitudes, dtype=numpy.float64)
+        latitudes = numpy.asarray(reader.latitudes, dtype=numpy.float64)
+        x, y = to_mercator(longitudes, latitudes)
+
+        levels = build_levels(x, y, cells_per_side, max_zoom)
+
+        with s111_io_profile.open_file(output_file, 'w') as tile_file:
+            tile_file.attrs.create('sourceFile', os.path.basename(input_file).encode())
+            tile_file.attrs.create('method', method.encode())
+            tile_file.attrs.create('cellsPerSide', cells_per_side, dtype=numpy.int64)
+            tile_file.attrs.create('maxZoom', len(levels) - 1, dtype=numpy.int64)
+            tile_file.attrs.create('numberOfTimes', reader.number_of_times, dtype=numpy.int64)
+
+            for zoom, level in enumerate(levels):
+                write_level(tile_file, zoom, level, longitudes, latitudes, x, y, method, reader.number_of_times)
+
+            if method == 'average':
+                write_averages(reader, tile_file, levels)
+
+    return output_file
+
+
+#******************************************************************************
+def tile_file_name(input_file):
+    """Retrieve the name of the tile file of an S-111 file."""
+    return input_file + TILE_FILE_SUFFIX
+
+
+#******************************************************************************
+def to_mercator(longitudes, latitudes):
+    """Project positions to normalized web mercator coordinates.
+
+    :param longitudes: The x coordinates (degrees).
+    :param latitudes: The y coordinates (degrees).
+    :returns: A tuple containing the x and y values, from 0 to 1, with y increasing to the south.
+    """
+
+    latitudes = numpy.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE)
+
+    x = (longitudes + 180.0) / 360.0
+    y = (1.0 - numpy.log(numpy.tan(numpy.radians(latitudes)) + 1.0 / numpy.cos(numpy.radians(latitudes))) / math.pi) / 2.0
+
+    #Keep the positions on the edge of the map inside the last tile.
+    limit = numpy.nextafter(1.0, 0.0)
+    return numpy.clip(x, 0.0, limit), numpy.clip(y, 0.0, limit)
+
+
+#******************************************************************************
+def inside_tile(longitudes, latitudes, zoom, x, y):
+    """Determine which positions are inside a tile.
+
+    :param longitudes: The x coordinates (degrees).
+    :param latitudes: The y coordinates (degrees).
+    :param zoom: The zoom level.
+    :param x: The x coordinate of the tile.
+    :param y: The y coordinate of the tile.
+    :returns: A boolean NumPy array, true for the positions inside the tile.
+    """
+
+    pointX, pointY = to_mercator(longitudes, latitudes)
+    tilesAcross = 2 ** zoom
+
+    return ((pointX * tilesAcross).astype(numpy.int64) == x) & ((pointY * tilesAcross).astype(numpy.int64) == y)
+
+
+#******************************************************************************
+def build_levels(x, y, cells_per_side, max_zoom):
+    """Assign the nodes to the cells of each zoom level.
+
+    :param x: The normalized web mercator x coordinate of each node.
+    :param y: The normalized web mercator y coordinate of each node.
+    :param cells_per_side: The number of cells along each side of a tile.
+    :param max_zoom: The deepest zoom level to build.
+    :returns: A list (one per zoom level) of tuples containing the cell of each node, and the tile x, tile y of each cell.
+    """
+
+    levels = []
+    for zoom in range(0, max_zoom + 1):
+        cellsAcross = (2 ** zoom) * cells_per_side
+        cellX = (x * cellsAcross).astype(numpy.int64)
+        cellY = (y * cellsAcross).astype(numpy.int64)
+
+        #Number the cells so that the cells of each tile are together, ordered by tile x then tile y.
+        tileX = cellX // cells_per_side
+        tileY = cellY // cells_per_side
+        keys = numpy.stack([tileX, tileY, cellX % cells_per_side, cellY % cells_per_side])
+        cellKeys, nodeCells = numpy.unique(keys, axis=1, return_inverse=True)
+        nodeCells = nodeCells.reshape(-1)
+
+        levels.append((nodeCells, cellKeys[0], cellKeys[1]))
+
+        #Stop once every node has a cell of its own.
+        if cellKeys.shape[1] == len(x):
+            break
+
+    return levels
+
+
+#******************************************************************************
+def write_level(tile_file, zoom, level, longitudes, latitudes, x, y, method, number_of_times):
+    """Write the tile index and the points of a zoom level.
+
+    :param tile_file: The tile HDF file.
+    :param zoom: The zoom level.
+    :param level: The tuple returned by build_levels() for the zoom level.
+    :param longitudes: The x coordinate of each node.
+    :param latitudes: The y coordinate of each node.
+    :param x: The normalized web mercator x coordinate of each node.
+    :param y: The normalized web mercator y coordinate of each node.
+    :param method: How the nodes in each cell are reduced.
+    :param number_of_times: The number of timesteps.
+    """
+
+    nodeCells, cellTileX, cellTileY = level
+    numberOfCells = len(cellTileX)
+
+    counts = numpy.bincount(nodeCells, minlength=numberOfCells)
+    meanX = numpy.bincount(nodeCells, weights=x, minlength=numberOfCells) / counts
+    meanY = numpy.bincount(nodeCells, weights=y, minlength=numberOfCells) / counts
+
+    #The node closest to the centroid of the nodes in each cell.
+    distances = numpy.hypot(x - meanX[nodeCells], y - meanY[nodeCells])
+    order = numpy.lexsort((distances, nodeCells))
+    firstOfCell = numpy.ones(len(order), dtype=bool)
+    firstOfCell[1:] = nodeCells[order][1:] != nodeCells[order][:-1]
+    nearestNodes = order[firstOfCell]
+
+    if method == 'average':
+        pointLongitudes = numpy.bincount(nodeCells, weights=longitudes, minlength=numberOfCells) / counts
+        pointLatitudes = numpy.bincount(nodeCells, weights=latitudes, minlength=numberOfCells) / counts
+    else:
+        pointLongitudes = longitudes[nearestNodes]
+        pointLatitudes = latitudes[nearestNodes]
+
+    #The cells are already ordered by tile, so each tile is a contiguous range of points.
+    tileKeys = cellTileX * (2 ** zoom) + cellTileY
+    tileStarts = numpy.flatnonzero(numpy.concatenate(([True], tileKeys[1:] != tileKeys[:-1])))
+    tileCounts = numpy.diff(numpy.append(tileStarts, numberOfCells))
+    tileIndex = numpy.stack([cellTileX[tileStarts], cellTileY[tileStarts], tileStarts, tileCounts], axis=1).astype(numpy.int64)
+
+    group = tile_file.create_group('Level ' + str(zoom))
+    group.attrs.create('numberOfPoints', numberOfCells, dtype=numpy.int64)
+    group.create_dataset('tileIndex', data=tileIndex)
+    group.create_dataset('node', data=nearestNodes.astype(numpy.int64))
+    group.create_dataset('longitude', data=pointLongitudes)
+    group.create_dataset('latitude', data=pointLatitudes)
+
+    if method == 'average' and number_of_times > 0:
+        chunks = (1, max(1, min(numberOfCells, 4096)))
+        group.create_dataset('speed', (number_of_times, numberOfCells), dtype=numpy.float64, chunks=chunks, compression='gzip')
+        group.create_dataset('direction', (number_of_times, numberOfCells), dtype=numpy.float64, chunks=chunks, compression='gzip')
+
+
+#******************************************************************************
+def write_averages(reader, tile_file, levels):
+    """Write the averaged speed and direction of every point, one timestep at a time.
+
+    :param reader: The S111Reader of the irregular grid file.
+    :param tile_file: The tile HDF file.
+    :param levels: The list returned by build_levels().
+    """
+
+    for index in range(0, reader.number_of_times):
+        speeds, directions = reader.group_values(index)
+
+        radians = numpy.radians(directions)
+        u = speeds * numpy.sin(radians)
+        v = speeds * numpy.cos(radians)
+
+        #Nodes without a value don't count towards the average.
+        valid = ~(numpy.isnan(u) | numpy.isnan(v))
+        u = numpy.where(valid, u, 0.0)
+        v = numpy.where(valid, v, 0.0)
+
+        for zoom, (nodeCells, cellTileX, cellTileY) in enumerate(levels):
+            numberOfCells = len(cellTileX)
+            counts = numpy.bincount(nodeCells, weights=valid, minlength=numberOfCells)
+            sumU = numpy.bincount(nodeCells, weights=u, minlength=numberOfCells)
+            sumV = numpy.bincount(nodeCells, weights=v, minlength=numberOfCells)
+
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                meanU = sumU / counts
+                meanV = sumV / counts
+
+            group = tile_file['Level ' + str(zoom)]
+            group['speed'][index] = numpy.hypot(meanU, meanV)
+            group['direction'][index] = s111_writer.vector_directions(meanU, meanV)
+
+
+#******************************************************************************
+class S111Tiles:
+    """Read access to the tile file of an irregular grid S-111 file."""
+
+    #******************************************************************************
+    def __init__(self, tile_file, s111_file=None):
+        """Open a tile file.
+
+        :param tile_file: The name of the tile file.
+        :param s111_file: The name of the S-111 file, only needed to read the values of 'decimate' tiles.
+        """
+
+        self.tile_file = s111_io_profile.open_file(tile_file, 'r')
+        self.method = s111_reader.decode_attribute(self.tile_file.attrs['method'])
+        self.max_zoom = int(self.tile_file.attrs['maxZoom'])
+        self.s111_file = s111_file
+        self._reader = None
+        self._tile_indexes = dict()
+        self._tile_keys = dict()
+
+
+    #******************************************************************************
+    def __enter__(self):
+        return self
+
+
+    #******************************************************************************
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    #******************************************************************************
+    def close(self):
+        """Close the tile file (and the S-111 file)."""
+
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+        self.tile_file.close()
+
+
+    #******************************************************************************
+    def tile_range(self, zoom, x, y):
+        """Find the range of points of a tile.
+
+        Zoom levels deeper than the deepest one built use the points of the
+        deepest level that fall in the requested tile.
+
+        :param zoom: The zoom level.
+        :param x: The x coordinate of the tile.
+        :param y: The y coordinate of the tile.
+        :returns: A tuple containing the level read, the first point, and the number of points.
+        """
+
+        level = min(zoom, self.max_zoom)
+        shift = zoom - level
+
+        #The tile index is ordered by x then y, so the (sorted) keys are computed once and binary searched.
+        if level not in self._tile_indexes:
+            tileIndex = self.tile_file['Level ' + str(level)]['tileIndex'][()]
+            self._tile_indexes[level] = tileIndex
+            self._tile_keys[level] = tileIndex[:, 0] * (2 ** level) + tileIndex[:, 1]
+        tileIndex = self._tile_indexes[level]
+        keys = self._tile_keys[level]
+
+        key = (x >> shift) * (2 ** level) + (y >> shift)
+        position = numpy.searchsorted(keys, key)
+        if position >= len(keys) or keys[position] != key:
+            return (level, 0, 0)
+
+        return (level, int(tileIndex[position, 2]), int(tileIndex[position, 3]))
+
+
+    #******************************************************************************
+    def tile_points(self, zoom, x, y):
+        """Retrieve the points of a tile.
+
+        :param zoom: The zoom level.
+        :param x: The x coordinate of the tile.
+        :param y: The y coordinate of the tile.
+        :returns: A tuple containing the node index, longitude and latitude of each point as 1D NumPy arrays.
+        """
+
+        level, first, count = self.tile_range(zoom, x, y)
+        group = self.tile_file['Level ' + str(level)]
+        nodes = group['node'][first:first + count]
+        longitudes = group['longitude'][first:first + count]
+        latitudes = group['latitude'][first:first + count]
+
+        #Deeper zoom levels only show the points of the level built that are inside the tile.
+        if level != zoom and count > 0:
+            inside = inside_tile(longitudes, latitudes, zoom, x, y)
+            nodes, longitudes, latitudes = nodes[inside], longitudes[inside], latitudes[inside]
+
+        return (nodes, longitudes, latitudes)
+
+
+    #******************************************************************************
+    def tile_values(self, zoom, x, y, time_index):
+        """Retrieve the speed and direction of the points of a tile at a timestep.
+
+        :param zoom: The zoom level.
+        :param x: The x coordinate of the tile.
+        :param y: The y coordinate of the tile.
+        :param time_index: The zero based index of the timestep.
+        :returns: A tuple containing the speed and direction of each point as 1D NumPy arrays, in the order of tile_points().
+        """
+
+        level, first, count = self.tile_range(zoom, x, y)
+
+        if self.method == 'average':
+            group = self.tile_file['Level ' + str(level)]
+            speeds = group['speed'][time_index, first:first + count]
+            directions = group['direction'][time_index, first:first + count]
+
+            if level != zoom and count > 0:
+                inside = inside_tile(group['longitude'][first:first + count], group['latitude'][first:first + count], zoom, x, y)
+                speeds, directions = speeds[inside], directions[inside]
+
+            return (speeds, directions)
+
+        #Decimated tiles read only their nodes from the S-111 file.
+        if self.s111_file is None:
+            raise Exception('The values of decimated tiles are read from the S-111 file, which was not specified.')
+
+        if self._reader is None:
+            self._reader = s111_reader.S111Reader(self.s111_file, group_cache_size=1, prefetch=0)
+
+        nodes = self.tile_points(zoom, x, y)[0]
+        if len(nodes) == 0:
+            return (numpy.empty(0), numpy.empty(0))
+
+        #h5py reads a list of indices in increasing order.
+        order = numpy.argsort(nodes)
+        group = self._reader.hdf_file[s111_reader.group_name(time_index)]
+        speeds = numpy.empty(len(nodes))
+        directions = numpy.empty(len(nodes))
+        speeds[order] = group['Speed'][0, nodes[order]]
+        directions[order] = group['Direction'][0, nodes[order]]
+
+        return (speeds, directions)
@@ -0,0 +1,235 @@
+#******************************************************************************
+#
+#******************************************************************************
+import json
+import os
+import shutil
+from chs_s111 import s111_io_profile
+
+#The suffix of the staging copy an S-111 file is edited in.
+STAGING_SUFFIX = '.staging'
+
+#The suffix of the journal recording the progress made in the staging copy.
+JOURNAL_SUFFIX = '.journal'
+
+#******************************************************************************
+class Transaction:
+    """Edits an S-111 file through a staging copy, replacing the original atomically on commit.
+
+    The original file is never modified in place, so a failed import leaves it
+    untouched. The progress of the import is recorded in a journal each time a
+    checkpoint is reached, and the staging copy and journal are kept when the
+    transaction fails so that the same operation can resume from the last
+    checkpoint instead of starting over.
+    """
+
+    #******************************************************************************
+    def __init__(self, file_name, operation, resume=True):
+        """Create a new transaction.
+
+        :param file_name: The name of the S-111 file to edit.
+        :param operation: A description of the operation (including its inputs), only a journal of the same operation is resumed.
+        :param resume: True if a previous attempt at the same operation should be resumed.
+        """
+
+        self.file_name = file_name
+        self.operation = operation
+        self.resume = resume
+        self.staging_file = file_name + STAGING_SUFFIX
+        self.journal_file = file_name + JOURNAL_SUFFIX
+        self.hdf_file = None
+        self.state = dict()
+        self.resumed = False
+        self.target = None
+
+
+    #******************************************************************************
+    def __enter__(self):
+        return self.begin()
+
+
+    #******************************************************************************
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+    #******************************************************************************
+    def begin(self):
+        """Open the staging copy, resuming a previous attempt if possible.
+
+        :returns: The staging copy as an HDF file, opened for writing.
+        """
+
+        journal = read_journal(self.journal_file)
+        self.target = describe_file(self.file_name)
+
+        #Only resume if the previous attempt was the same operation on the same original file, and made some progress.
+        #(The staging copy of an original that was edited or replaced since would overwrite those edits on commit)
+        if self.resume and journal is not None and journal.get('operation') == self.operation and \
+           journal.get('target') == self.target and journal.get('state') and os.path.exists(self.staging_file):
+            try:
+                self.hdf_file = s111_io_profile.open_file(self.staging_file, 'r+')
+                self.state = journal['state']
+                self.resumed = True
+                return self.hdf_file
+            except OSError:
+                print("Warning: The staging file", self.staging_file, "could not be opened, starting over.")
+
+        elif self.resume and journal is not None and journal.get('operation') == self.operation and journal.get('target') != self.target:
+            print("Warning:", self.file_name, "has changed since the previous attempt, starting over.")
+
+        #Start from a fresh copy of the original file.
+        remove_file(self.journal_file)
+        remove_file(self.staging_file)
+        shutil.copyfile(self.file_name, self.staging_file)
+
+        self.state = dict()
+        write_journal(self.journal_file, {'operation': self.operation, 'target': self.target, 'state': self.state})
+
+        self.hdf_file = s111_io_profile.open_file(self.staging_file, 'r+')
+        return self.hdf_file
+
+
+    #******************************************************************************
+    def checkpoint(self, **state):
+        """Make all edits so far durable, and record the given progress in the journal.
+
+        :param state: The values (JSON serializable) needed to resume from this point.
+        """
+
+        self.hdf_file.flush()
+        fsync_file(self.staging_file)
+
+        self.state.update(state)
+        write_journal(self.journal_file, {'operation': self.operation, 'target': self.target, 'state': self.state})
+
+
+    #******************************************************************************
+    def commit(self):
+        """Replace the original file with the staging copy, and remove the journal."""
+
+        self.hdf_file.close()
+        self.hdf_file = None
+
+        fsync_file(self.staging_file)
+        os.replace(self.staging_file, self.file_name)
+        fsync_directory(self.file_name)
+
+        remove_file(self.journal_file)
+
+
+    #******************************************************************************
+    def abort(self):
+        """Close the staging copy, keeping it and the journal so the operation can be resumed."""
+
+        if self.hdf_file is not None:
+            self.hdf_file.close()
+            self.hdf_file = None
+
+
+#******************************************************************************
+def describe_operation(name, input_files):
+    """Describe an operation and its inputs, so a journal is only resumed by the same operation.
+
+    :param name: The name of the operation.
+    :param input_files: The names of the operation's input files.
+    :returns: A string identifying the operation.
+    """
+
+    inputs = []
+    for input_file in input_files:
+        status = os.stat(input_file)
+        inputs.append([os.path.abspath(input_file), status.st_size, status.st_mtime])
+
+    return name + ' ' + json.dumps(inputs)
+
+
+#******************************************************************************
+def describe_file(file_name):
+    """Describe the current version of a file, so a journal is only resumed while the file is unchanged.
+
+    :param file_name: The name of the file.
+    :returns: A list containing the size and modification time (in nanoseconds) of the file.
+    """
+
+    status = os.stat(file_name)
+    return [status.st_size, status.st_mtime_ns]
+
+
+#******************************************************************************
+def read_journal(journal_file):
+    """Read a journal.
+
+    :param journal_file: The name of the journal file.
+    :returns: The journal contents, None if there isn't a (valid) journal.
+    """
+
+    try:
+        with open(journal_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+#******************************************************************************
+def write_journal(journal_file, contents):
+    """Atomically write a journal.
+
+    :param journal_file: The name of the journal file.
+    :param contents: The (JSON serializable) journal contents.
+    """
+
+    temporaryFile = journal_file + '.tmp'
+    with open(temporaryFile, 'w') as f:
+        json.dump(contents, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temporaryFile, journal_file)
+    fsync_directory(journal_file)
+
+
+#******************************************************************************
+def fsync_file(file_name):
+    """Flush a file's contents to disk.
+
+    :param file_name: The name of the file.
+    """
+
+    fd = os.open(file_name, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+#******************************************************************************
+def fsync_directory(file_name):
+    """Flush the directory entry of a file to disk, so a rename is durable. (Not supported on Windows)
+
+    :param file_name: The name of a file in the directory.
+    """
+
+    if os.name != 'posix':
+        return
+
+    fd = os.open(os.path.dirname(os.path.abspath(file_name)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+#******************************************************************************
+def remove_file(file_name):
+    """Remove a file, if it exists.
+
+    :param file_name: The name of the file.
+    """
+
+    if os.path.exists(file_name):
+        os.remove(file_name)
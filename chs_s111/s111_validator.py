@@ -0,0 +1,358 @@
+#******************************************************************************
+#
+#******************************************************************************
+from datetime import timedelta
+import multiprocessing
+import re
+import numpy
+from chs_s111 import s111_reader
+from chs_s111 import s111_io_profile
+
+#The default number of values read from a dataset at one time.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+#The relative tolerance used when comparing the speed extents to the data.
+SPEED_TOLERANCE = 1e-9
+
+GROUP_NAME_PATTERN = re.compile(r'^Group (\d+)$')
+
+#******************************************************************************
+class GroupSummary:
+    """The result of checking a range of data groups."""
+
+    #******************************************************************************
+    def __init__(self):
+        self.errors = []
+        self.min_speed = None
+        self.max_speed = None
+        self.date_times = dict()
+
+
+    #******************************************************************************
+    def update_speed(self, min_speed, max_speed):
+        """Merge the given speed extents into the summary.
+
+        :param min_speed: The minimum speed value found, may be None.
+        :param max_speed: The maximum speed value found, may be None.
+        """
+
+        if min_speed is None:
+            return
+
+        if self.min_speed is None:
+            self.min_speed = min_speed
+            self.max_speed = max_speed
+        else:
+            self.min_speed = min(self.min_speed, min_speed)
+            self.max_speed = max(self.max_speed, max_speed)
+
+
+    #******************************************************************************
+    def merge(self, other):
+        """Merge another summary into this one.
+
+        :param other: The summary to be merged.
+        """
+
+        self.errors.extend(other.errors)
+        self.update_speed(other.min_speed, other.max_speed)
+        self.date_times.update(other.date_times)
+
+
+#******************************************************************************
+def validate_file(file_name, chunk_size=DEFAULT_CHUNK_SIZE, processes=1):
+    """Validate a finished S-111 file.
+
+    The speed and direction datasets are read in blocks of at most chunk_size
+    values, so the memory used does not depend on the size of the file. The
+    data groups can be split between several worker processes.
+
+    :param file_name: The name of the S-111 file to validate.
+    :param chunk_size: The maximum number of values read from a dataset at one time.
+    :param processes: The number of worker processes used to check the data groups.
+    :returns: A list of error messages, empty if the file is valid.
+    """
+
+    errors = []
+
+    with s111_io_profile.open_file(file_name, 'r') as hdf_file:
+        attributes = hdf_file.attrs
+
+        for name in ('dataCodingFormat', 'numberOfTimes'):
+            if name not in attributes:
+                errors.append('The ' + name + ' attribute is missing.')
+        if errors:
+            return errors
+
+        dataCodingFormat = int(attributes['dataCodingFormat'])
+        numberOfTimes = int(attributes['numberOfTimes'])
+
+        #Figure out how many groups and values per group we expect.
+        if dataCodingFormat == 1:
+            if 'numberOfStations' not in attributes:
+                return ['The numberOfStations attribute is missing.']
+            numberOfGroups = int(attributes['numberOfStations'])
+            numberOfValues = numberOfTimes
+        elif dataCodingFormat == 3:
+            if 'numberOfNodes' not in attributes:
+                return ['The numberOfNodes attribute is missing.']
+            numberOfGroups = numberOfTimes
+            numberOfValues = int(attributes['numberOfNodes'])
+        else:
+            return ['Unsupported dataCodingFormat ' + str(dataCodingFormat) + '.']
+
+        errors.extend(check_group_numbering(hdf_file, numberOfGroups))
+        errors.extend(check_positions(hdf_file, dataCodingFormat, numberOfGroups, numberOfValues))
+
+        interval = None
+        if 'timeRecordInterval' in attributes:
+            interval = timedelta(seconds=int(attributes['timeRecordInterval']))
+        elif numberOfTimes > 1:
+            errors.append('The timeRecordInterval attribute is missing.')
+
+        firstTime = s111_reader.parse_date_time(attributes.get('dateTimeOfFirstRecord'))
+        lastTime = s111_reader.parse_date_time(attributes.get('dateTimeOfLastRecord'))
+        minSpeed = attributes.get('minSurfCurrentSpeed')
+        maxSpeed = attributes.get('maxSurfCurrentSpeed')
+
+        errors.extend(check_published_times(hdf_file, numberOfTimes, lastTime))
+
+    #Check the data groups, splitting them between the worker processes.
+    groups = list(range(0, numberOfGroups))
+    summary = GroupSummary()
+    if processes > 1 and numberOfGroups > 1:
+        blockSize = -(-numberOfGroups // processes)
+        jobs = [(file_name, groups[start:start + blockSize], numberOfValues, chunk_size)
+                for start in range(0, numberOfGroups, blockSize)]
+        with multiprocessing.Pool(processes) as pool:
+            for result in pool.starmap(check_groups, jobs):
+                summary.merge(result)
+    else:
+        summary.merge(check_groups(file_name, groups, numberOfValues, chunk_size))
+
+    errors.extend(summary.errors)
+    errors.extend(check_speed_extents(summary, minSpeed, maxSpeed))
+    errors.extend(check_times(summary, dataCodingFormat, numberOfGroups, numberOfTimes, interval, firstTime, lastTime))
+
+    return errors
+
+
+#******************************************************************************
+def check_published_times(hdf_file, number_of_times, last_time):
+    """Verify that the timesteps listed by the publish command match the metadata.
+
+    :param hdf_file: The S-111 HDF file.
+    :param number_of_times: The number of times in the metadata.
+    :param last_time: The dateTimeOfLastRecord in the metadata.
+    :returns: A list of error messages.
+    """
+
+    if s111_reader.PUBLISHED_TIMES not in hdf_file:
+        return []
+
+    published = hdf_file[s111_reader.PUBLISHED_TIMES]
+    if published.ndim != 1:
+        return ['The ' + s111_reader.PUBLISHED_TIMES + ' dataset is not one dimensional.']
+
+    numberOfPublished = published.shape[0]
+    if numberOfPublished != number_of_times:
+        return ['The file lists ' + str(numberOfPublished) + ' published timesteps, but the metadata specifies ' +
+                str(number_of_times) + '. (Publishing may not have finished)']
+
+    errors = []
+    if numberOfPublished > 0:
+        publishedTimes = [s111_reader.parse_date_time(value) for value in published[()]]
+        if any(later <= earlier for earlier, later in zip(publishedTimes, publishedTimes[1:])):
+            errors.append('The published timesteps are not in increasing order.')
+        if last_time is not None and publishedTimes[-1] != last_time:
+            errors.append('The last published timestep ' + str(publishedTimes[-1]) +
+                          ' does not match the dateTimeOfLastRecord ' + str(last_time) + '.')
+
+    return errors
+
+
+#******************************************************************************
+def check_group_numbering(hdf_file, number_of_groups):
+    """Verify that the data groups present match the number of groups in the metadata.
+
+    :param hdf_file: The S-111 HDF file.
+    :param number_of_groups: The number of data groups expected.
+    :returns: A list of error messages.
+    """
+
+    errors = []
+
+    numbers = set()
+    for key in hdf_file:
+        match = GROUP_NAME_PATTERN.match(key)
+        if match:
+            numbers.add(int(match.group(1)))
+
+    if len(numbers) != number_of_groups:
+        errors.append('The file contains ' + str(len(numbers)) + ' data groups, but the metadata specifies ' + str(number_of_groups) + '.')
+
+    missing = [number for number in range(1, number_of_groups + 1) if number not in numbers]
+    if missing:
+        errors.append('Missing data groups: ' + ', '.join(str(number) for number in missing[:10]) + ('...' if len(missing) > 10 else ''))
+
+    return errors
+
+
+#******************************************************************************
+def check_positions(hdf_file, data_coding_format, number_of_groups, number_of_values):
+    """Verify that 'Group XY' contains the expected number of positions.
+
+    :param hdf_file: The S-111 HDF file.
+    :param data_coding_format: The data coding format of the file.
+    :param number_of_groups: The number of data groups expected.
+    :param number_of_values: The number of values expected in each data group.
+    :returns: A list of error messages.
+    """
+
+    if 'Group XY' not in hdf_file:
+        if number_of_groups > 0:
+            return ['The Group XY group is missing.']
+        return []
+
+    #Time series files have one position per station, irregular grids one per node.
+    expected = number_of_groups if data_coding_format == 1 else number_of_values
+
+    errors = []
+    for name in ('X', 'Y'):
+        if name not in hdf_file['Group XY']:
+            errors.append('The Group XY/' + name + ' dataset is missing.')
+        elif hdf_file['Group XY'][name].shape != (1, expected):
+            errors.append('The Group XY/' + name + ' dataset has shape ' + str(hdf_file['Group XY'][name].shape) + ', expected ' + str((1, expected)) + '.')
+
+    return errors
+
+
+#******************************************************************************
+def check_groups(file_name, groups, number_of_values, chunk_size):
+    """Check the speed and direction values of a range of data groups.
+
+    :param file_name: The name of the S-111 file.
+    :param groups: The zero based indices of the groups to check.
+    :param number_of_values: The number of values expected in each data group.
+    :param chunk_size: The maximum number of values read from a dataset at one time.
+    :returns: The GroupSummary of the checked groups.
+    """
+
+    summary = GroupSummary()
+
+    with s111_io_profile.open_file(file_name, 'r') as hdf_file:
+        for index in groups:
+            name = s111_reader.group_name(index)
+            if name not in hdf_file:
+                continue
+
+            group = hdf_file[name]
+            if 'DateTime' in group.attrs:
+                summary.date_times[index] = s111_reader.decode_attribute(group.attrs['DateTime'])
+            else:
+                summary.errors.append(name + ' does not have a DateTime attribute.')
+
+            missing = [dataset for dataset in ('Speed', 'Direction') if dataset not in group]
+            if missing:
+                summary.errors.append(name + ' is missing the ' + ' and '.join(missing) + ' dataset(s).')
+                continue
+
+            speed = group['Speed']
+            direction = group['Direction']
+            if speed.shape != (1, number_of_values) or direction.shape != (1, number_of_values):
+                summary.errors.append(name + ' has datasets of shape ' + str(speed.shape) + ' and ' + str(direction.shape) + ', expected ' + str((1, number_of_values)) + '.')
+                continue
+
+            invalidDirections = 0
+            for start in range(0, number_of_values, chunk_size):
+                stop = min(start + chunk_size, number_of_values)
+
+                values = direction[0, start:stop]
+                invalidDirections += numpy.count_nonzero((values < 0.0) | (values >= 360.0))
+
+                values = speed[0, start:stop]
+                values = values[~numpy.isnan(values)]
+                if values.size > 0:
+                    summary.update_speed(float(values.min()), float(values.max()))
+
+            if invalidDirections:
+                summary.errors.append(name + ' contains ' + str(invalidDirections) + ' direction value(s) outside of [0, 360).')
+
+    return summary
+
+
+#******************************************************************************
+def check_speed_extents(summary, min_speed, max_speed):
+    """Verify that the speed extents in the metadata match the data.
+
+    :param summary: The GroupSummary of all data groups.
+    :param min_speed: The minSurfCurrentSpeed attribute value, may be None.
+    :param max_speed: The maxSurfCurrentSpeed attribute value, may be None.
+    :returns: A list of error messages.
+    """
+
+    errors = []
+
+    if summary.min_speed is None:
+        return errors
+
+    for name, expected, found in (('minSurfCurrentSpeed', min_speed, summary.min_speed),
+                                  ('maxSurfCurrentSpeed', max_speed, summary.max_speed)):
+        if expected is None:
+            errors.append('The ' + name + ' attribute is missing.')
+        elif not numpy.isclose(expected, found, rtol=SPEED_TOLERANCE, atol=0.0):
+            errors.append('The ' + name + ' attribute is ' + str(expected) + ', but the data contains ' + str(found) + '.')
+
+    return errors
+
+
+#******************************************************************************
+def check_times(summary, data_coding_format, number_of_groups, number_of_times, interval, first_time, last_time):
+    """Verify the DateTime values of the data groups against the temporal metadata.
+
+    :param summary: The GroupSummary of all data groups.
+    :param data_coding_format: The data coding format of the file.
+    :param number_of_groups: The number of data groups.
+    :param number_of_times: The number of times in the file.
+    :param interval: The time record interval, may be None.
+    :param first_time: The dateTimeOfFirstRecord, may be None.
+    :param last_time: The dateTimeOfLastRecord, may be None.
+    :returns: A list of error messages.
+    """
+
+    errors = []
+
+    if number_of_groups == 0:
+        return errors
+
+    if first_time is None or last_time is None:
+        return ['The dateTimeOfFirstRecord or dateTimeOfLastRecord attribute is missing.']
+
+    times = dict()
+    for index, value in summary.date_times.items():
+        try:
+            times[index] = s111_reader.parse_date_time(value)
+        except Exception:
+            errors.append(s111_reader.group_name(index) + ' has an invalid DateTime ' + value + '.')
+
+    #Each time series station covers numberOfTimes records from its own start time.
+    if data_coding_format == 1:
+        duration = (number_of_times - 1) * interval if interval is not None else timedelta(0)
+        for index in sorted(times):
+            if times[index] < first_time or times[index] + duration > last_time:
+                errors.append(s111_reader.group_name(index) + ' is outside of the temporal extents of the file.')
+        return errors
+
+    #Each irregular grid group is one timestep, which must be evenly spaced.
+    expected = first_time
+    for index in range(0, number_of_groups):
+        if index in times and times[index] != expected:
+            errors.append(s111_reader.group_name(index) + ' has DateTime ' + times[index].strftime("%Y%m%dT%H%M%SZ") + ', expected ' + expected.strftime("%Y%m%dT%H%M%SZ") + '.')
+        if interval is not None:
+            expected += interval
+
+    lastGroup = number_of_groups - 1
+    if lastGroup in times and times[lastGroup] != last_time:
+        errors.append('The dateTimeOfLastRecord attribute does not match the DateTime of the last group.')
+
+    return errors
@@ -0,0 +1,157 @@
+#******************************************************************************
+#
+#******************************************************************************
+import numpy
+from chs_s111 import s111_reader
+
+#The metadata attributes that are computed from the data, rather than copied.
+COMPUTED_ATTRIBUTES = ('dateTimeOfFirstRecord', 'dateTimeOfLastRecord', 'numberOfStations',
+                       'numberOfTimes', 'numberOfNodes', 'dataCodingFormat', 'timeRecordInterval',
+                       'minSurfCurrentSpeed', 'maxSurfCurrentSpeed')
+
+#******************************************************************************
+class SpeedExtents:
+    """Keeps track of the minimum and maximum speed values written to a file."""
+
+    #******************************************************************************
+    def __init__(self):
+        self.min_speed = None
+        self.max_speed = None
+
+
+    #******************************************************************************
+    def update(self, speeds):
+        """Update the extents with the given speed values. (NaN values are ignored)
+
+        :param speeds: A NumPy array of speed values.
+        """
+
+        speeds = speeds[~numpy.isnan(speeds)]
+        if speeds.size == 0:
+            return
+
+        self.update_range(float(speeds.min()), float(speeds.max()))
+
+
+    #******************************************************************************
+    def update_range(self, min_speed, max_speed):
+        """Update the extents with a known minimum and maximum speed.
+
+        :param min_speed: The minimum speed value, may be None.
+        :param max_speed: The maximum speed value, may be None.
+        """
+
+        if min_speed is None or max_speed is None:
+            return
+
+        if self.min_speed is None:
+            self.min_speed = min_speed
+            self.max_speed = max_speed
+        else:
+            self.min_speed = min(self.min_speed, min_speed)
+            self.max_speed = max(self.max_speed, max_speed)
+
+
+#******************************************************************************
+def normalize_directions(directions):
+    """Wrap direction values into [0, 360) degrees. (NaN values are kept)
+
+    :param directions: A NumPy array of direction values (in degrees clockwise from north).
+    :returns: A NumPy array of the wrapped direction values.
+    """
+
+    directions = numpy.mod(directions, 360.0)
+
+    #Tiny negative angles round up to 360 degrees, which is the same as north.
+    return numpy.where(directions >= 360.0, 0.0, directions)
+
+
+#******************************************************************************
+def vector_directions(u, v):
+    """Compute the direction of u/v vectors.
+
+    :param u: A NumPy array of u (east) values.
+    :param v: A NumPy array of v (north) values.
+    :returns: A NumPy array of direction values (in degrees clockwise from north), in [0, 360).
+    """
+
+    return normalize_directions(numpy.degrees(numpy.arctan2(u, v)))
+
+
+#******************************************************************************
+def copy_metadata(source_file, target_file, copy_positions=True):
+    """Copy the (non computed) metadata and the 'Group XY' positions between S-111 files.
+
+    :param source_file: The S-111 HDF file to copy from.
+    :param target_file: The S-111 HDF file to copy to.
+    :param copy_positions: True if the 'Group XY' positions should also be copied.
+    """
+
+    for name, value in source_file.attrs.items():
+        if name not in COMPUTED_ATTRIBUTES:
+            target_file.attrs[name] = value
+
+    if copy_positions and 'Group XY' in source_file:
+        source_file.copy('Group XY', target_file)
+
+
+#******************************************************************************
+def write_data_group(hdf_file, index, title, date_time, speeds, directions):
+    """Write a data group ('Group N') to an S-111 file.
+
+    :param hdf_file: The S-111 HDF file.
+    :param index: The zero based index of the group.
+    :param title: The title of the group.
+    :param date_time: The (timezone aware) DateTime of the group.
+    :param speeds: A 1D array of speed values (in knots).
+    :param directions: A 1D array of direction values (in degrees).
+    :returns: The newly created group.
+    """
+
+    newGroup = hdf_file.create_group(s111_reader.group_name(index))
+    newGroup.attrs.create('Title', title.encode())
+    newGroup.attrs.create('DateTime', s111_reader.format_date_time(date_time))
+
+    numberOfValues = len(speeds)
+    newGroup.create_dataset('Direction', (1, numberOfValues), dtype=numpy.float64, data=numpy.reshape(directions, (1, numberOfValues)))
+    newGroup.create_dataset('Speed', (1, numberOfValues), dtype=numpy.float64, data=numpy.reshape(speeds, (1, numberOfValues)))
+
+    return newGroup
+
+
+#******************************************************************************
+def update_computed_metadata(hdf_file, data_coding_format, number_of_groups, number_of_times, number_of_nodes,
+                             interval, first_time, last_time, speed_extents):
+    """Set the computed metadata of an S-111 file.
+
+    :param hdf_file: The S-111 HDF file.
+    :param data_coding_format: The data coding format. (1 = time series, 3 = irregular grid)
+    :param number_of_groups: The number of data groups written.
+    :param number_of_times: The number of times in the file.
+    :param number_of_nodes: The number of nodes of an irregular grid (ignored for time series).
+    :param interval: The time interval between records, may be None.
+    :param first_time: The time of the first record.
+    :param last_time: The time of the last record.
+    :param speed_extents: The SpeedExtents of the data written.
+    """
+
+    hdf_file.attrs.create('dataCodingFormat', data_coding_format, dtype=numpy.int64)
+    hdf_file.attrs.create('numberOfTimes', number_of_times, dtype=numpy.int64)
+
+    if data_coding_format == 1:
+        hdf_file.attrs.create('numberOfStations', number_of_groups, dtype=numpy.int64)
+    else:
+        hdf_file.attrs.create('numberOfStations', 0, dtype=numpy.int64)
+        hdf_file.attrs.create('numberOfNodes', number_of_nodes, dtype=numpy.int64)
+
+    if interval is not None:
+        hdf_file.attrs.create('timeRecordInterval', interval.total_seconds(), dtype=numpy.int64)
+
+    if first_time is not None:
+        hdf_file.attrs.create('dateTimeOfFirstRecord', s111_reader.format_date_time(first_time))
+    if last_time is not None:
+        hdf_file.attrs.create('dateTimeOfLastRecord', s111_reader.format_date_time(last_time))
+
+    if speed_extents.min_speed is not None:
+        hdf_file.attrs.create('minSurfCurrentSpeed', speed_extents.min_speed)
+        hdf_file.attrs.create('maxSurfCurrentSpeed', speed_extents.max_speed)
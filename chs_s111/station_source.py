@@ -0,0 +1,244 @@
+#******************************************************************************
+#
+#******************************************************************************
+import abc
+import json
+import os
+from datetime import timedelta
+import iso8601
+import numpy
+import pytz
+from chs_s111 import s111_writer
+
+#The default number of records returned by each block of a station source.
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+#******************************************************************************
+class StationSource(abc.ABC):
+    """The time series of a single station, as consumed by s111_add_timeseries.
+
+    Each source provides the position and (UTC) start time of the station, the
+    interval between records, the number of records, and the direction
+    (degrees true) and speed (m/s) values as an iterator of blocks.
+    """
+
+    #******************************************************************************
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.interval = None
+        self.start_time = None
+        self.end_time = None
+        self.number_of_records = 0
+        self.latitude = 0
+        self.longitude = 0
+        self.station_identifier = ''
+
+
+    #******************************************************************************
+    @abc.abstractmethod
+    def read_blocks(self, block_size=DEFAULT_BLOCK_SIZE):
+        """Read the direction and speed values of the station in blocks.
+
+        :param block_size: The maximum number of records in each block.
+        :returns: A generator of tuples containing the direction (degrees true, in [0, 360)) and speed (m/s) values as 1D NumPy arrays.
+        """
+
+
+    #******************************************************************************
+    def close(self):
+        """Release any resources held by the source."""
+        pass
+
+
+    #******************************************************************************
+    def compute_end_time(self):
+        """Compute the time of the last record from the start time, the number of records, and the interval."""
+
+        self.end_time = self.start_time + (self.number_of_records - 1) * self.interval
+
+
+#******************************************************************************
+class NetcdfStationSource(StationSource):
+    """A station time series stored in a NetCDF file.
+
+    The file uses the same conventions as the irregular grid files: 'Times' is a
+    character array of ISO 8601 times, and 'ua' and 'va' are the velocity
+    components (metres s-1), with one value per time. The position is read from
+    the 'lat' and 'lon' variables, and the optional 'station_identifier' global
+    attribute identifies the station.
+    """
+
+    #******************************************************************************
+    def __init__(self, file_name):
+        super().__init__(file_name)
+
+        import netCDF4
+
+        self.netcdf_file = netCDF4.Dataset(file_name, "r")
+        variables = self.netcdf_file.variables
+
+        for name in ('Times', 'ua', 'va', 'lat', 'lon'):
+            if name not in variables:
+                raise Exception('The station file ' + file_name + ' does not contain the ' + name + ' variable.')
+
+        times = variables['Times']
+        self.ua = variables['ua']
+        self.va = variables['va']
+
+        self.number_of_records = times.shape[0]
+        if self.ua.shape[0] != self.number_of_records or self.va.shape[0] != self.number_of_records:
+            raise Exception('The number of time values does not match the number of velocity values.')
+
+        if self.ua.getncattr('units') != 'metres s-1' or self.va.getncattr('units') != 'metres s-1':
+            raise Exception('The input velocity data is stored in an unsupported unit.')
+
+        self.latitude = float(numpy.ravel(variables['lat'][:])[0])
+        self.longitude = float(numpy.ravel(variables['lon'][:])[0])
+
+        if 'station_identifier' in self.netcdf_file.ncattrs():
+            self.station_identifier = str(self.netcdf_file.getncattr('station_identifier')).strip()
+
+        if self.number_of_records == 0:
+            raise Exception('The station file ' + file_name + ' does not contain any records.')
+
+        self.start_time = parse_time(times[0])
+        if self.number_of_records > 1:
+            self.interval = parse_time(times[1]) - self.start_time
+        else:
+            self.interval = timedelta(0)
+
+        #The records must be evenly spaced.
+        self.compute_end_time()
+        if parse_time(times[self.number_of_records - 1]) != self.end_time:
+            raise Exception('The times in ' + file_name + ' are not evenly spaced.')
+
+
+    #******************************************************************************
+    def read_blocks(self, block_size=DEFAULT_BLOCK_SIZE):
+
+        for start in range(0, self.number_of_records, block_size):
+            stop = min(start + block_size, self.number_of_records)
+
+            u = numpy.ma.filled(self.ua[start:stop], numpy.nan).astype(numpy.float64)
+            v = numpy.ma.filled(self.va[start:stop], numpy.nan).astype(numpy.float64)
+
+            yield (s111_writer.vector_directions(u, v), numpy.hypot(u, v))
+
+
+    #******************************************************************************
+    def close(self):
+        self.netcdf_file.close()
+
+
+#******************************************************************************
+class NumpyStationSource(StationSource):
+    """A station time series held in NumPy arrays (or memory mapped .npy files).
+
+    The arrays are used as they are, so upstream systems can hand their model
+    output over without converting it to the ASCII format first.
+    """
+
+    #******************************************************************************
+    def __init__(self, directions, speeds, start_time, interval, longitude, latitude,
+                 station_identifier='', file_name=None):
+        """Create a new source.
+
+        :param directions: A 1D array of direction values (degrees true).
+        :param speeds: A 1D array of speed values (m/s).
+        :param start_time: The time of the first record. (Naive values are assumed to be UTC)
+        :param interval: The timedelta between records.
+        :param longitude: The x coordinate of the station.
+        :param latitude: The y coordinate of the station.
+        :param station_identifier: The station number and name.
+        :param file_name: The name of the file the values came from, if any.
+        """
+
+        super().__init__(file_name)
+
+        if len(directions) != len(speeds):
+            raise Exception('The number of direction values does not match the number of speed values.')
+
+        if start_time.tzinfo is None:
+            start_time = pytz.utc.localize(start_time)
+
+        self.directions = directions
+        self.speeds = speeds
+        self.start_time = start_time.astimezone(pytz.utc)
+        self.interval = interval
+        self.number_of_records = len(speeds)
+        self.longitude = float(longitude)
+        self.latitude = float(latitude)
+        self.station_identifier = station_identifier
+        self.compute_end_time()
+
+
+    #******************************************************************************
+    @classmethod
+    def from_file(cls, file_name):
+        """Open a station stored as a .npy file with a .json sidecar.
+
+        The .npy file holds a (2, N) array of direction (degrees true) and speed
+        (m/s) values, and is memory mapped rather than read. The sidecar (the same
+        name, with a .json extension) holds the start_time (ISO 8601), interval
+        (seconds), longitude, latitude, and optionally the station_identifier.
+
+        :param file_name: The name of the .npy file.
+        :returns: The new NumpyStationSource.
+        """
+
+        values = numpy.load(file_name, mmap_mode='r')
+        if values.ndim != 2 or values.shape[0] != 2:
+            raise Exception('The station file ' + file_name + ' must contain a (2, N) array of directions and speeds.')
+
+        with open(os.path.splitext(file_name)[0] + '.json') as f:
+            metadata = json.load(f)
+
+        return cls(values[0], values[1], iso8601.parse_date(metadata['start_time']),
+                   timedelta(seconds=metadata['interval']), metadata['longitude'], metadata['latitude'],
+                   metadata.get('station_identifier', ''), file_name)
+
+
+    #******************************************************************************
+    def read_blocks(self, block_size=DEFAULT_BLOCK_SIZE):
+
+        for start in range(0, self.number_of_records, block_size):
+            stop = min(start + block_size, self.number_of_records)
+            yield (s111_writer.normalize_directions(numpy.asarray(self.directions[start:stop], dtype=numpy.float64)),
+                   numpy.asarray(self.speeds[start:stop], dtype=numpy.float64))
+
+
+#******************************************************************************
+def open_station_source(file_name):
+    """Open a station time series file, choosing the source from the file's extension.
+
+    NetCDF (.nc) and NumPy (.npy) files are supported, anything else is read as
+    a CHS ASCII time series.
+
+    :param file_name: The name of the time series file.
+    :returns: The StationSource of the file.
+    """
+
+    extension = os.path.splitext(file_name)[1].lower()
+
+    if extension == '.nc':
+        return NetcdfStationSource(file_name)
+
+    if extension == '.npy':
+        return NumpyStationSource.from_file(file_name)
+
+    from chs_s111 import ascii_time_series
+    return ascii_time_series.AsciiTimeSeries(file_name)
+
+
+#******************************************************************************
+def parse_time(value):
+    """Parse a time from a NetCDF character array.
+
+    :param value: The characters of an ISO 8601 time.
+    :returns: The time in UTC.
+    """
+
+    strVal = numpy.ma.filled(value, b'').tobytes().decode().strip('\x00 ')
+    timeVal = iso8601.parse_date(strVal)
+
+    return timeVal.astimezone(pytz.utc)
@@ -0,0 +1,8 @@
+#******************************************************************************
+#
+#******************************************************************************
+from chs_s111 import cli
+
+
+if __name__ == "__main__":
+    cli.run_command('catalog')
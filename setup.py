@@ -24,7 +24,9 @@ setup(
     license='BSD 2-Clause',
     packages=find_packages(),
     scripts=s111_scripts,
+    entry_points={'console_scripts': ['chs_s111 = chs_s111.cli:main']},
     install_requires=['pytz', 'iso8601', 'numpy', 'h5py', 'netcdf4'],
+    extras_require={'arrow': ['pyarrow']},
     classifiers=[
                    "Development Status :: 3 - Alpha",
                    "Environment :: Console",        